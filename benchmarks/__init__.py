@@ -0,0 +1 @@
+"""Benchmarks for webex_bot. These are not run as part of the unit tests."""
@@ -0,0 +1,48 @@
+"""
+Compare building an adaptive card per request with rendering a CardTemplate.
+
+    python -m benchmarks.bench_card_template
+"""
+import timeit
+
+from webexpythonsdk.models.cards import AdaptiveCard, Column, ColumnSet, FontSize, FontWeight, Text, TextBlock
+from webexpythonsdk.models.cards.actions import Submit
+
+from webex_bot.cards.template import CardTemplate, slot
+from webex_bot.models.response import response_from_adaptive_card
+
+NUMBER = 2000
+
+
+def build_card(title, count):
+    text1 = TextBlock(title, weight=FontWeight.BOLDER, size=FontSize.MEDIUM)
+    text2 = TextBlock(f"You have {count} open alerts. Type a filter to narrow them down.", wrap=True, isSubtle=True)
+    input_text = Text(id="filter", placeholder="Filter", maxLength=30)
+    submit = Submit(title="Submit", data={"callback_keyword": "alerts_callback"})
+    return AdaptiveCard(
+        body=[ColumnSet(columns=[Column(items=[text1, text2], width=2)]),
+              ColumnSet(columns=[Column(items=[input_text], width=2)]),
+              ], actions=[submit])
+
+
+def main():
+    template = CardTemplate(build_card(slot("title"), slot("count")))
+
+    def current():
+        return response_from_adaptive_card(build_card("Alerts", 42)).as_dict()
+
+    def templated():
+        return template.render_response(title="Alerts", count=42).as_dict()
+
+    assert current() == templated()
+
+    results = {}
+    for name, fn in (("build + to_dict", current), ("CardTemplate.render", templated)):
+        seconds = min(timeit.repeat(fn, number=NUMBER, repeat=5))
+        results[name] = seconds / NUMBER * 1e6
+        print(f"{name:<22} {results[name]:8.1f} us/card")
+    print(f"{'speed-up':<22} {results['build + to_dict'] / results['CardTemplate.render']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+End-to-end throughput of a real WebexBot against a local fake Webex (see fake_webex.py).
+
+Messages are posted on the websocket across a number of rooms. Latency is measured from the
+activity being sent to the bot's reply arriving at POST /messages, so it covers the websocket,
+the message lookups, command routing, the reply and any queueing in between.
+
+    python -m benchmarks.bench_e2e --messages 2000 --rooms 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from benchmarks.fake_webex import FakeWebex
+from webex_bot.models.command import Command
+from webex_bot.scheduler import OutboundScheduler
+from webex_bot.webex_bot import WebexBot
+
+
+class BenchCommand(Command):
+
+    def __init__(self):
+        super().__init__(command_keyword="bench", help_message="Benchmark")
+
+    def execute(self, message, attachment_actions, activity):
+        # fake_webex matches the reply to the message using the activity id at the end.
+        return f"done {activity['id']}"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def start_bot(fake, rate_limited=False, **bot_kwargs):
+    """
+    Create a WebexBot pointed at the fake Webex and run it on a daemon thread.
+    @param rate_limited: If False, replies are not paced by the OutboundScheduler, so the
+     bot itself is measured rather than the Webex rate limits.
+    @return: the bot, once its websocket is connected.
+    """
+    bot = WebexBot("bench-token", base_url=fake.base_url, u2c_url=fake.u2c_url, log_level="WARNING", **bot_kwargs)
+    bot.add_command(BenchCommand())
+    if not rate_limited:
+        unlimited = float("inf")
+        bot.outbound = OutboundScheduler(bot.outbound_teams.messages, global_rate=unlimited, global_burst=unlimited,
+                                         room_rate=unlimited, room_burst=unlimited)
+
+    def run():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        try:
+            bot.run()
+        except Exception:
+            # Losing the connection is expected once the fake Webex has been stopped.
+            if not fake.stopped:
+                raise
+
+    threading.Thread(target=run, name="bench-bot", daemon=True).start()
+    fake.wait_until_connected()
+    return bot
+
+
+def run_benchmark(messages=1000, rooms=20, latency=0.0, rate=0.0, timeout=120, rate_limited=False, **bot_kwargs):
+    """
+    @param messages: Number of messages to send.
+    @param rooms: Number of rooms to spread them across.
+    @param latency: Seconds added to every fake REST call.
+    @param rate: Messages per second to send, or 0 to send them all at once.
+    @param rate_limited: If True, replies are paced by the default OutboundScheduler rate limits.
+    @param bot_kwargs: Passed to WebexBot, e.g. max_workers or async_ingress.
+    @return: dict of results.
+    """
+    fake = FakeWebex(latency=latency).start()
+    try:
+        bot = start_bot(fake, rate_limited=rate_limited, **bot_kwargs)
+        started = time.perf_counter()
+        for i in range(messages):
+            if rate:
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            fake.send_message(f"room-{i % rooms}", "bench")
+        completed = fake.wait_for_replies(messages, timeout=timeout)
+        elapsed = time.perf_counter() - started
+        latencies = sorted(fake.reply_latencies.values())
+        return {
+            "messages": messages,
+            "replied": len(latencies),
+            "completed": completed,
+            "seconds": elapsed,
+            "messages_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+            "rest_calls": fake.requests,
+            "acks": fake.acks,
+            "startup": bot.startup_timings.summary(),
+        }
+    finally:
+        fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000, help="Messages to send. (default 1000)")
+    parser.add_argument("--rooms", type=int, default=20, help="Rooms to spread the messages over. (default 20)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each REST call. (default 0)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Messages per second, 0 for all at once. (default 0)")
+    parser.add_argument("--max-workers", type=int, default=8, help="WebexBot max_workers. (default 8)")
+    parser.add_argument("--async-ingress", action="store_true", help="Enable WebexBot async_ingress.")
+    parser.add_argument("--rate-limited", action="store_true",
+                        help="Pace replies with the default OutboundScheduler rate limits.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for all replies. (default 120)")
+    args = parser.parse_args()
+
+    results = run_benchmark(messages=args.messages, rooms=args.rooms, latency=args.latency, rate=args.rate,
+                            timeout=args.timeout, rate_limited=args.rate_limited,
+                            max_workers=args.max_workers, async_ingress=args.async_ingress)
+    print(f"replied      {results['replied']}/{results['messages']}"
+          f"{'' if results['completed'] else '  (timed out)'}")
+    print(f"throughput   {results['messages_per_second']:.1f} msgs/sec over {results['seconds']:.2f}s")
+    for name in ("p50", "p95", "p99", "max"):
+        print(f"latency {name:<4} {results[name] * 1000:8.1f} ms")
+    print(f"REST calls   {results['rest_calls']}   acks {results['acks']}")
+    print(f"startup      {results['startup']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Micro-benchmarks for the code run on every incoming message, using pytest-benchmark.
+
+    make bench          # run them, failing if any is over its budget below
+    make bench-save     # store the results as the baseline for this machine (in .benchmarks/)
+    make bench-check    # run them again, failing on a slowdown of more than 25% against that baseline
+
+Budgets are generous absolute limits (roughly 10x what a laptop manages) which catch a
+hot path becoming algorithmically slower on any machine. The stored baseline catches
+smaller slowdowns, but is only comparable on the machine which saved it.
+"""
+import itertools
+import json
+import types
+
+import pytest
+
+from webex_bot.commands.help import HelpCommand
+from webex_bot.models.command import Command
+from webex_bot.models.response import Response
+from webex_bot.scheduler import OutboundScheduler
+from webex_bot.webex_bot import WebexBot
+from webex_bot.websockets.webex_websocket_client import WebexWebsocketClient
+
+# Median seconds each benchmark must stay under.
+BUDGETS = {
+    "process_raw_command": {10: 200e-6, 100: 200e-6, 1000: 250e-6},
+    "check_user_approved": 100e-6,
+    "response_as_dict": 20e-6,
+    "help_build_card": 200e-6,
+    "websocket_frame_decode": 100e-6,
+    "get_message_passed_to_command": 10e-6,
+}
+
+
+def check_budget(benchmark, budget):
+    if benchmark.stats is None:
+        # --benchmark-disable: the function was run once, untimed.
+        return
+    median = benchmark.stats.stats.median
+    assert median < budget, f"{benchmark.name} took {median * 1e6:.1f} us, budget is {budget * 1e6:.1f} us"
+
+
+class NullMessages(object):
+    def create(self, **kwargs):
+        return types.SimpleNamespace(id="message-1")
+
+
+class NullTeams(object):
+    def __init__(self):
+        self.messages = NullMessages()
+        self.people = types.SimpleNamespace(me=lambda: types.SimpleNamespace(
+            displayName="Bench Bot", emails=["bench-bot@webex.bot"], avatar=None, type="bot"))
+
+
+class KeywordCommand(Command):
+    def execute(self, message, attachment_actions, activity):
+        return "ok"
+
+
+@pytest.fixture
+def make_bot(monkeypatch):
+    def fake_init(self, access_token, bot_name, on_message=None, on_card_action=None, proxies=None, **kwargs):
+        self.access_token = access_token
+        self.teams = self.outbound_teams = NullTeams()
+        self.on_message = on_message
+        self.on_card_action = on_card_action
+        self.proxies = proxies
+        self.websocket = None
+
+    monkeypatch.setattr(WebexWebsocketClient, "__init__", fake_init)
+
+    def make(**kwargs):
+        bot = WebexBot(teams_bot_token="bench-token", log_level="WARNING", **kwargs)
+        unlimited = float("inf")
+        bot.outbound = OutboundScheduler(bot.outbound_teams.messages, global_rate=unlimited,
+                                         global_burst=unlimited, room_rate=unlimited, room_burst=unlimited)
+        return bot
+
+    return make
+
+
+def make_activity(activity_id="activity-1"):
+    return {"id": activity_id, "verb": "post",
+            "actor": {"type": "PERSON", "emailAddress": "user@example.com"},
+            "target": {"id": "room-1", "url": "https://conv.example.com/conversations/room-1", "tags": []}}
+
+
+@pytest.mark.parametrize("command_count", [10, 100, 1000])
+def test_process_raw_command(benchmark, make_bot, command_count):
+    bot = make_bot()
+    for i in range(command_count):
+        bot.add_command(KeywordCommand(command_keyword=f"command{i:04d}", help_message=f"Command {i}"))
+    teams_message = types.SimpleNamespace(roomId="room-1", text="", personEmail="user@example.com")
+    activity = make_activity()
+    # The last command added, with arguments after the keyword.
+    raw_message = f"command{command_count - 1:04d} some arguments"
+
+    benchmark(bot.process_raw_command, raw_message, teams_message, "user@example.com", activity)
+    check_budget(benchmark, BUDGETS["process_raw_command"][command_count])
+
+
+def test_check_user_approved(benchmark, make_bot):
+    bot = make_bot(approved_users=[f"user{i}@example.com" for i in range(10000)],
+                   approved_domains=[f"domain{i}.example.com" for i in range(1000)] + ["*.corp.example.com"])
+    # More distinct emails than the policy remembers decisions for, so most calls are decided afresh.
+    emails = itertools.cycle([f"someone{i}@team{i % 50}.corp.example.com" for i in range(20000)])
+
+    result = benchmark(lambda: bot.check_user_approved(user_email=next(emails), approved_rooms=[]))
+    assert result is True
+    check_budget(benchmark, BUDGETS["check_user_approved"])
+
+
+def test_response_as_dict(benchmark):
+    def build():
+        response = Response()
+        response.markdown = "Hello **world**"
+        response.roomId = "room-1"
+        response.parentId = "parent-1"
+        return response.as_dict()
+
+    result = benchmark(build)
+    assert result == {"markdown": "Hello **world**", "roomId": "room-1", "parentId": "parent-1"}
+    check_budget(benchmark, BUDGETS["response_as_dict"])
+
+
+def test_help_build_card(benchmark):
+    help_command = HelpCommand(bot_name="Bench Bot", bot_help_subtitle="Commands",
+                               bot_help_image="https://example.com/avatar.png")
+    help_command.commands = {help_command} | {KeywordCommand(command_keyword=f"command{i}", help_message=f"Command {i}")
+                                              for i in range(50)}
+    activity = make_activity()
+
+    response = benchmark(help_command.build_card, "", None, activity)
+    assert response.attachments
+    check_budget(benchmark, BUDGETS["help_build_card"])
+
+
+def test_websocket_frame_decode(benchmark):
+    client = WebexWebsocketClient.__new__(WebexWebsocketClient)
+    client.async_ingress = None
+    submitted = []
+    client.dispatcher = types.SimpleNamespace(submit=lambda key, fn, msg: submitted.append(key))
+    frame = json.dumps({"id": "frame-1", "data": {"eventType": "conversation.activity",
+                                                  "activity": make_activity()}})
+
+    benchmark(client._handle_websocket_frame, frame)
+    assert submitted[-1] == "room-1"
+    check_budget(benchmark, BUDGETS["websocket_frame_decode"])
+
+
+def test_get_message_passed_to_command(benchmark):
+    result = benchmark(WebexBot.get_message_passed_to_command, "command0042", "Command0042 some arguments here")
+    assert result == " some arguments here"
+    check_budget(benchmark, BUDGETS["get_message_passed_to_command"])
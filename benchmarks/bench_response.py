@@ -0,0 +1,92 @@
+"""
+Compare Response with the implementation this package used to ship.
+
+    python -m benchmarks.bench_response
+"""
+import json
+import sys
+import timeit
+
+from webex_bot.models.response import Response
+
+NUMBER = 20000
+
+
+class OldResponse(object):
+    """The Response this package used to ship, kept here for comparison."""
+
+    def __init__(self):
+        self.attributes = {"text": None, "roomId": None, "parentId": None, "markdown": None, "html": None,
+                           "files": list(), "attachments": list()}
+
+    @property
+    def markdown(self):
+        return self.attributes["markdown"]
+
+    @markdown.setter
+    def markdown(self, val):
+        self.attributes["markdown"] = val
+
+    @property
+    def roomId(self):
+        return self.attributes["roomId"]
+
+    @roomId.setter
+    def roomId(self, val):
+        self.attributes["roomId"] = val
+
+    @property
+    def parentId(self):
+        return self.attributes["parentId"]
+
+    @parentId.setter
+    def parentId(self, val):
+        self.attributes["parentId"] = val
+
+    def as_dict(self):
+        ret = dict()
+        for k, v in self.attributes.items():
+            if v:
+                ret[k] = v
+        return ret
+
+    def json(self):
+        return json.dumps(self.attributes)
+
+
+def fill_old_response():
+    response = OldResponse()
+    response.markdown = "Hello **world**"
+    response.roomId = "room-1"
+    response.parentId = "parent-1"
+    return response
+
+
+def fill_response():
+    response = Response()
+    response.markdown = "Hello **world**"
+    response.roomId = "room-1"
+    response.parentId = "parent-1"
+    return response
+
+
+def main():
+    cases = (
+        ("construct", fill_old_response, fill_response),
+        ("construct + as_dict", lambda: fill_old_response().as_dict(), lambda: fill_response().as_dict()),
+    )
+    old_response, new_response = fill_old_response(), fill_response()
+    cases += (
+        ("as_dict (repeat)", old_response.as_dict, new_response.as_dict),
+        ("json (repeat)", old_response.json, new_response.json),
+    )
+    for name, old, new in cases:
+        old_us = min(timeit.repeat(old, number=NUMBER, repeat=5)) / NUMBER * 1e6
+        new_us = min(timeit.repeat(new, number=NUMBER, repeat=5)) / NUMBER * 1e6
+        print(f"{name:<22} old {old_us:6.2f} us   new {new_us:6.2f} us   {old_us / new_us:5.1f}x")
+    print(f"{'size':<22} old {sys.getsizeof(old_response.attributes) + sys.getsizeof(old_response):6d} B    "
+          f"new {sys.getsizeof(new_response.attributes) + sys.getsizeof(new_response):6d} B")
+
+
+if __name__ == "__main__":
+    main()
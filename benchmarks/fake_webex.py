@@ -0,0 +1,250 @@
+"""
+A local stand-in for the parts of Webex the bot talks to, for benchmarks.
+
+Serves the u2c catalog, WDM devices, the websocket, the conversation message lookup and the
+/people, /messages, /attachment/actions and /memberships REST APIs. Every REST call is delayed
+by `latency` seconds, to model the round trip to the real service.
+
+    fake = FakeWebex(latency=0.02)
+    fake.start()
+    bot = WebexBot("token", base_url=fake.base_url, u2c_url=fake.u2c_url)
+    ...
+    activity_id = fake.send_message("room-1", "bench 1")
+    fake.wait_for_replies(1)
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from aiohttp import WSMsgType, web
+
+BOT_EMAIL = "bench-bot@webex.bot"
+USER_EMAIL = "user@example.com"
+
+
+class FakeWebex(object):
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        """
+        @param latency: Seconds added to every REST response.
+        @param host: Interface to listen on.
+        @param port: Port to listen on. (default any free port)
+        """
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.root_url = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+        self._connected = threading.Event()
+        self._websocket = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._replied = threading.Condition(self._lock)
+        # activity id -> (room id, text, time sent)
+        self.messages = {}
+        # activity id -> seconds from the activity being sent to the bot's reply arriving
+        self.reply_latencies = {}
+        # ids of messages carrying a card, which cannot be edited
+        self.card_messages = set()
+        self.acks = 0
+        self.requests = 0
+        self.stopped = False
+
+    @property
+    def base_url(self):
+        return f"{self.root_url}/v1/"
+
+    @property
+    def u2c_url(self):
+        return f"{self.root_url}/u2c/api/v1/catalog"
+
+    def start(self):
+        """Start serving on a background thread. Returns once the server is listening."""
+        self._thread = threading.Thread(target=self._serve, name="fake-webex", daemon=True)
+        self._thread.start()
+        if not self._started.wait(10):
+            raise RuntimeError("Fake Webex did not start")
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def _shutdown(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        await self._runner.shutdown()
+        await self._runner.cleanup()
+
+    def wait_until_connected(self, timeout=30):
+        """Wait for the bot to open and authorize its websocket."""
+        if not self._connected.wait(timeout):
+            raise TimeoutError("Bot did not connect to the fake Webex websocket")
+
+    def send_message(self, room_id, text):
+        """
+        Post a message from a user to the bot, as a conversation.activity on the websocket.
+        @return: id of the activity.
+        """
+        activity_id = str(uuid.uuid4())
+        with self._lock:
+            self.messages[activity_id] = (room_id, text, time.perf_counter())
+        frame = {
+            "id": str(uuid.uuid4()),
+            "data": {
+                "eventType": "conversation.activity",
+                "activity": {
+                    "id": activity_id,
+                    "verb": "post",
+                    "actor": {"id": "user-1", "type": "PERSON", "emailAddress": USER_EMAIL},
+                    "target": {"id": room_id,
+                               "url": f"{self.root_url}/conversation/api/v1/conversations/{room_id}",
+                               "tags": []},
+                },
+            },
+        }
+        asyncio.run_coroutine_threadsafe(self._websocket.send_str(json.dumps(frame)), self._loop)
+        return activity_id
+
+    def wait_for_replies(self, count, timeout=60):
+        """
+        Wait until the bot has replied to `count` messages.
+        @return: True if it did before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._replied:
+            while len(self.reply_latencies) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._replied.wait(remaining)
+        return True
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start_app())
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _start_app(self):
+        app = web.Application(middlewares=[self._delay])
+        app.router.add_get("/u2c/api/v1/catalog", self._catalog)
+        app.router.add_get("/wdm/api/v1/devices", self._list_devices)
+        app.router.add_post("/wdm/api/v1/devices", self._create_device)
+        app.router.add_get("/ws", self._websocket_handler)
+        app.router.add_get("/conversation/api/v1/messages/{activity_id}", self._conversation_message)
+        app.router.add_get("/conversation/api/v1/attachment/actions/{activity_id}", self._conversation_message)
+        app.router.add_get("/v1/people/me", self._people_me)
+        app.router.add_get("/v1/messages/{message_id}", self._get_message)
+        app.router.add_post("/v1/messages", self._create_message)
+        app.router.add_put("/v1/messages/{message_id}", self._update_message)
+        app.router.add_delete("/v1/messages/{message_id}", self._delete_message)
+        app.router.add_get("/v1/attachment/actions/{action_id}", self._get_attachment_action)
+        app.router.add_get("/v1/memberships", self._list_memberships)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.root_url = f"http://{self.host}:{port}"
+
+    @web.middleware
+    async def _delay(self, request, handler):
+        if request.path != "/ws":
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def _catalog(self, request):
+        return web.json_response({"serviceLinks": {"wdm": f"{self.root_url}/wdm/api/v1"}})
+
+    async def _list_devices(self, request):
+        return web.json_response({"devices": []})
+
+    async def _create_device(self, request):
+        device = await request.json()
+        device.update({"url": f"{self.root_url}/wdm/api/v1/devices/{uuid.uuid4()}",
+                       "webSocketUrl": f"ws://{self.host}:{self._runner.addresses[0][1]}/ws"})
+        return web.json_response(device)
+
+    async def _websocket_handler(self, request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        async for message in websocket:
+            if message.type != WSMsgType.TEXT:
+                continue
+            frame = json.loads(message.data)
+            if frame.get("type") == "authorization":
+                self._websocket = websocket
+                self._connected.set()
+            elif frame.get("type") == "ack":
+                self.acks += 1
+        return websocket
+
+    async def _conversation_message(self, request):
+        # The base64 message id is not interesting here, so the activity id is used for both.
+        return web.json_response({"id": request.match_info["activity_id"]})
+
+    async def _people_me(self, request):
+        return web.json_response({"id": "bench-bot", "emails": [BOT_EMAIL], "displayName": "Bench Bot",
+                                  "nickName": "Bench Bot", "type": "bot", "avatar": None})
+
+    async def _get_message(self, request):
+        message_id = request.match_info["message_id"]
+        with self._lock:
+            room_id, text, _ = self.messages.get(message_id, ("unknown", "", 0))
+        return web.json_response({"id": message_id, "roomId": room_id, "roomType": "group", "text": text,
+                                  "personId": "user-1", "personEmail": USER_EMAIL})
+
+    async def _create_message(self, request):
+        received = time.perf_counter()
+        body = await request.json()
+        # Benchmark commands reply with "... <activity id>" as the last word.
+        activity_id = (body.get("text") or body.get("markdown") or "").rpartition(" ")[2]
+        with self._replied:
+            sent = self.messages.get(activity_id)
+            if sent is not None and activity_id not in self.reply_latencies:
+                self.reply_latencies[activity_id] = received - sent[2]
+                self._replied.notify_all()
+        body["id"] = f"reply-{next(self._ids)}"
+        body["personEmail"] = BOT_EMAIL
+        if body.get("attachments"):
+            with self._lock:
+                self.card_messages.add(body["id"])
+        return web.json_response(body)
+
+    async def _update_message(self, request):
+        body = await request.json()
+        with self._lock:
+            is_card = request.match_info["message_id"] in self.card_messages
+        if is_card:
+            # Like Webex, which cannot edit a message with attachments
+            return web.json_response({"message": "Cannot edit a message with attachments"}, status=400)
+        body["id"] = request.match_info["message_id"]
+        return web.json_response(body)
+
+    async def _delete_message(self, request):
+        return web.Response(status=204)
+
+    async def _get_attachment_action(self, request):
+        action_id = request.match_info["action_id"]
+        with self._lock:
+            # The action's messageId is the card it was submitted from
+            self.card_messages.add(action_id)
+        return web.json_response({"id": action_id, "type": "submit", "messageId": action_id,
+                                  "personId": "user-1", "roomId": "unknown", "inputs": {}})
+
+    async def _list_memberships(self, request):
+        return web.json_response({"items": [{"id": "membership-1", "roomId": request.query.get("roomId"),
+                                             "personId": "user-1", "personEmail": USER_EMAIL}]})
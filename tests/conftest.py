@@ -38,6 +38,7 @@ class DummyMessages:
     def __init__(self):
         self.created = []
         self.deleted = []
+        self.updated = []
 
     def create(self, **kwargs):
         self.created.append(kwargs)
@@ -46,6 +47,10 @@ class DummyMessages:
     def delete(self, message_id):
         self.deleted.append(message_id)
 
+    def update(self, messageId, roomId=None, text=None, markdown=None):
+        self.updated.append({"messageId": messageId, "roomId": roomId, "text": text, "markdown": markdown})
+        return types.SimpleNamespace(id=messageId)
+
 
 class DummyMemberships:
     def __init__(self, member_emails=None):
@@ -71,9 +76,10 @@ def teams_api():
 
 @pytest.fixture
 def bot(monkeypatch, teams_api):
-    def fake_init(self, access_token, bot_name, on_message=None, on_card_action=None, proxies=None):
+    def fake_init(self, access_token, bot_name, on_message=None, on_card_action=None, proxies=None, **kwargs):
         self.access_token = access_token
         self.teams = teams_api
+        self.outbound_teams = teams_api
         self.on_message = on_message
         self.on_card_action = on_card_action
         self.proxies = proxies
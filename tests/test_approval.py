@@ -0,0 +1,91 @@
+import threading
+
+from webex_bot.approval import ApprovalPolicy
+
+
+def test_open_policy():
+    policy = ApprovalPolicy()
+    assert policy.is_open is True
+    assert policy.has_user_or_domain_rules is False
+    assert policy.is_user_or_domain_approved("anyone@example.com") is False
+
+
+def test_users_and_domains_are_case_insensitive():
+    policy = ApprovalPolicy(approved_users=["User@Example.com"], approved_domains=["Company.COM"])
+    assert policy.is_open is False
+    assert policy.is_user_or_domain_approved("user@example.com") is True
+    assert policy.is_user_or_domain_approved("USER@EXAMPLE.COM") is True
+    assert policy.is_user_or_domain_approved("someone@company.com") is True
+    assert policy.is_user_or_domain_approved("someone@other.com") is False
+
+
+def test_wildcard_domain_matches_subdomains_only():
+    policy = ApprovalPolicy(approved_domains=["*.example.com"])
+    assert policy.is_user_or_domain_approved("a@eng.example.com") is True
+    assert policy.is_user_or_domain_approved("a@x.eng.example.com") is True
+    assert policy.is_user_or_domain_approved("a@example.com") is False
+    assert policy.is_user_or_domain_approved("a@badexample.com") is False
+
+
+def test_decisions_are_cached_and_cleared_on_update():
+    policy = ApprovalPolicy(approved_users=["a@example.com"])
+    assert policy.is_user_or_domain_approved("a@example.com") is True
+    assert policy.is_user_or_domain_approved("a@example.com") is True
+    assert policy.stats()["hits"] == 1
+    policy.update(approved_users=["b@example.com"])
+    assert policy.is_user_or_domain_approved("a@example.com") is False
+    assert policy.is_user_or_domain_approved("b@example.com") is True
+
+
+def test_decision_from_before_an_update_is_not_remembered(monkeypatch):
+    from webex_bot import approval
+
+    deciding = threading.Event()
+    release = threading.Event()
+    decide = approval._ApprovalRules.decide
+
+    def slow_decide(rules, user_email):
+        result = decide(rules, user_email)
+        deciding.set()
+        release.wait(5)
+        return result
+
+    policy = ApprovalPolicy(approved_users=["a@example.com"])
+    monkeypatch.setattr(approval._ApprovalRules, "decide", slow_decide)
+    results = []
+    check = threading.Thread(target=lambda: results.append(policy.is_user_or_domain_approved("a@example.com")))
+    check.start()
+    assert deciding.wait(5)
+    policy.update(approved_users=[])
+    release.set()
+    check.join(5)
+    monkeypatch.setattr(approval._ApprovalRules, "decide", decide)
+    # The check which started before the update still sees the old lists, but later ones do not
+    assert results == [True]
+    assert policy.is_user_or_domain_approved("a@example.com") is False
+
+
+def test_rooms_only_policy_is_not_open():
+    policy = ApprovalPolicy(approved_rooms=["room-1"])
+    assert policy.is_open is False
+    assert policy.has_user_or_domain_rules is False
+
+
+def test_missing_email_is_not_approved():
+    policy = ApprovalPolicy(approved_domains=["example.com"])
+    assert policy.is_user_or_domain_approved(None) is False
+
+
+def test_watched_list_reports_in_place_changes():
+    from webex_bot.approval import WatchedList
+
+    changes = []
+    items = WatchedList(["a"], on_change=lambda: changes.append(list(items)))
+    items.append("b")
+    items.extend(["c"])
+    items[0] = "z"
+    del items[1]
+    items += ["d"]
+    items.pop()
+    items.clear()
+    assert changes == [["a", "b"], ["a", "b", "c"], ["z", "b", "c"], ["z", "c"], ["z", "c", "d"], ["z", "c"], []]
@@ -0,0 +1,254 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+from webex_bot.dispatcher import KeyedDispatcher  # noqa: E402
+from webex_bot.websockets.async_ingress import AsyncIngress  # noqa: E402
+from webex_bot.websockets.webex_websocket_client import WebexWebsocketClient  # noqa: E402
+
+
+async def _start_stub_server(delay=0.0):
+    """Local stand-in for the conversation service and the Webex REST API."""
+    requests_seen = []
+
+    async def conversation_message(request):
+        requests_seen.append(request.path)
+        await asyncio.sleep(delay)
+        activity_id = request.match_info["activity_id"]
+        if activity_id == "missing":
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response({"id": f"b64-{activity_id}"})
+
+    async def message(request):
+        requests_seen.append(request.path)
+        message_id = request.match_info["message_id"]
+        return web.json_response({"id": message_id, "roomId": "room-1", "text": f"text for {message_id}"})
+
+    async def attachment_action(request):
+        requests_seen.append(request.path)
+        return web.json_response({"id": request.match_info["action_id"], "inputs": {"callback_keyword": "cb"}})
+
+    app = web.Application()
+    app.router.add_get("/conv/messages/{activity_id}", conversation_message)
+    app.router.add_get("/conv/attachment/actions/{activity_id}", conversation_message)
+    app.router.add_get("/v1/messages/{message_id}", message)
+    app.router.add_get("/v1/attachment/actions/{action_id}", attachment_action)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}", requests_seen
+
+
+def _make_msg(base_url, activity_id, verb="post", room_id="conv-1"):
+    # The client rewrites <base_url>/conv/conversations/<room> to <base_url>/conv/messages/<activity>
+    return {
+        "data": {
+            "eventType": "conversation.activity",
+            "activity": {
+                "id": activity_id,
+                "verb": verb,
+                "target": {"id": room_id, "url": f"{base_url}/conv/conversations/{room_id}"},
+            },
+        }
+    }
+
+
+def _make_client(base_url):
+    client = WebexWebsocketClient.__new__(WebexWebsocketClient)
+    client.share_id = None
+    client.on_message = MagicMock()
+    client.on_card_action = MagicMock()
+    client.activity_filter = None
+    client.dedup_store = None
+    client._ack_message = MagicMock()
+    client.dispatcher = KeyedDispatcher(max_workers=2)
+    client._ingress_tails = {}
+    client.async_ingress = AsyncIngress(headers={"Authorization": "Bearer test"}, base_url=f"{base_url}/v1")
+    return client
+
+
+def test_get_base64_message_id_and_message():
+    async def scenario():
+        runner, base_url, _ = await _start_stub_server()
+        ingress = AsyncIngress(headers={}, base_url=f"{base_url}/v1/")
+        await ingress.start()
+        try:
+            message_id = await ingress.get_base64_message_id(f"{base_url}/conv/messages/act-1")
+            message = await ingress.get_message(message_id)
+            action = await ingress.get_attachment_action("act-2")
+            missing = await ingress.get_base64_message_id(f"{base_url}/conv/messages/missing")
+            return message_id, message, action, missing
+        finally:
+            await ingress.close()
+            await runner.cleanup()
+
+    message_id, message, action, missing = asyncio.run(scenario())
+    assert message_id == "b64-act-1"
+    assert message.text == "text for b64-act-1"
+    assert action.inputs == {"callback_keyword": "cb"}
+    assert missing is None
+
+
+def test_request_timeout_is_treated_as_a_failed_request():
+    async def scenario():
+        runner, base_url, _ = await _start_stub_server(delay=1.0)
+        ingress = AsyncIngress(headers={}, base_url=f"{base_url}/v1/", timeout=0.05)
+        await ingress.start()
+        try:
+            return await ingress.get_base64_message_id(f"{base_url}/conv/messages/act-1")
+        finally:
+            await ingress.close()
+            await runner.cleanup()
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_events_are_fetched_concurrently_and_handled_in_order():
+    async def scenario():
+        runner, base_url, seen = await _start_stub_server(delay=0.05)
+        client = _make_client(base_url)
+        await client.async_ingress.start()
+        try:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            msgs = [_make_msg(base_url, f"act-{i}") for i in range(20)]
+            await asyncio.gather(*(client._process_incoming_websocket_message_async(msg) for msg in msgs))
+            elapsed = loop.time() - started
+        finally:
+            await client.async_ingress.close()
+            await runner.cleanup()
+        client.dispatcher.shutdown()
+        return client, elapsed
+
+    client, elapsed = asyncio.run(scenario())
+    # 20 lookups at 50ms each would take a second if done one after the other
+    assert elapsed < 0.8
+    texts = [call.kwargs["teams_message"].text for call in client.on_message.call_args_list]
+    assert texts == [f"text for b64-act-{i}" for i in range(20)]
+    assert client._ack_message.call_count == 20
+    assert client._ingress_tails == {}
+
+
+def test_card_action_event_is_handled():
+    async def scenario():
+        runner, base_url, _ = await _start_stub_server()
+        client = _make_client(base_url)
+        await client.async_ingress.start()
+        try:
+            msg = _make_msg(base_url, "act-1", verb="cardAction")
+            await client._process_incoming_websocket_message_async(msg)
+        finally:
+            await client.async_ingress.close()
+            await runner.cleanup()
+        client.dispatcher.shutdown()
+        return client
+
+    client = asyncio.run(scenario())
+    client.on_card_action.assert_called_once()
+    client.on_message.assert_not_called()
+
+
+def test_unresolvable_event_is_skipped():
+    async def scenario():
+        runner, base_url, _ = await _start_stub_server()
+        client = _make_client(base_url)
+        await client.async_ingress.start()
+        try:
+            msg = _make_msg(base_url, "missing")
+            await client._process_incoming_websocket_message_async(msg)
+        finally:
+            await client.async_ingress.close()
+            await runner.cleanup()
+        client.dispatcher.shutdown()
+        return client
+
+    client = asyncio.run(scenario())
+    client.on_message.assert_not_called()
+    client._ack_message.assert_not_called()
+
+
+def _make_bot_for_async_ingress(bot, base_url):
+    bot.share_id = None
+    bot.on_message = MagicMock()
+    bot.on_card_action = MagicMock()
+    bot.activity_filter = bot.accept_activity
+    bot.loop_activity_filter = bot.accept_activity_without_lookups
+    bot.dedup_store = None
+    bot._ack_message = MagicMock()
+    bot.dispatcher = KeyedDispatcher(max_workers=2)
+    bot._ingress_tails = {}
+    bot.async_ingress = AsyncIngress(headers={"Authorization": "Bearer test"}, base_url=f"{base_url}/v1")
+    bot.approved_rooms = ["approved-room"]
+    return bot
+
+
+def _make_person_msg(base_url, activity_id, email):
+    msg = _make_msg(base_url, activity_id)
+    msg["id"] = f"ws-{activity_id}"
+    msg["data"]["activity"]["actor"] = {"type": "PERSON", "emailAddress": email}
+    return msg
+
+
+def test_room_membership_is_not_looked_up_on_the_event_loop(bot):
+    membership_threads = []
+
+    def list_memberships(roomId, personEmail):
+        membership_threads.append(threading.get_ident())
+        return []
+
+    bot.teams.memberships.list = list_memberships
+
+    async def scenario():
+        runner, base_url, seen = await _start_stub_server()
+        client = _make_bot_for_async_ingress(bot, base_url)
+        # Known not to be a member, so rejected on the loop without any requests
+        client.membership_cache.set(("approved-room", "outsider@example.com"), False)
+        await client.async_ingress.start()
+        try:
+            await client._process_incoming_websocket_message_async(
+                _make_person_msg(base_url, "act-1", "unknown@example.com"))
+            await client._process_incoming_websocket_message_async(
+                _make_person_msg(base_url, "act-2", "outsider@example.com"))
+        finally:
+            await client.async_ingress.close()
+            await runner.cleanup()
+        client.dispatcher.shutdown()
+        return client, seen, threading.get_ident()
+
+    client, seen, loop_thread = asyncio.run(scenario())
+    # The unknown user's membership is left to process_incoming_message, on a worker
+    assert seen == ["/conv/messages/act-1", "/v1/messages/b64-act-1"]
+    assert loop_thread not in membership_threads
+    client._ack_message.assert_any_call("ws-act-2")
+
+
+def test_activity_filter_runs_off_the_event_loop_without_a_loop_filter():
+    filter_threads = []
+
+    def activity_filter(activity):
+        filter_threads.append(threading.get_ident())
+        return False
+
+    async def scenario():
+        runner, base_url, seen = await _start_stub_server()
+        client = _make_client(base_url)
+        client.activity_filter = activity_filter
+        await client.async_ingress.start()
+        try:
+            await client._process_incoming_websocket_message_async(_make_msg(base_url, "act-1"))
+        finally:
+            await client.async_ingress.close()
+            await runner.cleanup()
+        client.dispatcher.shutdown()
+        return seen, threading.get_ident()
+
+    seen, loop_thread = asyncio.run(scenario())
+    assert seen == []
+    assert filter_threads and loop_thread not in filter_threads
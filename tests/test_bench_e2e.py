@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from benchmarks.bench_e2e import percentile, run_benchmark  # noqa: E402
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+@pytest.mark.parametrize("async_ingress", [False, True])
+def test_bot_replies_to_every_message_from_fake_webex(async_ingress):
+    results = run_benchmark(messages=20, rooms=4, timeout=20, max_workers=4, async_ingress=async_ingress)
+    assert results["completed"]
+    assert results["replied"] == 20
+    assert results["acks"] == 20
+    assert 0 < results["p50"] <= results["p99"] <= results["max"]
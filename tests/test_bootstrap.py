@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from webex_bot.bootstrap import StartupTimings, run_concurrently
+from webex_bot.metrics import Metrics
+from webex_bot.webex_bot import WebexBot
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def step(value):
+        # Only passes if both steps are running at the same time
+        barrier.wait()
+        return value
+
+    assert run_concurrently({"a": lambda: step(1), "b": lambda: step(2)}) == {"a": 1, "b": 2}
+
+
+def test_failure_is_raised_without_waiting_for_other_steps():
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("u2c lookup failed")
+
+    with pytest.raises(ValueError, match="u2c lookup failed"):
+        run_concurrently({"slow": lambda: release.wait(10), "fail": fail})
+    release.set()
+
+
+def test_startup_timings():
+    timer = FakeTimer()
+    metrics = Metrics()
+    timings = StartupTimings(metrics=metrics, started=0.0, timer=timer)
+    with timings.time("u2c"):
+        timer.now = 0.25
+    with pytest.raises(RuntimeError):
+        with timings.time("wdm_device"):
+            raise RuntimeError()
+    timer.now = 1.5
+    assert timings.websocket_opened()
+    timer.now = 9.0
+    assert not timings.websocket_opened()
+
+    assert timings.durations == {"u2c": 0.25}
+    assert timings.finished_at == {"u2c": 0.25, "websocket_opened": 1.5}
+    assert timings.summary() == "u2c 0.250s, websocket_opened at 1.500s"
+    assert metrics.histogram("startup_u2c").sum == 0.25
+    assert metrics.histogram("startup_total").sum == 1.5
+
+
+def test_bot_looks_itself_up_alongside_the_device(bot):
+    bot.startup_timings = StartupTimings()
+    bot._get_device_url = lambda: "https://wdm.example.com"
+    bot._get_device_info = lambda: {"webSocketUrl": "wss://example.com"}
+
+    results = WebexBot.bootstrap(bot)
+
+    assert set(results) == {"wdm_device", "people_me"}
+    assert results["people_me"].emails == ["bot@example.com"]
+    assert bot.device_url == "https://wdm.example.com"
+    assert set(bot.startup_timings.durations) == {"u2c", "wdm_device", "people_me"}
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from webex_bot.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set_counts_hits_and_misses():
+    cache = TTLCache()
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 1024}
+
+
+def test_entries_expire():
+    timer = FakeTimer()
+    cache = TTLCache(ttl=10, timer=timer)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    timer.now = 5
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    timer.now = 11
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_get_or_load_caches_falsy_values():
+    cache = TTLCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return False
+
+    assert cache.get_or_load("a", loader) is False
+    assert cache.get_or_load("a", loader) is False
+    assert len(calls) == 1
+
+
+def test_get_or_load_ttl_function():
+    timer = FakeTimer()
+    cache = TTLCache(ttl=100, timer=timer)
+    cache.get_or_load("yes", lambda: True, ttl=lambda value: 100 if value else 1)
+    cache.get_or_load("no", lambda: False, ttl=lambda value: 100 if value else 1)
+    timer.now = 2
+    assert cache.get("yes") is True
+    assert cache.get("no") is None
+
+
+def test_get_or_load_single_flight():
+    cache = TTLCache()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    def worker():
+        results.append(cache.get_or_load("key", loader))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_get_or_load_does_not_cache_errors():
+    cache = TTLCache()
+
+    def loader():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_load("key", loader)
+    assert cache.get_or_load("key", lambda: 1) == 1
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,63 @@
+import pytest
+from webexpythonsdk.models.cards import AdaptiveCard, TextBlock
+from webexpythonsdk.models.cards.actions import Submit
+
+from webex_bot.cards.template import CardTemplate, slot
+
+
+def _card():
+    return AdaptiveCard(
+        body=[TextBlock(slot("title")), TextBlock(f"Hello {slot('name')}, you have {slot('count')} alerts"),
+              TextBlock("Static text")],
+        actions=[Submit(title="Go", data={"callback_keyword": "go", "page": slot("page")})])
+
+
+def test_render_fills_slots():
+    template = CardTemplate(_card())
+    assert template.slots == {"title", "name", "count", "page"}
+    content = template.render(title="Report", name="Ann", count=3, page=2)
+    assert content["body"][0]["text"] == "Report"
+    assert content["body"][1]["text"] == "Hello Ann, you have 3 alerts"
+    assert content["actions"][0]["data"] == {"callback_keyword": "go", "page": 2}
+
+
+def test_render_matches_building_the_card():
+    template = CardTemplate(_card())
+    rendered = template.render(title="Report", name="Ann", count="3", page="2")
+    built = AdaptiveCard(
+        body=[TextBlock("Report"), TextBlock("Hello Ann, you have 3 alerts"), TextBlock("Static text")],
+        actions=[Submit(title="Go", data={"callback_keyword": "go", "page": "2"})]).to_dict()
+    assert rendered == built
+
+
+def test_render_only_copies_what_changes():
+    template = CardTemplate(_card())
+    first = template.render(title="a", name="b", count=1, page=1)
+    second = template.render(title="c", name="d", count=2, page=2)
+    assert first["body"] is not template.content["body"]
+    assert first["body"][2] is template.content["body"][2]
+    assert template.content["body"][0]["text"] == "${title}"
+    assert first["body"][0]["text"] == "a"
+    assert second["body"][0]["text"] == "c"
+
+
+def test_template_without_slots_returns_content():
+    template = CardTemplate({"type": "AdaptiveCard", "body": []})
+    assert template.render() is template.content
+
+
+def test_missing_slot_value_raises():
+    template = CardTemplate(_card())
+    with pytest.raises(KeyError):
+        template.render(title="Report")
+
+
+def test_invalid_slot_name():
+    with pytest.raises(ValueError):
+        slot("not valid")
+
+
+def test_render_response():
+    response = CardTemplate(_card()).render_response(title="a", name="b", count=1, page=1)
+    assert response.attachments[0]["contentType"] == "application/vnd.microsoft.card.adaptive"
+    assert response.attachments[0]["content"]["body"][0]["text"] == "a"
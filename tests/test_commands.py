@@ -47,3 +47,36 @@ def test_help_command_builds_actions_excluding_help():
 
 def test_help_command_keyword_constant():
     assert HELP_COMMAND_KEYWORD == "help"
+
+
+def _help_command():
+    return HelpCommand(bot_name="Bot", bot_help_subtitle="Help", bot_help_image="https://example.com/image.png")
+
+
+def test_help_card_patches_thread_parent_id_per_request():
+    help_command = _help_command()
+    help_command.commands = {help_command, SimpleCommand(keyword="ping", help_message="Ping")}
+    first = help_command.build_card("", None, {"id": "act-1"})
+    second = help_command.build_card("", None, {"id": "act-2", "parent": {"id": "p", "type": "reply"}})
+    first_actions = first.attachments[0]["content"]["actions"]
+    second_actions = second.attachments[0]["content"]["actions"]
+    assert first_actions[0]["data"] == {COMMAND_KEYWORD_KEY: "ping", "thread_parent_id": "act-1"}
+    assert second_actions[0]["data"] == {COMMAND_KEYWORD_KEY: "ping", "thread_parent_id": None}
+
+
+def test_help_card_is_cached_until_commands_change():
+    help_command = _help_command()
+    commands = {help_command, SimpleCommand(keyword="ping", help_message="Ping")}
+    help_command.commands = commands
+    help_command.build_card("", None, {"id": "act-1"})
+    cached = help_command._card_content
+    help_command.build_card("", None, {"id": "act-2"})
+    assert help_command._card_content is cached
+
+    commands.add(SimpleCommand(keyword="pong", help_message="Pong"))
+    response = help_command.build_card("", None, {"id": "act-3"})
+    assert help_command._card_content is not cached
+    assert len(response.attachments[0]["content"]["actions"]) == 2
+
+    help_command.invalidate_card()
+    assert help_command._card_content is None
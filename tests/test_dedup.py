@@ -0,0 +1,74 @@
+from webex_bot.dedup import MemoryDedupStore, SqliteDedupStore
+
+
+class FakeTimer:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_store_detects_duplicates():
+    store = MemoryDedupStore()
+    assert store.check_and_add("act-1") is False
+    assert store.check_and_add("act-1") is True
+    assert store.check_and_add("act-2") is False
+    assert store.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+
+def test_memory_store_forgets_after_window():
+    timer = FakeTimer()
+    store = MemoryDedupStore(window=10, timer=timer)
+    store.check_and_add("act-1")
+    timer.now += 5
+    store.check_and_add("act-2")
+    timer.now += 6
+    assert len(store) == 2
+    assert store.check_and_add("act-1") is False
+    assert store.check_and_add("act-2") is True
+
+
+def test_memory_store_is_bounded():
+    store = MemoryDedupStore(maxsize=2)
+    for activity_id in ("a", "b", "c"):
+        store.check_and_add(activity_id)
+    assert len(store) == 2
+    assert store.check_and_add("a") is False
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "dedup" / "activities.db")
+    timer = FakeTimer()
+    store = SqliteDedupStore(path, window=10, timer=timer)
+    assert store.check_and_add("act-1") is False
+    assert store.check_and_add("act-1") is True
+    store.close()
+
+    store = SqliteDedupStore(path, window=10, timer=timer)
+    assert store.check_and_add("act-1") is True
+    timer.now += 11
+    assert store.check_and_add("act-1") is False
+    assert store.stats() == {"hits": 1, "misses": 1, "size": 1}
+    store.close()
+
+
+def test_sqlite_store_purges_expired_ids(tmp_path):
+    timer = FakeTimer()
+    store = SqliteDedupStore(str(tmp_path / "activities.db"), window=10, purge_interval=0, timer=timer)
+    store.check_and_add("act-1")
+    timer.now += 11
+    store.check_and_add("act-2")
+    assert len(store) == 1
+    store.close()
+
+
+def test_contains_does_not_record(tmp_path):
+    stores = [MemoryDedupStore(), SqliteDedupStore(str(tmp_path / "activities.db"))]
+    for store in stores:
+        assert store.contains("act-1") is False
+        assert store.contains("act-1") is False
+        store.add("act-1")
+        assert store.contains("act-1") is True
+        assert store.check_and_add("act-1") is True
+    stores[1].close()
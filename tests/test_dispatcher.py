@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from webex_bot.dispatcher import KeyedDispatcher
+
+
+def test_same_key_runs_in_submission_order():
+    dispatcher = KeyedDispatcher(max_workers=4)
+    seen = []
+
+    def task(i):
+        time.sleep(0.001 * (5 - i))
+        seen.append(i)
+
+    futures = [dispatcher.submit("room-1", task, i) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    dispatcher.shutdown()
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def test_different_keys_run_in_parallel():
+    dispatcher = KeyedDispatcher(max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    futures = [dispatcher.submit(room, barrier.wait) for room in ("room-1", "room-2")]
+    for future in futures:
+        future.result(timeout=5)
+    dispatcher.shutdown()
+
+
+def test_exception_is_returned_on_future_and_counted():
+    dispatcher = KeyedDispatcher(max_workers=1)
+
+    def boom():
+        raise ValueError("boom")
+
+    future = dispatcher.submit("room-1", boom)
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+    dispatcher.submit("room-1", lambda: None).result(timeout=5)
+    dispatcher.shutdown()
+    stats = dispatcher.stats()
+    assert stats["failed"] == 1
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_queue_depth_counts_waiting_tasks():
+    dispatcher = KeyedDispatcher(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    dispatcher.submit("room-1", block)
+    started.wait(5)
+    dispatcher.submit("room-1", lambda: None)
+    dispatcher.submit("room-2", lambda: None)
+    assert dispatcher.queue_depth == 2
+    release.set()
+    dispatcher.shutdown()
+    assert dispatcher.queue_depth == 0
+
+
+def test_submit_after_shutdown_raises():
+    dispatcher = KeyedDispatcher(max_workers=1)
+    dispatcher.shutdown()
+    with pytest.raises(RuntimeError):
+        dispatcher.submit(None, lambda: None)
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        KeyedDispatcher(max_workers=0)
+
+
+def test_join_waits_for_queued_tasks():
+    dispatcher = KeyedDispatcher(max_workers=2)
+    done = []
+    for i in range(10):
+        dispatcher.submit(i % 3, lambda i=i: (time.sleep(0.001), done.append(i)))
+    assert dispatcher.join(timeout=5) is True
+    assert sorted(done) == list(range(10))
+    dispatcher.shutdown()
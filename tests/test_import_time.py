@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+# Modules which are slow to import and only needed once a bot is created (or a feature used).
+DEFERRED_MODULES = (
+    "aiohttp",
+    "coloredlogs",
+    "webex_bot.commands.echo",
+    "webex_bot.commands.help",
+)
+# Generous, so it only fails if something heavy is imported eagerly again.
+IMPORT_BUDGET_SECONDS = 1.5
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+    @return: {module name: cumulative import time in seconds}
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_importing_the_bot_defers_heavy_modules():
+    times = import_times("webex_bot.webex_bot")
+    assert "webex_bot.webex_bot" in times
+    imported = [module for module in DEFERRED_MODULES if module in times]
+    assert imported == []
+    assert times["webex_bot.webex_bot"] < IMPORT_BUDGET_SECONDS
+
+
+def test_ssl_context_is_created_on_first_use():
+    code = ("from webex_bot.websockets import webex_websocket_client as client\n"
+            "assert client.get_ssl_context.cache_info().currsize == 0\n"
+            "assert client.ssl_context is client.get_ssl_context()\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
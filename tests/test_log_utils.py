@@ -0,0 +1,110 @@
+import logging
+import logging.handlers
+
+from webex_bot import log_utils
+from webex_bot.log_utils import HotPathLogger, queue_log_handlers, truncated
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class CountingStr(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "payload"
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_logger(name, level=logging.DEBUG):
+    logger = logging.getLogger(name)
+    logger.handlers = []
+    logger.propagate = False
+    logger.setLevel(level)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def test_truncated_only_formats_when_emitted():
+    value = CountingStr()
+    logger, handler = make_logger("test_log_utils.lazy", level=logging.INFO)
+    logger.debug("value=%s", truncated(value))
+    assert value.calls == 0
+    logger.info("value=%s", truncated(value))
+    assert value.calls == 1
+    assert handler.messages == ["value=payload"]
+
+
+def test_truncated_cuts_long_payloads():
+    assert str(truncated("x" * 20, limit=5)) == "xxxxx... (15 more chars)"
+    assert str(truncated({"a": 1})) == "{'a': 1}"
+
+
+def test_hot_path_logger_rate_limits_each_line():
+    timer = FakeTimer()
+    logger, handler = make_logger("test_log_utils.rate")
+    hot = HotPathLogger(logger, max_per_interval=2, interval=60, timer=timer)
+    for i in range(5):
+        hot.warning("repeated %s", i)
+    hot.warning("other line")
+    assert handler.messages == ["repeated 0", "repeated 1", "other line"]
+
+    timer.now = 61
+    hot.warning("repeated %s", 5)
+    assert handler.messages[-1] == "repeated 5 (3 similar lines dropped)"
+
+
+def test_hot_path_logger_samples():
+    logger, handler = make_logger("test_log_utils.sample")
+    hot = HotPathLogger(logger, max_per_interval=0, sample_every=3)
+    for i in range(7):
+        hot.info("event %s", i)
+    assert handler.messages == ["event 0", "event 3 (2 similar lines dropped)", "event 6 (2 similar lines dropped)"]
+
+
+def test_hot_path_logger_skips_disabled_levels():
+    value = CountingStr()
+    logger, handler = make_logger("test_log_utils.disabled", level=logging.WARNING)
+    hot = HotPathLogger(logger)
+    hot.debug("value=%s", value)
+    hot.info("value=%s", value)
+    assert handler.messages == [] and value.calls == 0
+    assert hot._lines == {}
+
+
+def test_queue_log_handlers_moves_handlers_to_background_thread(monkeypatch):
+    monkeypatch.setattr(log_utils, "_queue_handler", None)
+    monkeypatch.setattr(log_utils, "_queue_listener", None)
+    logger, handler = make_logger("test_log_utils.queue")
+
+    listener = queue_log_handlers([handler], logger=logger)
+    try:
+        assert handler not in logger.handlers
+        assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+        logger.info("queued %s", 1)
+        replacement = ListHandler()
+        logger.addHandler(replacement)
+        # A second call replaces queued handlers of the same type
+        listener = queue_log_handlers([replacement], logger=logger)
+        assert listener.handlers == (replacement,)
+        logger.info("queued %s", 2)
+    finally:
+        log_utils._stop_queue_listener()
+    assert handler.messages == ["queued 1"]
+    assert replacement.messages == ["queued 2"]
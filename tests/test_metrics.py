@@ -0,0 +1,152 @@
+import asyncio
+import types
+import urllib.request
+
+from webex_bot.dispatcher import KeyedDispatcher
+from webex_bot.metrics import Histogram, Metrics, MetricsServer, NULL_METRICS
+from webex_bot.models.command import Command
+from webex_bot.scheduler import OutboundScheduler
+from webex_bot.websockets.webex_websocket_client import WebexWebsocketClient
+
+
+class PingCommand(Command):
+    def __init__(self):
+        super().__init__(command_keyword="ping", help_message="Ping")
+
+    def execute(self, message, attachment_actions, activity):
+        return "pong"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative_counts() == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 2.65
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.99) == float("inf")
+
+
+def test_metrics_time_and_command_scope():
+    metrics = Metrics(buckets=(1.0,))
+    with metrics.command_scope("ping"):
+        with metrics.time("execute"):
+            pass
+        metrics.observe("ack", 0.5, command="")
+    metrics.observe("execute", 2.0)
+
+    assert metrics.histogram("execute", "ping").count == 1
+    assert metrics.histogram("ack", "").count == 1
+    assert metrics.histogram("execute", "").sum == 2.0
+    assert metrics.snapshot()[("execute", "ping")]["count"] == 1
+
+
+def test_render_prometheus():
+    metrics = Metrics(buckets=(0.1,))
+    metrics.observe("execute", 0.05, command='say "hi"')
+    text = metrics.render_prometheus()
+    assert "# TYPE webex_bot_stage_duration_seconds histogram" in text
+    assert 'webex_bot_stage_duration_seconds_bucket{stage="execute",command="say \\"hi\\"",le="0.1"} 1' in text
+    assert 'webex_bot_stage_duration_seconds_bucket{stage="execute",command="say \\"hi\\"",le="+Inf"} 1' in text
+    assert 'webex_bot_stage_duration_seconds_count{stage="execute",command="say \\"hi\\""} 1' in text
+
+
+def test_null_metrics_records_nothing():
+    with NULL_METRICS.command_scope("ping"):
+        with NULL_METRICS.time("execute"):
+            pass
+    NULL_METRICS.observe("execute", 1.0)
+    assert not NULL_METRICS.enabled
+    assert NULL_METRICS.snapshot() == {}
+    assert NULL_METRICS.render_prometheus() == ""
+
+
+def test_metrics_server_serves_prometheus_text():
+    metrics = Metrics()
+    metrics.observe("execute", 0.01, command="ping")
+    server = MetricsServer(metrics, port=0).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.stop()
+    assert 'webex_bot_stage_duration_seconds_count{stage="execute",command="ping"} 1' in body
+
+
+def test_bot_records_stages_labelled_by_command(bot, teams_message, group_activity):
+    metrics = Metrics()
+    bot.metrics = metrics
+    bot.outbound = OutboundScheduler(bot.outbound_teams.messages, metrics=metrics)
+    bot.add_command(PingCommand())
+    teams_message.text = "ping"
+
+    bot.process_incoming_message(teams_message, group_activity)
+
+    assert metrics.histogram("approval", "").count == 1
+    assert metrics.histogram("command_match", "").count == 1
+    assert metrics.histogram("pre_execute", "ping").count == 1
+    assert metrics.histogram("execute", "ping").count == 1
+    assert metrics.histogram("messages_create", "ping").count == 1
+
+
+def test_pipelined_sends_are_labelled_by_command(bot, group_activity):
+    metrics = Metrics()
+    bot.metrics = metrics
+    bot.outbound = OutboundScheduler(bot.outbound_teams.messages, metrics=metrics)
+    bot.reply_concurrency = 2
+    bot.reply_dispatcher = KeyedDispatcher(max_workers=2)
+
+    with metrics.command_scope("many"):
+        bot.do_reply(["one", "two"], "room-1", "user@example.com", False, False, "parent-1")
+
+    assert metrics.histogram("messages_create", "many").count == 2
+
+
+def test_client_records_decode_queue_wait_and_fetch():
+    metrics = Metrics()
+    client = WebexWebsocketClient.__new__(WebexWebsocketClient)
+    client.metrics = metrics
+    client.async_ingress = None
+    client.dispatcher = KeyedDispatcher(max_workers=1)
+    client.share_id = None
+    client.activity_filter = None
+    client.dedup_store = None
+    client.on_message = lambda teams_message, activity: None
+    client.teams = types.SimpleNamespace(messages=types.SimpleNamespace(get=lambda message_id: None))
+    client._get_base64_message_id = lambda activity: "msg-id"
+    client._send_frame = lambda frame, stage=None: True
+    frame = ('{"id": "frame-1", "data": {"eventType": "conversation.activity", "activity": '
+             '{"id": "act-1", "verb": "post", "target": {"id": "room-1", "url": "https://conv/conversations/room-1"}}}}')
+
+    client._handle_websocket_frame(frame)
+    assert client.dispatcher.join(timeout=5)
+
+    for stage in ("receive", "decode", "queue_wait", "message_id", "message_fetch"):
+        assert metrics.histogram(stage, "").count == 1, stage
+
+
+def test_ack_is_timed_until_the_frame_is_written():
+    metrics = Metrics()
+    client = WebexWebsocketClient.__new__(WebexWebsocketClient)
+    client.metrics = metrics
+    written = []
+
+    async def send(frame):
+        await asyncio.sleep(0.05)
+        written.append(frame)
+
+    async def scenario():
+        client._loop = asyncio.get_running_loop()
+        client._outbound_queue = asyncio.Queue()
+        client._ack_message("msg-id")
+        sender = asyncio.ensure_future(client._websocket_send_loop(types.SimpleNamespace(send=send),
+                                                                   client._outbound_queue))
+        while not written:
+            await asyncio.sleep(0.01)
+        sender.cancel()
+
+    asyncio.run(scenario())
+    assert metrics.histogram("ack", "").count == 1
+    assert metrics.histogram("ack", "").sum >= 0.05
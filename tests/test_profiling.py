@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+from webex_bot.models.command import Command
+from webex_bot.profiling import CommandProfiler, NOT_PROFILED, SLOW_CALLS_FILE
+
+
+class SlowCommand(Command):
+    def __init__(self, delay=0.0):
+        super().__init__(command_keyword="slow", help_message="Slow")
+        self.delay = delay
+
+    def execute(self, message, attachment_actions, activity):
+        time.sleep(self.delay)
+        return "done"
+
+
+def test_commands_are_not_profiled_unless_enabled(tmp_path):
+    profiler = CommandProfiler(str(tmp_path))
+    assert profiler.profile("slow", "execute") is NOT_PROFILED
+    profiler.enable("slow")
+    assert profiler.profile("slow", "execute") is not NOT_PROFILED
+    profiler.disable("slow")
+    assert profiler.profile("slow", "execute") is NOT_PROFILED
+
+
+def test_sampled_call_writes_profile(tmp_path):
+    profiler = CommandProfiler(str(tmp_path), slow_threshold=10)
+    profiler.enable("slow", sample_rate=1.0)
+    with profiler.profile("slow", "execute"):
+        sum(range(1000))
+
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].endswith("-slow-execute.prof")
+    assert profiler.stats()["profiled"] == 1
+
+
+def test_unsampled_call_writes_nothing_unless_slow(tmp_path):
+    profiler = CommandProfiler(str(tmp_path), sample_rate=0.0, slow_threshold=0.0)
+    profiler.enable("fast")
+    profiler.slow_threshold = 10
+    with profiler.profile("fast", "execute"):
+        pass
+    assert os.listdir(tmp_path) == []
+
+    profiler.slow_threshold = 0.0
+    with profiler.profile("fast", "execute"):
+        pass
+    with open(tmp_path / SLOW_CALLS_FILE) as slow_calls:
+        record = json.loads(slow_calls.readline())
+    assert record["command"] == "fast" and record["stage"] == "execute" and record["profile"] is None
+
+
+def test_slow_sampled_call_writes_report(tmp_path):
+    profiler = CommandProfiler(str(tmp_path), sample_rate=1.0, slow_threshold=0.0)
+    profiler.enable("slow")
+    with profiler.profile("slow", "pre_execute"):
+        sorted(range(1000), reverse=True)
+
+    reports = [name for name in os.listdir(tmp_path) if name.endswith(".txt")]
+    assert len(reports) == 1
+    with open(tmp_path / reports[0]) as report:
+        assert report.readline().startswith("command=slow stage=pre_execute")
+
+
+def test_only_one_call_is_profiled_at_a_time(tmp_path):
+    profiler = CommandProfiler(str(tmp_path), sample_rate=1.0, slow_threshold=10)
+    profiler.enable("slow")
+    with profiler.profile("slow", "execute"):
+        with profiler.profile("slow", "execute"):
+            pass
+    assert profiler.stats()["profiled"] == 1
+
+
+def test_disk_usage_is_bounded(tmp_path):
+    profiler = CommandProfiler(str(tmp_path), sample_rate=1.0, slow_threshold=10, max_bytes=1)
+    profiler.enable("slow")
+    for _ in range(3):
+        with profiler.profile("slow", "execute"):
+            sum(range(100))
+    assert os.listdir(tmp_path) == []
+
+
+def test_bot_profiles_enabled_command(bot, teams_message, one_on_one_activity, tmp_path):
+    bot.profiler = CommandProfiler(str(tmp_path), sample_rate=1.0, slow_threshold=10)
+    bot.add_command(SlowCommand())
+    bot.process_raw_command("slow", teams_message, "user@example.com", one_on_one_activity)
+    assert os.listdir(tmp_path) == []
+
+    bot.profiler.enable("slow")
+    bot.process_raw_command("slow", teams_message, "user@example.com", one_on_one_activity)
+    stages = sorted(name.rsplit("-", 1)[1] for name in os.listdir(tmp_path))
+    assert stages == ["execute.prof", "pre_execute.prof"]
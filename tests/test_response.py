@@ -1,3 +1,5 @@
+import json
+
 from webexpythonsdk.models.cards import AdaptiveCard
 
 from webex_bot.models.response import Response, response_from_adaptive_card
@@ -30,3 +32,43 @@ def test_response_json_and_html_property():
     response.html = "<b>hi</b>"
     assert response.html == "<b>hi</b>"
     assert '"text": "hello"' in response.json()
+
+
+def test_response_keeps_fields_in_a_dict():
+    response = Response()
+    response.text = "hello"
+    assert isinstance(response.attributes, dict)
+    assert json.loads(json.dumps(response.attributes))["text"] == "hello"
+    response.attributes["toPersonEmail"] = "someone@example.com"
+    assert response.as_dict() == {"text": "hello", "toPersonEmail": "someone@example.com"}
+
+
+def test_response_allows_extra_attributes():
+    response = Response()
+    response.toPersonEmail = "someone@example.com"
+    assert response.toPersonEmail == "someone@example.com"
+
+
+def test_response_as_dict_result_can_be_modified():
+    response = Response()
+    response.text = "hello"
+    result = response.as_dict()
+    result["roomId"] = "room-x"
+    assert response.roomId is None
+    assert response.as_dict() == {"text": "hello"}
+
+
+def test_response_from_dict_only_has_its_own_fields():
+    response = Response({"text": "hi"})
+    assert response.json() == '{"text": "hi"}'
+    response.roomId = "room-1"
+    assert response.json() == '{"text": "hi", "roomId": "room-1"}'
+
+
+def test_response_sees_in_place_list_changes():
+    response = Response()
+    response.files = "a.png"
+    assert '"a.png"' in response.json()
+    response.files[0] = "b.png"
+    assert response.as_dict()["files"] == ["b.png"]
+    assert '"b.png"' in response.json()
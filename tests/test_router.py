@@ -0,0 +1,113 @@
+import threading
+
+from webex_bot.models.command import Command
+from webex_bot.router import CommandRouter, KeywordAutomaton
+
+
+class KeywordCommand(Command):
+    def __init__(self, command_keyword=None, exact_match=False, card_callback_keyword=None):
+        super().__init__(
+            command_keyword=command_keyword,
+            exact_command_keyword_match=exact_match,
+            card_callback_keyword=card_callback_keyword,
+        )
+
+    def execute(self, message, attachment_actions, activity):
+        return self.command_keyword
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton()
+    for keyword in ("he", "she", "his", "hers"):
+        automaton.add(keyword, keyword)
+    matches = sorted((start, value) for start, _, value in automaton.iter_matches("ushers"))
+    assert matches == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+def test_automaton_keywords_can_be_added_between_matches():
+    automaton = KeywordAutomaton()
+    for keyword in ("he", "she", "his", "hers"):
+        automaton.add(keyword, keyword)
+        list(automaton.iter_matches("ushers"))
+    matches = sorted((start, value) for start, _, value in automaton.iter_matches("ushers"))
+    assert matches == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+def test_automaton_matches_while_keywords_are_added():
+    automaton = KeywordAutomaton()
+    automaton.add("he", "he")
+    stop = threading.Event()
+    wrong = []
+
+    def match():
+        while not stop.is_set():
+            matches = sorted(value for _, _, value in automaton.iter_matches("ushers"))
+            if "he" not in matches or len(matches) != len(set(matches)):
+                wrong.append(matches)
+
+    matchers = [threading.Thread(target=match) for _ in range(4)]
+    for thread in matchers:
+        thread.start()
+    for i in range(200):
+        automaton.add(f"keyword{i}", i)
+    automaton.add("she", "she")
+    stop.set()
+    for thread in matchers:
+        thread.join()
+    assert wrong == []
+    assert sorted(value for _, _, value in automaton.iter_matches("ushers")) == ["he", "she"]
+
+
+def test_exact_match_requires_whole_message():
+    ping = KeywordCommand("ping", exact_match=True)
+    router = CommandRouter([ping])
+    assert router.match("ping") is ping
+    assert router.match("ping me") is None
+
+
+def test_exact_match_beats_substring():
+    sub = KeywordCommand("pin")
+    exact = KeywordCommand("ping", exact_match=True)
+    router = CommandRouter([sub, exact])
+    assert router.match("ping") is exact
+    assert router.match("pings") is sub
+
+
+def test_substring_prefers_earliest_then_longest():
+    echo = KeywordCommand("echo")
+    echo_all = KeywordCommand("echo all")
+    help_command = KeywordCommand("help")
+    router = CommandRouter([echo, echo_all, help_command])
+    assert router.match("please echo all of it") is echo_all
+    assert router.match("help with echo") is help_command
+    assert router.match("echo help") is echo
+
+
+def test_substring_tie_goes_to_first_registered():
+    first = KeywordCommand("status")
+    second = KeywordCommand("status")
+    router = CommandRouter([first, second])
+    assert router.match("status please") is first
+
+
+def test_callback_only_command_matched_on_typed_keyword():
+    callback = KeywordCommand(card_callback_keyword="echo_callback")
+    router = CommandRouter([callback])
+    assert router.match("echo_callback") is callback
+    assert router.match("echo_callback extra") is None
+
+
+def test_card_action_matches_command_or_callback_keyword():
+    command = KeywordCommand("ping", card_callback_keyword="ping_cb")
+    router = CommandRouter([command])
+    assert router.match("ping", is_card_callback_command=True) is command
+    assert router.match("ping_cb", is_card_callback_command=True) is command
+    assert router.match("ping please", is_card_callback_command=True) is None
+
+
+def test_add_is_idempotent():
+    command = KeywordCommand("ping")
+    router = CommandRouter([command])
+    router.add(command)
+    assert len(router) == 1
+    assert command in router
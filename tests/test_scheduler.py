@@ -0,0 +1,117 @@
+import types
+
+import pytest
+import requests
+from webexpythonsdk.exceptions import ApiError, RateLimitError
+
+from webex_bot.scheduler import OutboundScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = "error"
+    response.headers.update(headers or {})
+    response.request = requests.Request("POST", "https://webexapis.com/v1/messages").prepare()
+    return response
+
+
+class FlakyMessages:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.created = []
+
+    def create(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.created.append(kwargs)
+        return types.SimpleNamespace(id=f"message-{len(self.created)}")
+
+
+def _scheduler(messages, clock, **kwargs):
+    return OutboundScheduler(messages, sleep=clock.sleep, timer=clock, **kwargs)
+
+
+def test_token_bucket_allows_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, timer=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.now += 10
+    assert bucket.reserve() == 0
+
+
+def test_create_message_is_paced_per_room():
+    clock = FakeClock()
+    messages = FlakyMessages()
+    scheduler = _scheduler(messages, clock, room_rate=1, room_burst=1)
+    scheduler.create_message(roomId="room-1", markdown="1")
+    scheduler.create_message(roomId="room-2", markdown="1")
+    assert clock.sleeps == []
+    scheduler.create_message(roomId="room-1", markdown="2")
+    assert clock.sleeps == [pytest.approx(1.0)]
+    assert scheduler.stats()["sent"] == 3
+
+
+def test_global_bucket_paces_all_rooms():
+    clock = FakeClock()
+    scheduler = _scheduler(FlakyMessages(), clock, global_rate=1, global_burst=1)
+    scheduler.create_message(roomId="room-1", markdown="1")
+    scheduler.create_message(roomId="room-2", markdown="1")
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_rate_limit_honours_retry_after():
+    clock = FakeClock()
+    messages = FlakyMessages(errors=[RateLimitError(_response(429, {"Retry-After": "7"}))])
+    scheduler = _scheduler(messages, clock)
+    created = scheduler.create_message(roomId="room-1", markdown="hi")
+    assert created.id == "message-1"
+    assert clock.sleeps == [pytest.approx(7)]
+    stats = scheduler.stats()
+    assert stats["rate_limited"] == 1
+    assert stats["retried"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_server_errors_are_retried_with_backoff():
+    clock = FakeClock()
+    messages = FlakyMessages(errors=[ApiError(_response(503)), ApiError(_response(502))])
+    scheduler = _scheduler(messages, clock)
+    scheduler.create_message(roomId="room-1", markdown="hi")
+    assert clock.sleeps == [1, 2]
+    assert len(messages.created) == 1
+
+
+def test_retry_budget_is_bounded():
+    clock = FakeClock()
+    messages = FlakyMessages(errors=[ApiError(_response(500)) for _ in range(5)])
+    scheduler = _scheduler(messages, clock, max_retries=2)
+    with pytest.raises(ApiError):
+        scheduler.create_message(roomId="room-1", markdown="hi")
+    assert scheduler.stats()["failed"] == 1
+    assert len(messages.errors) == 2
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    messages = FlakyMessages(errors=[ApiError(_response(400))])
+    scheduler = _scheduler(messages, clock)
+    with pytest.raises(ApiError):
+        scheduler.create_message(roomId="room-1", markdown="hi")
+    assert scheduler.stats()["retried"] == 0
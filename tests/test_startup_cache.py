@@ -0,0 +1,166 @@
+import json
+import os
+import types
+
+from webexpythonsdk.models.immutable import immutable_data_factory
+
+from webex_bot.startup_cache import BOT_IDENTITY, DEVICE_INFO, WDM_URL, StartupCache
+from webex_bot.websockets.webex_websocket_client import DEVICE_DATA, WebexWebsocketClient
+
+DEVICE = {"name": DEVICE_DATA["name"], "url": "https://wdm.example.com/devices/1",
+          "webSocketUrl": "wss://mercury.example.com/v1/apps/wx2/registrations/1/messages"}
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+        self.gets = []
+        self.posts = []
+
+    def get(self, url, params=None):
+        self.gets.append(url)
+        if url.endswith("/devices"):
+            return FakeResponse({"devices": self.devices})
+        return FakeResponse({"serviceLinks": {"wdm": "https://wdm.example.com/wdm/api/v1"}})
+
+    def post(self, url, json=None):
+        self.posts.append(url)
+        return FakeResponse(DEVICE)
+
+
+def make_cache(tmp_path, token="token-1", **kwargs):
+    cache = StartupCache(str(tmp_path / "startup.json"), **kwargs)
+    cache.bind(token)
+    return cache
+
+
+def make_client(cache, session):
+    client = WebexWebsocketClient.__new__(WebexWebsocketClient)
+    client.startup_cache = cache
+    client.session = session
+    client.u2c_url = "https://u2c.example.com/u2c/api/v1/catalog"
+    return client
+
+
+def test_values_survive_a_restart(tmp_path):
+    make_cache(tmp_path).set(WDM_URL, "https://wdm.example.com/wdm/api/v1")
+    cache = make_cache(tmp_path)
+    assert cache.get(WDM_URL) == "https://wdm.example.com/wdm/api/v1"
+    assert cache.stats() == {"hits": 1, "misses": 0}
+
+
+def test_values_expire_after_ttl(tmp_path):
+    timer = FakeTimer()
+    cache = make_cache(tmp_path, ttl=60, timer=timer)
+    cache.set(WDM_URL, "https://wdm.example.com/wdm/api/v1")
+    timer.now += 59
+    assert cache.get(WDM_URL) is not None
+    timer.now += 1
+    assert cache.get(WDM_URL) is None
+
+
+def test_cache_is_ignored_for_another_token(tmp_path):
+    make_cache(tmp_path, token="token-1").set(WDM_URL, "https://wdm.example.com/wdm/api/v1")
+    assert make_cache(tmp_path, token="token-2").get(WDM_URL) is None
+    with open(tmp_path / "startup.json") as cache_file:
+        assert "token-1" not in cache_file.read()
+
+
+def test_invalid_values_are_ignored(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set(WDM_URL, "not a url")
+    cache.set(DEVICE_INFO, {"url": "https://wdm.example.com/devices/1"})
+    assert cache.get(WDM_URL) is None
+    assert cache.get(DEVICE_INFO) is None
+
+
+def test_unreadable_file_is_ignored_and_replaced(tmp_path):
+    path = tmp_path / "startup.json"
+    path.write_text("{not json")
+    cache = make_cache(tmp_path)
+    assert cache.get(WDM_URL) is None
+    cache.set(WDM_URL, "https://wdm.example.com/wdm/api/v1")
+    assert json.loads(path.read_text())["entries"][WDM_URL]["value"] == "https://wdm.example.com/wdm/api/v1"
+    # Written atomically, so no temporary files are left behind
+    assert os.listdir(tmp_path) == ["startup.json"]
+
+
+def test_invalidate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set(WDM_URL, "https://wdm.example.com/wdm/api/v1")
+    cache.set(DEVICE_INFO, DEVICE)
+    cache.invalidate(DEVICE_INFO)
+    assert cache.get(DEVICE_INFO) is None
+    assert cache.get(WDM_URL) is not None
+    cache.invalidate()
+    assert make_cache(tmp_path).get(WDM_URL) is None
+
+
+def test_client_fills_cache_then_starts_without_lookups(tmp_path):
+    session = FakeSession(devices=[DEVICE])
+    client = make_client(make_cache(tmp_path), session)
+    client.device_url = client._get_device_url()
+    assert client._get_device_info() == DEVICE
+    assert len(session.gets) == 2
+    assert not client._startup_cache_used
+
+    session = FakeSession(devices=[DEVICE])
+    client = make_client(make_cache(tmp_path), session)
+    client.device_url = client._get_device_url()
+    assert client._get_device_info() == DEVICE
+    assert client.device_url == "https://wdm.example.com/wdm/api/v1"
+    assert session.gets == []
+    assert client._startup_cache_used
+
+
+def test_client_caches_a_new_device(tmp_path):
+    session = FakeSession(devices=[])
+    client = make_client(make_cache(tmp_path), session)
+    client.device_url = "https://wdm.example.com/wdm/api/v1"
+    assert client._get_device_info() == DEVICE
+    assert session.posts == ["https://wdm.example.com/wdm/api/v1/devices"]
+    assert make_cache(tmp_path).get(DEVICE_INFO) == DEVICE
+
+
+def test_refresh_drops_a_device_which_has_gone(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set(DEVICE_INFO, DEVICE)
+    client = make_client(cache, FakeSession(devices=[]))
+    client._refresh_startup_cache()
+    assert cache.get(DEVICE_INFO) is None
+    assert cache.get(WDM_URL) == "https://wdm.example.com/wdm/api/v1"
+
+
+def test_bot_identity_is_cached(bot, tmp_path):
+    me = immutable_data_factory("person", {"displayName": "Cached Bot", "emails": ["cached@example.com"],
+                                           "type": "bot", "avatar": None})
+    calls = []
+    bot.teams = types.SimpleNamespace(people=types.SimpleNamespace(me=lambda: calls.append(1) or me))
+    bot.startup_cache = make_cache(tmp_path)
+
+    bot.get_me_info()
+    bot.bot_email = None
+    assert bot.get_me_info().displayName == "Cached Bot"
+    assert bot.bot_email == "cached@example.com"
+    assert len(calls) == 1
+    assert bot.startup_cache.get(BOT_IDENTITY)["emails"] == ["cached@example.com"]
@@ -1,7 +1,10 @@
 import types
 
 import pytest
+import requests
+import webexpythonsdk
 
+from webex_bot.dispatcher import KeyedDispatcher
 from webex_bot.models.command import Command
 from webex_bot.models.response import Response
 from webex_bot.exceptions import BotException
@@ -50,6 +53,14 @@ class ExceptionCommand(Command):
         raise BotException("debug", "reply", reply_one_to_one=False)
 
 
+def _api_error_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = "error"
+    response.request = requests.Request("PUT", "https://webexapis.com/v1/messages/card-1").prepare()
+    return response
+
+
 def test_get_message_passed_to_command():
     assert WebexBot.get_message_passed_to_command("help", "help me") == " me"
     assert WebexBot.get_message_passed_to_command("help", "hello") == "hello"
@@ -133,8 +144,10 @@ def test_process_raw_command_delete_previous_message(bot, teams_message, one_on_
     command = PreExecuteCommand(delete_previous_message=True)
     bot.add_command(command)
     bot.process_raw_command("work", teams_message, "user@example.com", one_on_one_activity)
+    assert bot.cleanup_dispatcher.join(timeout=5)
     assert teams_message.messageId in bot.teams.messages.deleted
     assert "message-1" in bot.teams.messages.deleted
+    assert bot.cleanup_stats == {"deleted": 2, "failed": 0}
 
 
 def test_process_raw_command_none_message_card_action(bot, one_on_one_activity):
@@ -161,3 +174,170 @@ def test_run_command_and_handle_bot_exceptions(bot, teams_message, one_on_one_ac
     reply, one_to_one = bot.run_command_and_handle_bot_exceptions(command, "msg", teams_message, one_on_one_activity)
     assert reply == "reply"
     assert one_to_one is False
+
+
+def test_process_raw_command_picks_up_commands_added_to_set(bot, teams_message, one_on_one_activity):
+    bot.commands.add(DummyCommand(command_keyword="ping", exact_match=True))
+    bot.process_raw_command("ping", teams_message, "user@example.com", one_on_one_activity)
+    assert bot.teams.messages.created[-1]["markdown"] == "pong"
+
+
+def test_room_membership_is_cached(bot):
+    calls = []
+    original_list = bot.teams.memberships.list
+
+    def counting_list(roomId, personEmail):
+        calls.append((roomId, personEmail))
+        return original_list(roomId=roomId, personEmail=personEmail)
+
+    bot.teams.memberships.list = counting_list
+    for _ in range(3):
+        assert bot.check_user_approved("member@example.com", approved_rooms=["room-1"]) is True
+        assert bot.check_user_approved("outsider@example.com", approved_rooms=["room-1"]) is False
+    assert calls == [("room-1", "member@example.com"), ("room-1", "outsider@example.com")]
+    assert bot.membership_cache.hits == 4
+
+
+def test_check_user_approved_users_list_update(bot):
+    bot.approved_users = ["first@example.com"]
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is True
+    bot.approved_users = ["second@example.com"]
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is False
+    bot.approved_users.append("first@example.com")
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is True
+    bot.approved_users.remove("first@example.com")
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is False
+    bot.approved_domains += ["example.com"]
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is True
+    bot.approved_domains[0] = "other.com"
+    assert bot.check_user_approved("first@example.com", approved_rooms=[]) is False
+
+
+def _actor_activity(actor_type="PERSON", actor_email="user@example.com"):
+    return {"id": "act-1", "actor": {"type": actor_type, "emailAddress": actor_email}}
+
+
+def test_accept_activity_rejects_self_and_other_bots(bot):
+    assert bot.accept_activity(_actor_activity(actor_type="BOT", actor_email="bot@example.com")) is False
+    assert bot.accept_activity(_actor_activity(actor_type="BOT", actor_email="otherbot@example.com")) is False
+    bot.allow_bot_to_bot = True
+    assert bot.accept_activity(_actor_activity(actor_type="BOT", actor_email="otherbot@example.com")) is True
+    assert bot.accept_activity(_actor_activity(actor_type="BOT", actor_email="bot@example.com")) is False
+
+
+def test_accept_activity_checks_approval(bot):
+    bot.approved_domains = ["example.com"]
+    assert bot.accept_activity(_actor_activity(actor_email="user@example.com")) is True
+    assert bot.accept_activity(_actor_activity(actor_email="user@other.com")) is False
+    assert bot.accept_activity({"id": "act-1", "actor": {}}) is True
+
+
+def test_do_reply_pipelined_generator_keeps_order(bot):
+    bot.reply_concurrency = 3
+    bot.reply_dispatcher = KeyedDispatcher(max_workers=3)
+
+    def replies():
+        for i in range(10):
+            response = Response()
+            response.markdown = f"result {i}"
+            yield response
+        yield "done"
+
+    bot.do_reply(replies(), "room-1", "user@example.com", False, True, "thread-1")
+    bot.reply_dispatcher.shutdown()
+    created = bot.teams.messages.created
+    assert [message["markdown"] for message in created] == [f"result {i}" for i in range(10)] + ["done"]
+    assert all(message["roomId"] == "room-1" for message in created)
+
+
+def test_do_reply_pipelined_raises_send_errors(bot):
+    bot.reply_concurrency = 2
+    bot.reply_dispatcher = KeyedDispatcher(max_workers=2)
+
+    def fail(**kwargs):
+        raise ValueError("send failed")
+
+    bot.outbound.create_message = fail
+    with pytest.raises(ValueError):
+        bot.do_reply(["one", "two"], "room-1", "user@example.com", False, True, "thread-1")
+    bot.reply_dispatcher.shutdown()
+
+
+def test_failed_background_delete_is_counted(bot):
+    def fail(message_id):
+        raise ValueError("delete failed")
+
+    bot.teams.messages.delete = fail
+    assert bot.delete_message_in_background("msg-1", "room-1").result(timeout=5) is False
+    assert bot.cleanup_stats == {"deleted": 0, "failed": 1}
+
+
+class UpdateCommand(Command):
+    def __init__(self, reply, pre_execute_reply="Working on it..."):
+        super().__init__(card_callback_keyword="update_cb", update_previous_message=True)
+        self.reply = reply
+        self.pre_execute_reply = pre_execute_reply
+
+    def pre_execute(self, message, attachment_actions, activity):
+        return self.pre_execute_reply
+
+    def execute(self, message, attachment_actions, activity):
+        return self.reply
+
+
+def _card_action(callback_keyword="update_cb"):
+    return types.SimpleNamespace(inputs={"callback_keyword": callback_keyword}, roomId="room-1", messageId="card-1")
+
+
+def test_update_previous_message_edits_pre_execute_message(bot, one_on_one_activity):
+    bot.add_command(UpdateCommand("updated"))
+    bot.process_incoming_card_action(_card_action(), one_on_one_activity)
+    assert bot.cleanup_dispatcher.join(timeout=5)
+    # Webex cannot edit the card, so it is deleted, but the pre-execute message becomes the reply
+    assert bot.teams.messages.deleted == ["card-1"]
+    assert [message["markdown"] for message in bot.teams.messages.created] == ["Working on it..."]
+    assert bot.teams.messages.updated == [{"messageId": "message-1", "roomId": "room-1", "text": None,
+                                           "markdown": "updated"}]
+
+
+def test_update_previous_message_posts_card_replies(bot, one_on_one_activity):
+    card = Response()
+    card.attachments = {"contentType": "application/vnd.microsoft.card.adaptive", "content": {}}
+    bot.add_command(UpdateCommand(card))
+    bot.process_incoming_card_action(_card_action(), one_on_one_activity)
+    assert bot.cleanup_dispatcher.join(timeout=5)
+    assert bot.teams.messages.updated == []
+    assert bot.teams.messages.deleted == ["card-1", "message-1"]
+    assert len(bot.teams.messages.created) == 2
+
+
+def test_update_previous_message_does_not_edit_card_pre_execute_messages(bot, one_on_one_activity):
+    card = Response()
+    card.attachments = {"contentType": "application/vnd.microsoft.card.adaptive", "content": {}}
+    bot.add_command(UpdateCommand("updated", pre_execute_reply=card))
+    bot.process_incoming_card_action(_card_action(), one_on_one_activity)
+    assert bot.cleanup_dispatcher.join(timeout=5)
+    assert bot.teams.messages.updated == []
+    assert bot.teams.messages.deleted == ["card-1", "message-1"]
+    assert bot.teams.messages.created[-1]["markdown"] == "updated"
+
+
+def test_update_previous_message_falls_back_when_edit_fails(bot, one_on_one_activity):
+    def fail(**kwargs):
+        raise webexpythonsdk.exceptions.ApiError(_api_error_response(403))
+
+    bot.teams.messages.update = fail
+    bot.add_command(UpdateCommand("updated"))
+    bot.process_incoming_card_action(_card_action(), one_on_one_activity)
+    assert bot.cleanup_dispatcher.join(timeout=5)
+    assert bot.teams.messages.deleted == ["card-1", "message-1"]
+    assert bot.teams.messages.created[-1]["markdown"] == "updated"
+
+
+def test_add_command_refreshes_help_card(bot, teams_message, one_on_one_activity):
+    teams_message.text = "unknown"
+    bot.process_incoming_message(teams_message, one_on_one_activity)
+    bot.add_command(DummyCommand(command_keyword="ping"))
+    bot.process_incoming_message(teams_message, one_on_one_activity)
+    actions = bot.teams.messages.created[-1]["attachments"][0]["content"]["actions"]
+    assert [action["data"]["command_keyword"] for action in actions] == ["ping"]
@@ -1,5 +1,9 @@
+import asyncio
+import json
+import threading
 from unittest.mock import MagicMock
 
+from webex_bot.dedup import MemoryDedupStore
 from webex_bot.websockets.webex_websocket_client import (
     WebexWebsocketClient,
     BACKOFF_EXCEPTIONS,
@@ -29,6 +33,8 @@ def _make_client_for_message_processing():
     client.share_id = None
     client.on_message = MagicMock()
     client.on_card_action = MagicMock()
+    client.activity_filter = None
+    client.dedup_store = None
     client.teams = MagicMock()
     return client
 
@@ -174,3 +180,324 @@ class TestProcessIncomingWebsocketMessage:
 
         client.on_message.assert_not_called()
         client.teams.messages.get.assert_not_called()
+
+
+# --- outbound frame queue tests ---
+
+class TestOutboundQueue:
+    def test_ack_message_is_queued_on_connection_loop(self):
+        client = _make_client()
+        loop = asyncio.new_event_loop()
+        try:
+            client._loop = loop
+            client._outbound_queue = asyncio.Queue()
+
+            client._ack_message("msg-id")
+            loop.run_until_complete(asyncio.sleep(0))
+
+            frame, stage, _ = client._outbound_queue.get_nowait()
+            assert json.loads(frame) == {"type": "ack", "messageId": "msg-id"}
+            assert stage == "ack"
+        finally:
+            loop.close()
+
+    def test_send_frame_without_connection_is_dropped(self):
+        client = _make_client()
+        client._loop = None
+        client._outbound_queue = None
+        assert client._send_frame({"type": "ack"}) is False
+
+    def test_send_loop_writes_frames_in_order(self):
+        client = _make_client()
+        websocket = MagicMock()
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        websocket.send = send
+
+        async def scenario():
+            queue = asyncio.Queue()
+            for i in range(3):
+                queue.put_nowait((str(i), None, None))
+            task = asyncio.ensure_future(client._websocket_send_loop(websocket, queue))
+            await asyncio.sleep(0.01)
+            task.cancel()
+
+        asyncio.run(scenario())
+        assert sent == ["0", "1", "2"]
+
+
+def test_dispatch_key_is_room_id():
+    msg = {"data": {"eventType": "conversation.activity", "activity": _make_activity()}}
+    assert WebexWebsocketClient._get_dispatch_key(msg) == "conv-456"
+    assert WebexWebsocketClient._get_dispatch_key({"data": {}}) is None
+
+
+class TestActivityFilter:
+    def _wrap_activity(self, activity):
+        return {"id": "ws-msg-1", "data": {"eventType": "conversation.activity", "activity": activity}}
+
+    def test_rejected_post_is_acked_without_rest_calls(self):
+        client = _make_client_for_message_processing()
+        client.activity_filter = MagicMock(return_value=False)
+        client._ack_message = MagicMock()
+        client._process_incoming_websocket_message(self._wrap_activity(_make_activity(verb="post")))
+
+        client.session.get.assert_not_called()
+        client.teams.messages.get.assert_not_called()
+        client.on_message.assert_not_called()
+        client._ack_message.assert_called_once_with("ws-msg-1")
+
+    def test_accepted_post_is_processed(self):
+        client = _make_client_for_message_processing()
+        client.activity_filter = MagicMock(return_value=True)
+        client._get_base64_message_id = MagicMock(return_value="msg-id")
+        client._ack_message = MagicMock()
+        client._process_incoming_websocket_message(self._wrap_activity(_make_activity(verb="post")))
+
+        client.on_message.assert_called_once()
+        client._ack_message.assert_called_once_with("msg-id")
+
+    def test_card_actions_are_not_filtered(self):
+        client = _make_client_for_message_processing()
+        client.activity_filter = MagicMock(return_value=False)
+        client._get_base64_message_id = MagicMock(return_value="action-id")
+        client._ack_message = MagicMock()
+        client._process_incoming_websocket_message(self._wrap_activity(_make_activity(verb="cardAction")))
+
+        client.activity_filter.assert_not_called()
+        client.on_card_action.assert_called_once()
+
+
+def test_redelivered_activity_is_only_processed_once():
+    client = _make_client_for_message_processing()
+    client.dedup_store = MemoryDedupStore()
+    client._get_base64_message_id = MagicMock(return_value="msg-id")
+    client._ack_message = MagicMock()
+    msg = {"id": "ws-msg-1", "data": {"eventType": "conversation.activity", "activity": _make_activity(verb="post")}}
+
+    client._process_incoming_websocket_message(msg)
+    client._process_incoming_websocket_message(msg)
+
+    client.on_message.assert_called_once()
+    client._get_base64_message_id.assert_called_once()
+    assert client.dedup_store.hits == 1
+
+
+class _StopRun(BaseException):
+    pass
+
+
+def _make_client_for_reconnect(monkeypatch, errors):
+    """
+    Build a client whose websocket connections fail with each of errors in turn, after which run() is stopped.
+    """
+    from webex_bot.websockets import webex_websocket_client as module
+
+    client = _make_client()
+    client.proxies = None
+    client.async_ingress = None
+    client.device_url = "https://wdm.example.com"
+    client.device_info = {"url": "https://wdm.example.com/devices/1", "webSocketUrl": "wss://mercury/1"}
+    client.registrations = 0
+    client.session = MagicMock()
+    client.session.get.return_value.json.return_value = {"devices": [
+        {"name": "python-spark-client", "url": "https://wdm.example.com/devices/1", "webSocketUrl": "wss://mercury/1"}]}
+    client.connected_to = []
+
+    def register(check_existing=True):
+        client.registrations += 1
+        client.device_info = {"webSocketUrl": f"wss://mercury/new-{client.registrations}"}
+        return client.device_info
+
+    client._get_device_info = register
+    errors = list(errors)
+
+    test_thread = threading.current_thread()
+
+    def connect(ws_url, **kwargs):
+        if threading.current_thread() is not test_thread:
+            # Another client, e.g. a bot an end-to-end test left reconnecting to its stopped fake Webex
+            raise ConnectionRefusedError()
+        client.connected_to.append(ws_url)
+        raise errors.pop(0) if errors else _StopRun()
+
+    monkeypatch.setattr(module.websockets, "connect", connect)
+    monkeypatch.setattr(module, "reconnect_delay", lambda failures: 0)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    return client
+
+
+def _invalid_status(status_code):
+    return InvalidStatus(MagicMock(status_code=status_code))
+
+
+def test_transient_errors_reconnect_to_the_same_device(monkeypatch):
+    client = _make_client_for_reconnect(monkeypatch, [ConnectionRefusedError()] * 4)
+    try:
+        client.run()
+    except _StopRun:
+        pass
+    assert client.connected_to == ["wss://mercury/1"] * 5
+    assert client.registrations == 0
+    # The device is checked once, after the third failure in a row
+    assert client.session.get.call_count == 1
+
+
+def test_device_is_registered_again_if_it_has_gone(monkeypatch):
+    client = _make_client_for_reconnect(monkeypatch, [ConnectionRefusedError()] * 3)
+    client.session.get.return_value.json.return_value = {"devices": []}
+    try:
+        client.run()
+    except _StopRun:
+        pass
+    assert client.registrations == 1
+    assert client.connected_to[-1] == "wss://mercury/new-1"
+
+
+def test_404_registers_a_new_device(monkeypatch):
+    client = _make_client_for_reconnect(monkeypatch, [_invalid_status(404), _invalid_status(503)])
+    try:
+        client.run()
+    except _StopRun:
+        pass
+    assert client.registrations == 1
+    assert client.connected_to == ["wss://mercury/1", "wss://mercury/new-1", "wss://mercury/new-1"]
+
+
+def test_unauthorized_is_not_retried(monkeypatch):
+    client = _make_client_for_reconnect(monkeypatch, [_invalid_status(401)])
+    try:
+        client.run()
+        raise AssertionError("run() should have raised")
+    except InvalidStatus:
+        pass
+    assert client.connected_to == ["wss://mercury/1"]
+
+
+def test_reconnect_delay_is_jittered_and_capped():
+    from webex_bot.websockets.webex_websocket_client import reconnect_delay
+
+    assert [reconnect_delay(n, random=lambda: 1.0) for n in (0, 1, 2, 10)] == [1.0, 2.0, 4.0, 60.0]
+    assert reconnect_delay(3, random=lambda: 0.5) == 4.0
+
+
+def test_recovery_time_is_recorded():
+    from webex_bot.metrics import Metrics
+
+    client = _make_client()
+    client.metrics = Metrics()
+    client._websocket_opened()
+    assert client.metrics.histogram("reconnect") is None
+    client._disconnected_at = 0.0
+    client._websocket_opened()
+    assert client.metrics.histogram("reconnect").count == 1
+    assert client._disconnected_at is None
+
+
+class _FakeWebsocket(object):
+    def __init__(self, answer_pings=True):
+        self.answer_pings = answer_pings
+        self.transport = MagicMock()
+        self.pings = 0
+
+    async def ping(self):
+        self.pings += 1
+        pong_waiter = asyncio.get_running_loop().create_future()
+        if self.answer_pings:
+            pong_waiter.set_result(0.0)
+        return pong_waiter
+
+
+def _make_client_for_liveness(ping_interval=0.01, ping_timeout=0.05, idle_timeout=None):
+    import time
+
+    from webex_bot.metrics import Metrics
+
+    client = _make_client()
+    client.metrics = Metrics()
+    client.ping_interval = ping_interval
+    client.ping_timeout = ping_timeout
+    client.idle_timeout = idle_timeout
+    client._last_received = time.monotonic()
+    return client
+
+
+def test_pings_record_round_trip_time():
+    client = _make_client_for_liveness()
+    websocket = _FakeWebsocket()
+
+    async def monitor_for_a_while():
+        task = asyncio.ensure_future(client._monitor_connection(websocket))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(monitor_for_a_while())
+    assert websocket.pings >= 2
+    assert client.websocket_rtt is not None
+    assert client.metrics.histogram("websocket_rtt").count == websocket.pings
+
+
+def test_unanswered_ping_aborts_the_connection():
+    from webex_bot.websockets.webex_websocket_client import ConnectionStalled
+
+    client = _make_client_for_liveness()
+    websocket = _FakeWebsocket(answer_pings=False)
+    try:
+        asyncio.run(asyncio.wait_for(client._monitor_connection(websocket), 5))
+        raise AssertionError("_monitor_connection() should have raised")
+    except ConnectionStalled:
+        pass
+    websocket.transport.abort.assert_called_once()
+    assert client.metrics.histogram("stall_detection").count == 1
+    assert ConnectionStalled in BACKOFF_EXCEPTIONS
+
+
+def test_idle_timeout_without_pings():
+    from webex_bot.websockets.webex_websocket_client import ConnectionStalled
+
+    client = _make_client_for_liveness(ping_interval=None, idle_timeout=0.02)
+    websocket = _FakeWebsocket()
+    try:
+        asyncio.run(asyncio.wait_for(client._monitor_connection(websocket), 5))
+        raise AssertionError("_monitor_connection() should have raised")
+    except ConnectionStalled:
+        pass
+    assert websocket.pings == 0
+    assert client.metrics.histogram("stall_detection").sum >= 0.02
+
+
+def test_library_pings_are_turned_off_when_the_client_pings():
+    client = _make_client_for_liveness()
+
+    def connect(uri, ping_interval=20, **kwargs):
+        pass
+
+    assert client._get_keepalive_kwargs(connect) == {"ping_interval": None}
+    client.ping_interval = None
+    assert client._get_keepalive_kwargs(connect) == {}
+
+
+def test_activity_is_not_recorded_until_fetched_and_acked():
+    client = _make_client_for_message_processing()
+    client.dedup_store = MemoryDedupStore()
+    client._get_base64_message_id = MagicMock(side_effect=[None, "msg-id", "msg-id"])
+    client.teams.messages.get = MagicMock(side_effect=[RuntimeError("fetch failed"), MagicMock()])
+    client._ack_message = MagicMock()
+    msg = {"id": "ws-msg-1", "data": {"eventType": "conversation.activity", "activity": _make_activity(verb="post")}}
+
+    # The message id cannot be resolved, then the fetch fails: neither is acked, so Webex redelivers
+    client._process_incoming_websocket_message(msg)
+    try:
+        client._process_incoming_websocket_message(msg)
+    except RuntimeError:
+        pass
+    client._ack_message.assert_not_called()
+    client.on_message.assert_not_called()
+
+    client._process_incoming_websocket_message(msg)
+    client._ack_message.assert_called_once_with("msg-id")
+    client.on_message.assert_called_once()
+    assert client.dedup_store.contains("act-123")
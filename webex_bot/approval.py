@@ -0,0 +1,139 @@
+import logging
+
+from webex_bot.cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+
+def _notifying(name):
+    def method(self, *args, **kwargs):
+        result = getattr(list, name)(self, *args, **kwargs)
+        self._on_change()
+        return result
+    method.__name__ = name
+    return method
+
+
+class WatchedList(list):
+    """
+    List which calls on_change() after it is changed in place, e.g. by append().
+    Used for the approved lists on WebexBot, so that changing them updates the ApprovalPolicy.
+    """
+
+    def __init__(self, iterable=(), on_change=None):
+        super().__init__(iterable)
+        self._on_change = on_change if on_change is not None else lambda: None
+
+    append = _notifying("append")
+    extend = _notifying("extend")
+    insert = _notifying("insert")
+    remove = _notifying("remove")
+    pop = _notifying("pop")
+    clear = _notifying("clear")
+    __setitem__ = _notifying("__setitem__")
+    __delitem__ = _notifying("__delitem__")
+    __iadd__ = _notifying("__iadd__")
+    __imul__ = _notifying("__imul__")
+
+
+class _ApprovalRules(object):
+    """
+    One version of the approved lists, with the decisions made from them. Never changed once built,
+    so a decision made from an older version is only ever remembered by that version.
+    """
+
+    __slots__ = ("approved_users", "approved_domains", "approved_domain_suffixes", "approved_rooms", "decisions")
+
+    def __init__(self, approved_users, approved_domains, approved_rooms, cache_size):
+        self.approved_users = frozenset(user.strip().lower() for user in approved_users or [])
+        domains = [domain.strip().lower() for domain in approved_domains or []]
+        self.approved_domains = frozenset(domain for domain in domains if not domain.startswith("*."))
+        # '*.example.com' is stored as '.example.com' so it can be matched with endswith()
+        self.approved_domain_suffixes = tuple(domain[1:] for domain in domains if domain.startswith("*."))
+        self.approved_rooms = tuple(approved_rooms or [])
+        self.decisions = TTLCache(maxsize=cache_size, ttl=float("inf"))
+
+    def decide(self, user_email):
+        email = user_email.strip().lower()
+        if email in self.approved_users:
+            return True
+        domain = email.rpartition('@')[2]
+        if domain in self.approved_domains:
+            return True
+        return bool(self.approved_domain_suffixes) and domain.endswith(self.approved_domain_suffixes)
+
+
+class ApprovalPolicy(object):
+    """
+    Pre-computed form of the approved_users, approved_domains and approved_rooms lists.
+
+    Emails and domains are compared case-insensitively. A domain written as '*.example.com'
+    approves every sub-domain of example.com (but not example.com itself, list that separately).
+
+    Decisions for the users/domains lists are remembered per email. Build a new policy, or call
+    update(), whenever the lists change.
+    """
+
+    def __init__(self, approved_users=None, approved_domains=None, approved_rooms=None, cache_size=4096):
+        """
+        @param approved_users: List of email address who are allowed to chat to this bot.
+        @param approved_domains: List of domains which are allowed to chat to this bot.
+        @param approved_rooms: List of rooms whose members are allowed to chat to this bot.
+        @param cache_size: Maximum number of per-email decisions to remember.
+        """
+        self.cache_size = cache_size
+        self.update(approved_users, approved_domains, approved_rooms)
+
+    def update(self, approved_users=None, approved_domains=None, approved_rooms=None):
+        """
+        Replace the lists and forget any remembered decisions.
+
+        The lists and the decisions made from them are swapped together, so a check which is still
+        running against the old lists cannot leave its decision behind for the new ones.
+        """
+        self._rules = _ApprovalRules(approved_users, approved_domains, approved_rooms, self.cache_size)
+
+    @property
+    def approved_users(self):
+        return self._rules.approved_users
+
+    @property
+    def approved_domains(self):
+        return self._rules.approved_domains
+
+    @property
+    def approved_domain_suffixes(self):
+        return self._rules.approved_domain_suffixes
+
+    @property
+    def approved_rooms(self):
+        return self._rules.approved_rooms
+
+    @property
+    def is_open(self):
+        """True if no users, domains or rooms are set, so anyone may use the bot."""
+        rules = self._rules
+        return not (rules.approved_users or rules.approved_domains or rules.approved_domain_suffixes
+                    or rules.approved_rooms)
+
+    @property
+    def has_user_or_domain_rules(self):
+        rules = self._rules
+        return bool(rules.approved_users or rules.approved_domains or rules.approved_domain_suffixes)
+
+    def is_user_or_domain_approved(self, user_email):
+        """
+        Check the email against the approved users and domains. Room membership is not checked here.
+        @param user_email: The email from the user of the incoming message.
+        @return: True if the user or their domain is approved.
+        """
+        if not user_email:
+            return False
+        rules = self._rules
+        return rules.decisions.get_or_load(user_email, lambda: rules.decide(user_email))
+
+    def stats(self):
+        """
+        @return: cache stats for the decisions made since the lists were last updated.
+        """
+        return self._rules.decisions.stats()
@@ -0,0 +1,118 @@
+import concurrent.futures
+import logging
+import threading
+import time
+
+from webex_bot.metrics import NULL_METRICS
+
+log = logging.getLogger(__name__)
+
+# When webex_bot was first imported. For a bot script this is within moments of the process starting,
+# so startup timings are measured from here.
+IMPORTED_AT = time.monotonic()
+
+WEBSOCKET_OPENED = "websocket_opened"
+
+
+class _StepTimer(object):
+    __slots__ = ("_timings", "_step", "_started")
+
+    def __init__(self, timings, step):
+        self._timings = timings
+        self._step = step
+
+    def __enter__(self):
+        self._started = self._timings._timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._timings._record(self._step, self._timings._timer() - self._started)
+        return False
+
+
+class StartupTimings(object):
+    """
+    How long each step of starting the bot took, and when (in seconds after webex_bot was imported) it
+    finished. Steps: u2c, wdm_device, people_me and websocket_opened.
+
+    Step durations are also recorded in metrics as the stages startup_<step>, and the time until the
+    websocket was first opened as the stage startup_total.
+    """
+
+    def __init__(self, metrics=NULL_METRICS, started=None, timer=time.monotonic):
+        """
+        @param metrics: webex_bot.metrics.Metrics to record the timings into.
+        @param started: Time (from timer) startup is measured from. (default when webex_bot was imported)
+        """
+        self.metrics = metrics
+        self.started = IMPORTED_AT if started is None else started
+        self._timer = timer
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.finished_at = {}
+
+    def time(self, step):
+        """
+        Context manager which records how long a step took, if it succeeds.
+        """
+        return _StepTimer(self, step)
+
+    def _record(self, step, duration):
+        finished_at = self._timer() - self.started
+        with self._lock:
+            self.durations[step] = duration
+            self.finished_at[step] = finished_at
+        self.metrics.observe(f"startup_{step}", duration, command="")
+
+    def websocket_opened(self):
+        """
+        Record that the websocket has been opened. Only the first call, after startup, counts.
+        @return: True if this was the first call.
+        """
+        with self._lock:
+            if WEBSOCKET_OPENED in self.finished_at:
+                return False
+            total = self.finished_at[WEBSOCKET_OPENED] = self._timer() - self.started
+        self.metrics.observe("startup_total", total, command="")
+        log.info(f"Started in {total:.3f}s ({self.summary()})")
+        return True
+
+    def summary(self):
+        with self._lock:
+            steps = sorted(self.finished_at.items(), key=lambda item: item[1])
+            return ", ".join(f"{step} {self.durations[step]:.3f}s" if step in self.durations
+                             else f"{step} at {finished_at:.3f}s"
+                             for step, finished_at in steps)
+
+
+def _run_step(future, step):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(step())
+    except BaseException as e:
+        future.set_exception(e)
+
+
+def run_concurrently(steps):
+    """
+    Run independent startup steps at the same time, each on its own thread.
+
+    If a step fails, its exception is raised as soon as it fails, without waiting for the other steps
+    (which may be retrying a lost connection). Their threads are daemons, so they do not keep the
+    process alive.
+    @param steps: {name: callable taking no arguments}
+    @return: {name: result}
+    """
+    futures = {}
+    for name, step in steps.items():
+        future = futures[name] = concurrent.futures.Future()
+        threading.Thread(target=_run_step, args=(future, step), name=f"webex-bot-startup-{name}",
+                         daemon=True).start()
+    done, _ = concurrent.futures.wait(futures.values(), return_when=concurrent.futures.FIRST_EXCEPTION)
+    for name, future in futures.items():
+        if future in done and future.exception() is not None:
+            log.error(f"Startup step {name} failed: {future.exception()}")
+            raise future.exception()
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _InFlight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache(object):
+    """
+    Thread-safe, size bounded LRU cache whose entries expire after a time to live.
+
+    get_or_load() makes sure that concurrent lookups of the same missing key share
+    one call to the loader, instead of each making their own.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, timer=time.monotonic):
+        """
+        @param maxsize: Maximum number of entries. The least recently used entry is evicted first.
+        @param ttl: Default number of seconds an entry is valid for.
+        @param timer: Clock used for expiry. Override in tests.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key):
+        # Called with the lock held.
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= self._timer():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl):
+        # Called with the lock held.
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, self._timer() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        @param ttl: Seconds this entry is valid for. Defaults to the cache ttl.
+        """
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value for key, calling loader() to fill it on a miss.
+
+        If another thread is already loading the same key, wait for its result rather
+        than calling loader() again. Exceptions from loader() are passed to every waiting
+        caller and are not cached.
+
+        @param loader: Function with no arguments which returns the value.
+        @param ttl: Seconds the loaded value is valid for, or a function taking the
+         value and returning the seconds. Defaults to the cache ttl.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            call = self._inflight.get(key)
+            owner = call is None
+            if owner:
+                call = self._inflight[key] = _InFlight()
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, call.value, ttl(call.value) if callable(ttl) else ttl)
+            return call.value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        @return: dict of hit/miss counters and the current size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,93 @@
+import re
+
+from webex_bot.models.response import response_from_card_content
+
+SLOT_PATTERN = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+def slot(name):
+    """
+    Placeholder to put into a card wherever a value changes from one request to the next. E.g.
+
+        TextBlock(slot("title"))
+        TextBlock(f"Hello {slot('name')}, you have {slot('count')} alerts")
+
+    @param name: Name of the value passed to CardTemplate.render()
+    @return: placeholder string
+    """
+    if not SLOT_PATTERN.fullmatch(f"${{{name}}}"):
+        raise ValueError(f"Invalid slot name: '{name}'")
+    return f"${{{name}}}"
+
+
+class CardTemplate(object):
+    """
+    An adaptive card which is built and serialized once, then rendered per request by filling in its slots.
+
+    Rendering copies only the parts of the card which contain slots. Everything else is shared
+    between the template and every rendered card, so rendered cards must not be modified.
+
+        template = CardTemplate(AdaptiveCard(body=[TextBlock(slot("title"))]))
+        response = template.render_response(title="Hello")
+
+    A slot which is the whole of a string value is replaced by the value as given (so it may be a
+    number, bool, list etc.). A slot inside a longer string is replaced by str(value).
+    """
+
+    def __init__(self, card):
+        """
+        @param card: AdaptiveCard (or anything else with to_dict()), or the dict form of a card.
+        """
+        self.content = card.to_dict() if hasattr(card, "to_dict") else card
+        self.slots = set()
+        self._patch = self._compile(self.content)
+
+    def _compile(self, node):
+        if isinstance(node, str):
+            names = SLOT_PATTERN.findall(node)
+            if not names:
+                return None
+            self.slots.update(names)
+            whole = SLOT_PATTERN.fullmatch(node)
+            if whole:
+                return ("value", whole.group(1))
+            # Alternating literal text and slot names, starting with literal text.
+            return ("format", SLOT_PATTERN.split(node))
+        if isinstance(node, dict):
+            children = {key: patch for key, patch in ((key, self._compile(value)) for key, value in node.items())
+                        if patch is not None}
+            return ("dict", children) if children else None
+        if isinstance(node, list):
+            children = {index: patch for index, patch in ((index, self._compile(value)) for index, value in enumerate(node))
+                        if patch is not None}
+            return ("list", children) if children else None
+        return None
+
+    def render(self, **values):
+        """
+        @param values: A value for every slot in the card.
+        @return: dict form of the card with the slots filled in.
+        """
+        if self._patch is None:
+            return self.content
+        missing = self.slots.difference(values)
+        if missing:
+            raise KeyError(f"No value given for card slot(s): {', '.join(sorted(missing))}")
+        return self._render(self.content, self._patch, values)
+
+    def _render(self, node, patch, values):
+        kind, detail = patch
+        if kind == "value":
+            return values[detail]
+        if kind == "format":
+            return "".join(part if i % 2 == 0 else str(values[part]) for i, part in enumerate(detail))
+        rendered = dict(node) if kind == "dict" else list(node)
+        for key, child_patch in detail.items():
+            rendered[key] = self._render(node[key], child_patch, values)
+        return rendered
+
+    def render_response(self, **values):
+        """
+        @return: Response containing the rendered card, ready to return from a command.
+        """
+        return response_from_card_content(self.render(**values))
@@ -4,9 +4,9 @@ from webexpythonsdk.models.cards import Colors, TextBlock, FontWeight, FontSize,
     Text, Image, HorizontalAlignment
 from webexpythonsdk.models.cards.actions import Submit
 
+from webex_bot.cards.template import CardTemplate
 from webex_bot.formatting import quote_info
 from webex_bot.models.command import Command
-from webex_bot.models.response import response_from_adaptive_card
 
 log = logging.getLogger(__name__)
 
@@ -19,6 +19,9 @@ class EchoCommand(Command):
             help_message="Echo Words Back to You!",
             delete_previous_message=True,
             chained_commands=[EchoCallback()])
+        # The cards never change, so build and serialize them once.
+        self.working_card = CardTemplate(self.build_working_card())
+        self.echo_card = CardTemplate(self.build_echo_card())
 
     def pre_execute(self, message, attachment_actions, activity):
         """
@@ -30,17 +33,7 @@ class EchoCommand(Command):
         :return: a string or Response object (or a list of either). Use Response if you want to return another card.
         """
 
-        image = Image(url="https://i.postimg.cc/2jMv5kqt/AS89975.jpg")
-        text1 = TextBlock("Working on it....", weight=FontWeight.BOLDER, wrap=True, size=FontSize.DEFAULT,
-                          horizontalAlignment=HorizontalAlignment.CENTER, color=Colors.DARK)
-        text2 = TextBlock("I am busy working on your request. Please continue to look busy while I do your work.",
-                          wrap=True, color=Colors.DARK)
-        card = AdaptiveCard(
-            body=[ColumnSet(columns=[Column(items=[image], width=2)]),
-                  ColumnSet(columns=[Column(items=[text1, text2])]),
-                  ])
-
-        return response_from_adaptive_card(card)
+        return self.working_card.render_response()
 
     def execute(self, message, attachment_actions, activity):
         """
@@ -58,6 +51,22 @@ class EchoCommand(Command):
         :return: a string or Response object (or a list of either). Use Response if you want to return another card.
         """
 
+        return self.echo_card.render_response()
+
+    @staticmethod
+    def build_working_card():
+        image = Image(url="https://i.postimg.cc/2jMv5kqt/AS89975.jpg")
+        text1 = TextBlock("Working on it....", weight=FontWeight.BOLDER, wrap=True, size=FontSize.DEFAULT,
+                          horizontalAlignment=HorizontalAlignment.CENTER, color=Colors.DARK)
+        text2 = TextBlock("I am busy working on your request. Please continue to look busy while I do your work.",
+                          wrap=True, color=Colors.DARK)
+        return AdaptiveCard(
+            body=[ColumnSet(columns=[Column(items=[image], width=2)]),
+                  ColumnSet(columns=[Column(items=[text1, text2])]),
+                  ])
+
+    @staticmethod
+    def build_echo_card():
         text1 = TextBlock("Echo", weight=FontWeight.BOLDER, size=FontSize.MEDIUM)
         text2 = TextBlock("Type in something here and it will be echo'd back to you. How useful is that!",
                           wrap=True, isSubtle=True)
@@ -68,13 +77,11 @@ class EchoCommand(Command):
                         data={
                             "callback_keyword": "echo_callback"})
 
-        card = AdaptiveCard(
+        return AdaptiveCard(
             body=[ColumnSet(columns=[Column(items=[text1, text2], width=2)]),
                   ColumnSet(columns=[input_column]),
                   ], actions=[submit])
 
-        return response_from_adaptive_card(card)
-
 
 class EchoCallback(Command):
 
@@ -5,7 +5,7 @@ from webexpythonsdk.models.cards import Colors, TextBlock, FontWeight, FontSize,
 from webexpythonsdk.models.cards.actions import Submit
 
 from webex_bot.models.command import Command, COMMAND_KEYWORD_KEY
-from webex_bot.models.response import response_from_adaptive_card
+from webex_bot.models.response import response_from_card_content
 
 log = logging.getLogger(__name__)
 
@@ -15,6 +15,8 @@ HELP_COMMAND_KEYWORD = "help"
 class HelpCommand(Command):
 
     def __init__(self, bot_name, bot_help_subtitle, bot_help_image, bot_help_image_size=ImageSize.SMALL):
+        self._card_content = None
+        self._card_commands_count = None
         self.commands = None
         super().__init__(
             command_keyword=HELP_COMMAND_KEYWORD,
@@ -27,17 +29,53 @@ class HelpCommand(Command):
         self.bot_help_image = bot_help_image
         self.bot_help_image_size = bot_help_image_size
 
+    @property
+    def commands(self):
+        return self._commands
+
+    @commands.setter
+    def commands(self, value):
+        self._commands = value
+        self.invalidate_card()
+
+    def invalidate_card(self):
+        """
+        Forget the cached help card, so it is rebuilt on the next request.
+        Called by WebexBot.add_command(). Call it yourself if you change the bot name, subtitle or image.
+        """
+        self._card_content = None
+
     def execute(self, message, attachment_actions, activity):
         pass
 
     def build_card(self, message, attachment_actions, activity):
         """
         Construct a help message for users.
+
+        The card is only built when the commands change. Each request gets a copy of it
+        with the thread_parent_id filled in.
         :param message: message with command already stripped
         :param attachment_actions: attachment_actions object
         :param activity: activity object
         :return:
         """
+        commands_count = len(self.commands) if self.commands is not None else None
+        if self._card_content is None or commands_count != self._card_commands_count:
+            self._card_content = self._build_card_content()
+            self._card_commands_count = commands_count
+
+        thread_parent_id = None
+        if 'parent' not in activity:
+            thread_parent_id = activity['id']
+
+        card_content = dict(self._card_content)
+        card_content["actions"] = [
+            dict(action, data=dict(action["data"], thread_parent_id=thread_parent_id))
+            for action in self._card_content.get("actions", [])
+        ]
+        return response_from_card_content(card_content)
+
+    def _build_card_content(self):
         heading = TextBlock(self.bot_name, weight=FontWeight.BOLDER, wrap=True, size=FontSize.LARGE)
         subtitle = TextBlock(self.bot_help_subtitle, wrap=True, size=FontSize.SMALL, color=Colors.LIGHT)
 
@@ -51,11 +89,7 @@ class HelpCommand(Command):
             width=1,
         )
 
-        thread_parent_id = None
-        if 'parent' not in activity:
-            thread_parent_id = activity['id']
-
-        actions, hint_texts = self.build_actions_and_hints(thread_parent_id)
+        actions, hint_texts = self.build_actions_and_hints(thread_parent_id=None)
 
         card = AdaptiveCard(
             body=[ColumnSet(columns=[header_column, header_image_column]),
@@ -64,7 +98,7 @@ class HelpCommand(Command):
                   ],
             actions=actions)
 
-        return response_from_adaptive_card(adaptive_card=card)
+        return card.to_dict()
 
     def build_actions_and_hints(self, thread_parent_id):
         # help_card = HELP_CARD_CONTENT
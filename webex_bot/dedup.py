@@ -0,0 +1,171 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DEDUP_WINDOW = 600
+
+
+class MemoryDedupStore(object):
+    """
+    Remembers the ids of activities which have been processed in the last `window` seconds,
+    so that activities redelivered by Webex (e.g. after a reconnect or a lost ack) are only handled once.
+    """
+
+    def __init__(self, window=DEFAULT_DEDUP_WINDOW, maxsize=100000, timer=time.monotonic):
+        """
+        @param window: Seconds to remember an activity id for. (default 600)
+        @param maxsize: Maximum number of ids to remember. The oldest are forgotten first.
+        @param timer: Clock used for expiry. Override in tests.
+        """
+        self.window = window
+        self.maxsize = maxsize
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._seen)
+
+    def check_and_add(self, activity_id):
+        """
+        Record an activity id.
+        @return: True if the id was already recorded within the window (i.e. this is a duplicate).
+        """
+        now = self._timer()
+        with self._lock:
+            self._purge(now)
+            if activity_id in self._seen:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._add(activity_id, now)
+            return False
+
+    def contains(self, activity_id):
+        """
+        @return: True if the id was recorded within the window. Does not record it.
+        """
+        with self._lock:
+            self._purge(self._timer())
+            if activity_id in self._seen:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, activity_id):
+        """
+        Record an activity id, once it has been processed.
+        """
+        with self._lock:
+            self._add(activity_id, self._timer())
+
+    def _add(self, activity_id, now):
+        # Called with the lock held.
+        self._seen.pop(activity_id, None)
+        self._seen[activity_id] = now
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+    def _purge(self, now):
+        # Ids are stored in the order they were seen, so expired ones are at the front.
+        cutoff = now - self.window
+        while self._seen:
+            activity_id, seen_at = next(iter(self._seen.items()))
+            if seen_at > cutoff:
+                break
+            del self._seen[activity_id]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._seen)}
+
+
+class SqliteDedupStore(object):
+    """
+    Same as MemoryDedupStore, but kept in a sqlite database so it survives a restart of the bot.
+    """
+
+    def __init__(self, path, window=DEFAULT_DEDUP_WINDOW, purge_interval=60, timer=time.time):
+        """
+        @param path: Path of the sqlite database file. Created if it does not exist.
+        @param window: Seconds to remember an activity id for. (default 600)
+        @param purge_interval: Seconds between deleting expired ids from the database.
+        @param timer: Wall clock used for expiry. Override in tests.
+        """
+        self.path = path
+        self.window = window
+        self.purge_interval = purge_interval
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._last_purge = 0
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS processed_activities "
+                                 "(activity_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM processed_activities").fetchone()[0]
+
+    def check_and_add(self, activity_id):
+        """
+        Record an activity id.
+        @return: True if the id was already recorded within the window (i.e. this is a duplicate).
+        """
+        now = self._timer()
+        with self._lock:
+            if self._contains(activity_id, now):
+                return True
+            self._add(activity_id, now)
+            return False
+
+    def contains(self, activity_id):
+        """
+        @return: True if the id was recorded within the window. Does not record it.
+        """
+        with self._lock:
+            return self._contains(activity_id, self._timer())
+
+    def add(self, activity_id):
+        """
+        Record an activity id, once it has been processed.
+        """
+        with self._lock:
+            self._add(activity_id, self._timer())
+
+    def _contains(self, activity_id, now):
+        # Called with the lock held.
+        if now - self._last_purge >= self.purge_interval:
+            self._connection.execute("DELETE FROM processed_activities WHERE seen_at <= ?", (now - self.window,))
+            self._last_purge = now
+        row = self._connection.execute("SELECT seen_at FROM processed_activities WHERE activity_id = ?",
+                                       (activity_id,)).fetchone()
+        if row is not None and row[0] > now - self.window:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _add(self, activity_id, now):
+        # Called with the lock held.
+        self._connection.execute("INSERT OR REPLACE INTO processed_activities (activity_id, seen_at) VALUES (?, ?)",
+                                 (activity_id, now))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
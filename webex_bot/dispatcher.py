@@ -0,0 +1,159 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+
+_STOP = object()
+
+
+class KeyedDispatcher(object):
+    """
+    A fixed pool of worker threads which runs tasks grouped by key.
+
+    Tasks submitted with the same key (e.g. a room id) are run one at a time, in the order
+    they were submitted. Tasks with different keys run in parallel, up to max_workers at once.
+    A key of None means the task has no ordering constraint.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, name="webex-bot-worker"):
+        """
+        @param max_workers: Number of worker threads. (default 8)
+        @param name: Prefix for the worker thread names.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.name = name
+        self._lock = threading.Lock()
+        self._ready = deque()
+        self._ready_cond = threading.Condition(self._lock)
+        self._idle_cond = threading.Condition(self._lock)
+        self._pending = {}
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._threads = []
+        self._shutdown = False
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run on a worker thread.
+
+        @param key: Tasks with an equal key are run serially, in submission order.
+        @return: concurrent.futures.Future for the result.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit to a dispatcher which has been shut down")
+            if not self._threads:
+                self._start_workers()
+            if key is None:
+                key = object()
+            tasks = self._pending.get(key)
+            if tasks is None:
+                # Nothing queued or running for this key, so it is ready straight away.
+                tasks = self._pending[key] = deque()
+                self._ready.append(key)
+                self._ready_cond.notify()
+            tasks.append((future, fn, args, kwargs))
+            self._queued += 1
+        return future
+
+    @property
+    def queue_depth(self):
+        """Number of tasks which are waiting for a worker."""
+        return self._queued
+
+    def stats(self):
+        """
+        @return: dict of counters describing the dispatcher's load.
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "keys": len(self._pending),
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def join(self, timeout=None):
+        """
+        Block until every submitted task has run.
+        @param timeout: Maximum seconds to wait.
+        @return: True if the dispatcher is idle, False if the timeout expired.
+        """
+        with self._lock:
+            return self._idle_cond.wait_for(lambda: not self._pending, timeout)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers once the queued tasks have run.
+        @param wait: If True, block until the worker threads exit.
+        """
+        with self._lock:
+            self._shutdown = True
+            for _ in self._threads:
+                self._ready.append(_STOP)
+            self._ready_cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _start_workers(self):
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_key(self):
+        # Called with the lock held. Queued work is drained before a stop marker is honoured.
+        while True:
+            while not self._ready:
+                self._ready_cond.wait()
+            key = self._ready.popleft()
+            if key is _STOP and self._pending:
+                self._ready.append(key)
+                self._ready_cond.wait(0.01)
+                continue
+            return key
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                key = self._next_key()
+                if key is _STOP:
+                    return
+                future, fn, args, kwargs = self._pending[key].popleft()
+                self._queued -= 1
+                self._active += 1
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    log.exception(f"Exception in dispatched task: {e}")
+                    future.set_exception(e)
+
+            with self._lock:
+                self._active -= 1
+                if future.cancelled() or future.exception() is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                if self._pending[key]:
+                    # More work for this key. Go to the back of the line so other keys get a turn.
+                    self._ready.append(key)
+                    self._ready_cond.notify()
+                else:
+                    del self._pending[key]
+                    if not self._pending:
+                        self._idle_cond.notify_all()
@@ -0,0 +1,161 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_PAYLOAD_LIMIT = 500
+DEFAULT_MAX_PER_INTERVAL = 20
+DEFAULT_INTERVAL = 60.0
+
+
+class Truncated(object):
+    """
+    Log argument which is only converted to a string (and cut down to `limit` characters)
+    if the record is actually emitted.
+
+        log.debug("activity=%s", truncated(activity))
+    """
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=DEFAULT_PAYLOAD_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... ({len(text) - self.limit} more chars)"
+
+    __repr__ = __str__
+
+
+def truncated(value, limit=DEFAULT_PAYLOAD_LIMIT):
+    return Truncated(value, limit)
+
+
+class HotPathLogger(object):
+    """
+    Wraps a logger for lines which may be logged for every incoming message.
+
+    * Arguments are formatted lazily (%-style), and nothing is done unless the level is enabled.
+    * Only 1 in every `sample_every` occurrences of a line is logged.
+    * At most `max_per_interval` occurrences of a line are logged every `interval` seconds. The next
+      line logged says how many were dropped.
+
+    A "line" is identified by its format string, so use %s placeholders rather than f-strings.
+    """
+
+    def __init__(self, logger, max_per_interval=DEFAULT_MAX_PER_INTERVAL, interval=DEFAULT_INTERVAL,
+                 sample_every=1, timer=time.monotonic):
+        """
+        @param logger: Logger to write to.
+        @param max_per_interval: Occurrences of each line to log per interval. 0 for no limit. (default 20)
+        @param interval: Seconds. (default 60)
+        @param sample_every: Log 1 in every N occurrences of each line. (default 1, i.e. all of them)
+        """
+        self.logger = logger
+        self.max_per_interval = max_per_interval
+        self.interval = interval
+        self.sample_every = sample_every
+        self._timer = timer
+        self._lock = threading.Lock()
+        # format string -> [occurrences, window start, logged in window, dropped since last logged]
+        self._lines = {}
+
+    def debug(self, msg, *args):
+        self._log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self._log(logging.INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self._log(logging.WARNING, msg, *args)
+
+    def _log(self, level, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        dropped = self._admit(msg)
+        if dropped is None:
+            return
+        if dropped:
+            msg = msg + " (%d similar lines dropped)"
+            args = args + (dropped,)
+        self.logger.log(level, msg, *args, stacklevel=3)
+
+    def _admit(self, msg):
+        """
+        @return: None if this occurrence should not be logged, otherwise the number dropped since the last one.
+        """
+        now = self._timer()
+        with self._lock:
+            line = self._lines.get(msg)
+            if line is None:
+                line = self._lines[msg] = [0, now, 0, 0]
+            line[0] += 1
+            if self.sample_every > 1 and (line[0] - 1) % self.sample_every:
+                line[3] += 1
+                return None
+            if self.max_per_interval:
+                if now - line[1] >= self.interval:
+                    line[1] = now
+                    line[2] = 0
+                if line[2] >= self.max_per_interval:
+                    line[3] += 1
+                    return None
+                line[2] += 1
+            dropped, line[3] = line[3], 0
+            return dropped
+
+
+_queue_lock = threading.Lock()
+_queue_handler = None
+_queue_listener = None
+
+
+def queue_log_handlers(handlers, logger=None):
+    """
+    Move handlers off a logger onto a background thread, so that writing log records never blocks
+    the thread which logged them. The handlers are replaced on the logger by a single QueueHandler.
+
+    Calling this again (e.g. when a second bot re-installs its console handler) replaces handlers of
+    the same type which were queued previously.
+    @param handlers: Handlers currently on the logger, e.g. the ones added by coloredlogs.install().
+    @param logger: (default the root logger)
+    @return: the QueueListener, which is stopped (flushing the queue) at exit.
+    """
+    global _queue_handler, _queue_listener
+    logger = logger if logger is not None else logging.getLogger()
+    handlers = [handler for handler in handlers if handler is not _queue_handler]
+    if not handlers:
+        return _queue_listener
+    with _queue_lock:
+        for handler in handlers:
+            logger.removeHandler(handler)
+        kept = []
+        if _queue_listener is not None:
+            _stop_listener(_queue_listener)
+            new_types = {type(handler) for handler in handlers}
+            kept = [handler for handler in _queue_listener.handlers if type(handler) not in new_types]
+        if _queue_handler is None:
+            _queue_handler = QueueHandler(queue.SimpleQueue())
+            atexit.register(_stop_queue_listener)
+        if _queue_handler not in logger.handlers:
+            logger.addHandler(_queue_handler)
+        _queue_listener = QueueListener(_queue_handler.queue, *(kept + handlers), respect_handler_level=True)
+        _queue_listener.start()
+        return _queue_listener
+
+
+def _stop_listener(listener):
+    # QueueListener.stop() fails if the listener has already been stopped
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def _stop_queue_listener():
+    with _queue_lock:
+        if _queue_listener is not None:
+            _stop_listener(_queue_listener)
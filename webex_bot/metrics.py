@@ -0,0 +1,278 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the histogram buckets.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_PORT = 9464
+
+STAGE_METRIC = "webex_bot_stage_duration_seconds"
+
+# Keyword of the command being handled, used to label stages which do not know it themselves (e.g. sends).
+_current_command = contextvars.ContextVar("webex_bot_command", default="")
+
+
+class Histogram(object):
+    """
+    Thread-safe histogram of durations, in the Prometheus style (fixed buckets plus a count and sum).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative_counts(self):
+        """
+        @return: list of (upper bound, observations <= upper bound), ending with (inf, count).
+        """
+        with self._lock:
+            counts = list(self._counts)
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def quantile(self, q):
+        """
+        @return: estimate of the q quantile (0 to 1): the upper bound of the bucket it falls in.
+        """
+        cumulative = self.cumulative_counts()
+        target = q * cumulative[-1][1]
+        for bound, count in cumulative:
+            if count >= target and count:
+                return bound
+        return 0.0
+
+
+class _StageTimer(object):
+    __slots__ = ("_metrics", "_stage", "_command", "_started")
+
+    def __init__(self, metrics, stage, command):
+        self._metrics = metrics
+        self._stage = stage
+        self._command = command
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.observe(self._stage, time.perf_counter() - self._started, self._command)
+        return False
+
+
+class _CommandScope(object):
+    __slots__ = ("_command", "_token")
+
+    def __init__(self, command):
+        self._command = command
+
+    def __enter__(self):
+        self._token = _current_command.set(self._command)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_command.reset(self._token)
+        return False
+
+
+class Metrics(object):
+    """
+    Latency histograms for each stage of handling a message, labelled by command keyword.
+
+    Stages recorded by the bot:
+     receive, decode, queue_wait, message_id, message_fetch, approval, command_match,
+     pre_card_load_reply, pre_execute, execute, messages_create, messages_update, messages_delete
+
+    And by the connection (with an empty command label):
+     startup_<step> and startup_total (see webex_bot.bootstrap.StartupTimings), reconnect (from losing
+     the websocket to opening it again), ack (from queueing an ack until it is written to the websocket),
+     websocket_rtt (ping round trip) and stall_detection (from last receiving anything on a dead websocket
+     to giving up on it)
+
+    Stages which run before the command is known (e.g. message_fetch) have an empty command label.
+    """
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        @param buckets: Upper bounds, in seconds, of the histogram buckets.
+        """
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, command=None):
+        """
+        Record how long a stage took.
+        @param command: Command keyword. (default the command being handled on this thread, if any)
+        """
+        if command is None:
+            command = _current_command.get()
+        key = (stage, command)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def time(self, stage, command=None):
+        """
+        Context manager which records how long its body took. E.g.
+
+            with metrics.time("execute"):
+                ...
+        """
+        return _StageTimer(self, stage, command)
+
+    def command_scope(self, command):
+        """
+        Context manager which labels everything recorded within it (on this thread) with a command keyword.
+        """
+        return _CommandScope(command)
+
+    def histogram(self, stage, command=""):
+        """
+        @return: Histogram for a stage and command, or None if nothing has been recorded for it.
+        """
+        return self._histograms.get((stage, command))
+
+    def snapshot(self):
+        """
+        @return: {(stage, command): {"count": n, "sum": seconds, "p50": s, "p95": s, "p99": s}}
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {key: {"count": h.count, "sum": h.sum,
+                      "p50": h.quantile(0.50), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                for key, h in histograms.items()}
+
+    def render_prometheus(self):
+        """
+        @return: all histograms in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        lines = [f"# HELP {STAGE_METRIC} Time spent in each stage of handling a message.",
+                 f"# TYPE {STAGE_METRIC} histogram"]
+        for (stage, command), histogram in histograms:
+            labels = f'stage="{_escape_label(stage)}",command="{_escape_label(command)}"'
+            for bound, count in histogram.cumulative_counts():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"{STAGE_METRIC}_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"{STAGE_METRIC}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class _NullContext(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class NullMetrics(object):
+    """
+    Metrics which records nothing. Used when metrics are disabled, so that timing a stage costs
+    a method call and nothing more.
+    """
+    enabled = False
+
+    def observe(self, stage, seconds, command=None):
+        pass
+
+    def time(self, stage, command=None):
+        return _NULL_CONTEXT
+
+    def command_scope(self, command):
+        return _NULL_CONTEXT
+
+    def histogram(self, stage, command=""):
+        return None
+
+    def snapshot(self):
+        return {}
+
+    def render_prometheus(self):
+        return ""
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsServer(object):
+    """
+    Serves Metrics.render_prometheus() at http://<host>:<port>/metrics from a background thread.
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=DEFAULT_METRICS_PORT):
+        """
+        @param metrics: Metrics to serve.
+        @param host: Interface to listen on. (default localhost only)
+        @param port: Port to listen on, or 0 for any free port. (default 9464)
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug(f"metrics request: {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webex-bot-metrics", daemon=True)
+        self._thread.start()
+        log.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
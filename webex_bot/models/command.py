@@ -12,7 +12,8 @@ class Command(ABC):
     def __init__(self, command_keyword=None, exact_command_keyword_match=False,
                  chained_commands=[], card=None,
                  help_message=None, delete_previous_message=False,
-                 card_callback_keyword=None, approved_rooms=None):
+                 card_callback_keyword=None, approved_rooms=None,
+                 update_previous_message=False):
         """
         Create a new bot command.
 
@@ -38,6 +39,10 @@ class Command(ABC):
         @param card_callback_keyword: (optional) this command can be invoked from the 'callback_keyword'
          text in the data from the Submit action of a previous card.
         @param approved_rooms: If defined, only members of these spaces will be allowed to run this command. Default: None (everyone)
+        @param update_previous_message: If True, the bot's text pre-execute message is edited in place to show
+         the reply, instead of the reply being posted and the pre-execute message deleted. Webex cannot edit a
+         message with a card, so the card which invoked this command is deleted as with delete_previous_message,
+         and if either message is a card the reply is posted and the pre-execute message deleted. (default False)
         """
         self.command_keyword = command_keyword
         self.exact_command_keyword_match = exact_command_keyword_match
@@ -47,6 +52,7 @@ class Command(ABC):
         self.card_callback = self.execute
         self.card_callback_keyword = card_callback_keyword
         self.delete_previous_message = delete_previous_message
+        self.update_previous_message = update_previous_message
         self.approved_rooms = approved_rooms
         self.chained_commands = chained_commands
 
@@ -1,9 +1,12 @@
 import json
+import typing
 
-from webexpythonsdk.models.cards import AdaptiveCard
+if typing.TYPE_CHECKING:
+    # Only needed for the annotation; importing the card models is slow.
+    from webexpythonsdk.models.cards import AdaptiveCard
 
 
-def response_from_adaptive_card(adaptive_card: AdaptiveCard):
+def response_from_adaptive_card(adaptive_card: "AdaptiveCard"):
     """
     Convenience method for generating a Response from an AdaptiveCard.
 
@@ -11,30 +14,42 @@ def response_from_adaptive_card(adaptive_card: AdaptiveCard):
     @return: Response object
     """
 
+    return response_from_card_content(adaptive_card.to_dict())
+
+
+def response_from_card_content(card_content: dict):
+    """
+    Generate a Response from an already serialized adaptive card, e.g. one which has been cached.
+
+    @param card_content: dict form of the card, as returned by AdaptiveCard.to_dict()
+    @return: Response object
+    """
+
     response = Response()
     response.text = "This bot requires a client which can render cards."
     response.markdown = "This bot requires a client which can render cards."
     response.attachments = {
         "contentType": "application/vnd.microsoft.card.adaptive",
-        "content": adaptive_card.to_dict()
+        "content": card_content
     }
 
     return response
 
 
 class Response(object):
+    """
+    A message to send back to Webex. The fields are kept in the attributes dict.
+    """
+
+    # attributes is a slot, and the instance __dict__ is only created if another attribute is set on a Response.
+    __slots__ = ("attributes", "__dict__")
+
     def __init__(self, attributes=None):
         if attributes:
             self.attributes = attributes
         else:
-            self.attributes = dict()
-            self.attributes["text"] = None
-            self.attributes["roomId"] = None
-            self.attributes["parentId"] = None
-            self.attributes["markdown"] = None
-            self.attributes["html"] = None
-            self.attributes["files"] = list()
-            self.attributes["attachments"] = list()
+            self.attributes = {"text": None, "roomId": None, "parentId": None, "markdown": None, "html": None,
+                               "files": [], "attachments": []}
 
     @property
     def text(self):
@@ -93,6 +108,9 @@ class Response(object):
         self.attributes["html"] = val
 
     def as_dict(self):
+        """
+        @return: the fields which are set, as keyword arguments for MessagesAPI.create().
+        """
         ret = dict()
         for k, v in self.attributes.items():
             if v:
@@ -0,0 +1,191 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_SLOW_THRESHOLD = 1.0
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+SLOW_CALLS_FILE = "slow_calls.jsonl"
+REPORT_LINES = 40
+
+
+class _NotProfiled(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOT_PROFILED = _NotProfiled()
+
+
+class _ProfiledCall(object):
+    __slots__ = ("_profiler", "_command", "_stage", "_profile", "_started")
+
+    def __init__(self, profiler, command, stage, profile):
+        self._profiler = profiler
+        self._command = command
+        self._stage = stage
+        self._profile = profile
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profile is not None:
+            self._profile.disable()
+        self._profiler._finish(self._command, self._stage, time.perf_counter() - self._started, self._profile)
+        return False
+
+
+class CommandProfiler(object):
+    """
+    Profiles the pre_card_load_reply, pre_execute and execute stages of chosen commands.
+
+    Profiling is switched on per command keyword, at runtime:
+
+        bot.profiler.enable("report", sample_rate=0.2)
+        ...
+        bot.profiler.disable("report")
+
+    For an enabled command, sample_rate of the calls run under cProfile, and each profile is written to
+    `directory` as <time>-<command>-<stage>.prof, with a text summary alongside it when the call was slow.
+    Every call to an enabled command which takes at least slow_threshold seconds is also logged to
+    slow_calls.jsonl. Once the directory holds more than max_bytes, the oldest files are deleted.
+
+    Only one call is profiled at a time. Calls which would be sampled while another is being profiled are not.
+    """
+
+    def __init__(self, directory, sample_rate=DEFAULT_SAMPLE_RATE, slow_threshold=DEFAULT_SLOW_THRESHOLD,
+                 max_bytes=DEFAULT_MAX_BYTES, random=random.random):
+        """
+        @param directory: Where to write profiles and slow-call reports. Created if it does not exist.
+        @param sample_rate: Default fraction (0 to 1) of calls to profile for an enabled command. (default 0.1)
+        @param slow_threshold: Seconds after which a call is reported as slow. (default 1)
+        @param max_bytes: Maximum total size of the files in directory. (default 50MB)
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_bytes = max_bytes
+        self._random = random
+        self._sample_rates = {}
+        self._profiling = threading.Lock()
+        self._files_lock = threading.Lock()
+        self.profiled = 0
+        self.slow_calls = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def enable(self, command_keyword, sample_rate=None):
+        """
+        Start profiling a command.
+        @param sample_rate: Fraction of calls to profile. (default the profiler's sample_rate)
+        """
+        self._sample_rates[command_keyword] = self.sample_rate if sample_rate is None else sample_rate
+        log.info(f"Profiling command '{command_keyword}' at sample rate {self._sample_rates[command_keyword]}")
+
+    def disable(self, command_keyword):
+        self._sample_rates.pop(command_keyword, None)
+
+    @property
+    def enabled_commands(self):
+        return dict(self._sample_rates)
+
+    def profile(self, command_keyword, stage):
+        """
+        Context manager around one call of a command stage. Does nothing unless the command is enabled.
+        @param stage: e.g. "execute"
+        """
+        sample_rate = self._sample_rates.get(command_keyword)
+        if sample_rate is None:
+            return NOT_PROFILED
+        profile = None
+        if self._random() < sample_rate and self._profiling.acquire(blocking=False):
+            profile = cProfile.Profile()
+        return _ProfiledCall(self, command_keyword, stage, profile)
+
+    def _finish(self, command_keyword, stage, duration, profile):
+        try:
+            self._write(command_keyword, stage, duration, profile)
+        except OSError as e:
+            log.warning(f"Failed to write profile for command '{command_keyword}': {e}")
+        finally:
+            if profile is not None:
+                self._profiling.release()
+
+    def _write(self, command_keyword, stage, duration, profile):
+        slow = duration >= self.slow_threshold
+        if profile is None and not slow:
+            return
+        with self._files_lock:
+            profile_path = None
+            if profile is not None:
+                self.profiled += 1
+                name = f"{time.strftime('%Y%m%dT%H%M%S')}-{self.profiled:06d}-{_safe_name(command_keyword)}-{stage}"
+                profile_path = os.path.join(self.directory, f"{name}.prof")
+                profile.dump_stats(profile_path)
+                if slow:
+                    with open(os.path.join(self.directory, f"{name}.txt"), "w") as report:
+                        report.write(f"command={command_keyword} stage={stage} duration={duration:.3f}s\n\n")
+                        report.write(_summarize(profile))
+            if slow:
+                self.slow_calls += 1
+                log.warning(f"Slow call: command '{command_keyword}' {stage} took {duration:.3f}s")
+                self._append_slow_call({"time": time.time(), "command": command_keyword, "stage": stage,
+                                        "duration": round(duration, 6), "profile": profile_path})
+            self._prune()
+
+    def _append_slow_call(self, record):
+        path = os.path.join(self.directory, SLOW_CALLS_FILE)
+        try:
+            if os.path.getsize(path) > self.max_bytes // 10:
+                os.replace(path, path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(path, "a") as slow_calls:
+            slow_calls.write(json.dumps(record) + "\n")
+
+    def _prune(self):
+        """Delete the oldest files until the directory is within max_bytes."""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        total = sum(size for _, _, size in files)
+        for _, name, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {"profiled": self.profiled, "slow_calls": self.slow_calls, "enabled": self.enabled_commands}
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value))[:50] or "_"
+
+
+def _summarize(profile):
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LINES)
+    return output.getvalue()
@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class KeywordAutomaton(object):
+    """
+    Aho-Corasick automaton for finding every registered keyword inside a message
+    in a single pass, regardless of how many keywords there are.
+
+    Keywords can be added while other threads are matching. The failure links are built, under a lock,
+    into a new automaton the first time a message is matched after a keyword was added, so a match
+    always runs against a complete automaton.
+    """
+
+    def __init__(self):
+        # The trie of keywords, and the (length, value) of the keywords ending at each state
+        self._goto = [{}]
+        self._keywords = [[]]
+        self._lock = threading.Lock()
+        # (goto, fail, output) built from the trie, or None if a keyword has been added since.
+        self._automaton = ([{}], [0], [[]])
+
+    def add(self, keyword, value):
+        """
+        @param keyword: Non-empty string to search for.
+        @param value: Returned with each match of this keyword.
+        """
+        with self._lock:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._keywords.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._keywords[state].append((len(keyword), value))
+            self._automaton = None
+
+    def _build(self):
+        """
+        @return: (goto, fail, output) for the keywords added so far. Must be called with the lock held.
+        """
+        goto = [dict(edges) for edges in self._goto]
+        fail = [0] * len(goto)
+        # Each state outputs its own keywords, plus those of the state its failure link points to
+        output = [list(keywords) for keywords in self._keywords]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                state_fail = fail[state]
+                while state_fail and char not in goto[state_fail]:
+                    state_fail = fail[state_fail]
+                state_fail = goto[state_fail].get(char, 0)
+                fail[next_state] = state_fail if state_fail != next_state else 0
+                output[next_state] = output[next_state] + output[fail[next_state]]
+        return goto, fail, output
+
+    def _get_automaton(self):
+        automaton = self._automaton
+        if automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._automaton = self._build()
+                automaton = self._automaton
+        return automaton
+
+    def iter_matches(self, text):
+        """
+        Yield (start_index, keyword_length, value) for every keyword occurring in text.
+        """
+        goto, fail, output = self._get_automaton()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                yield index - length + 1, length, value
+
+
+class CommandRouter(object):
+    """
+    Index of commands, built as commands are registered, so that finding the command for
+    a message does not depend on how many commands the bot has.
+
+    Typed messages are matched in this order:
+
+    1. A command with exact_command_keyword_match whose keyword equals the whole message.
+    2. A command without a command_keyword whose card_callback_keyword equals the whole message.
+    3. A sub-string keyword match. The keyword found earliest in the message wins. If several
+       keywords start at the same place the longest wins, then the one registered first.
+
+    Card actions are matched on an exact command_keyword or card_callback_keyword.
+    Where two commands share a keyword, the one registered first wins.
+    """
+
+    def __init__(self, commands=None):
+        self._exact = {}
+        self._callback_only = {}
+        self._card_actions = {}
+        self._substrings = KeywordAutomaton()
+        self._order = {}
+        for command in commands or []:
+            self.add(command)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, command):
+        return id(command) in self._order
+
+    def add(self, command):
+        """
+        Index a command.
+        @param command: Command to add
+        """
+        if id(command) in self._order:
+            return
+        self._order[id(command)] = len(self._order)
+
+        keyword = command.command_keyword
+        if keyword:
+            if command.exact_command_keyword_match:
+                self._exact.setdefault(keyword, command)
+            else:
+                self._substrings.add(keyword, command)
+            self._card_actions.setdefault(keyword, command)
+        elif command.card_callback_keyword:
+            self._callback_only.setdefault(command.card_callback_keyword, command)
+
+        if command.card_callback_keyword:
+            self._card_actions.setdefault(command.card_callback_keyword, command)
+
+    def match(self, user_command, is_card_callback_command=False):
+        """
+        Find the command for a (lower-cased) message.
+
+        @param user_command: The message text, lower-cased.
+        @param is_card_callback_command: True if the text is the keyword from a card action.
+        @return: The matching Command, or None.
+        """
+        if is_card_callback_command:
+            return self._card_actions.get(user_command)
+
+        command = self._exact.get(user_command) or self._callback_only.get(user_command)
+        if command is not None:
+            return command
+
+        best = None
+        for start, length, candidate in self._substrings.iter_matches(user_command):
+            rank = (start, -length, self._order[id(candidate)])
+            if best is None or rank < best[0]:
+                best = (rank, candidate)
+        return best[1] if best else None
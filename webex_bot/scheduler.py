@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+
+from webexpythonsdk.exceptions import ApiError, RateLimitError
+
+from webex_bot.cache import TTLCache
+from webex_bot.metrics import NULL_METRICS
+
+log = logging.getLogger(__name__)
+
+DEFAULT_GLOBAL_RATE = 20
+DEFAULT_GLOBAL_BURST = 40
+DEFAULT_ROOM_RATE = 5
+DEFAULT_ROOM_BURST = 10
+DEFAULT_MAX_RETRIES = 3
+MAX_SERVER_ERROR_BACKOFF = 8
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket. Callers reserve a token and are told how long to wait before using it,
+    so the bucket never needs a background thread.
+    """
+
+    def __init__(self, rate, burst, timer=time.monotonic):
+        """
+        @param rate: Tokens added per second.
+        @param burst: Maximum number of tokens the bucket holds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._timer = timer
+        self._tokens = burst
+        self._updated = timer()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token.
+        @return: Seconds to wait before the token may be used.
+        """
+        with self._lock:
+            now = self._timer()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class OutboundScheduler(object):
+    """
+    Paces outbound Webex API calls and recovers from throttling.
+
+    * Every call takes a token from a global bucket and from a bucket for its room (or person).
+    * On HTTP 429 all calls are paused for the Retry-After period, then the call is retried.
+    * Calls failing with HTTP 5xx are retried with exponential backoff.
+
+    Each call is retried at most max_retries times before the error is raised to the caller.
+    """
+
+    def __init__(self, messages_api,
+                 global_rate=DEFAULT_GLOBAL_RATE, global_burst=DEFAULT_GLOBAL_BURST,
+                 room_rate=DEFAULT_ROOM_RATE, room_burst=DEFAULT_ROOM_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES, max_rooms=10000,
+                 sleep=time.sleep, timer=time.monotonic, metrics=None):
+        """
+        @param messages_api: webexpythonsdk MessagesAPI used to send. Its session should have
+         wait_on_rate_limit disabled, so that 429s are handled here.
+        @param global_rate: Messages per second across all rooms. (default 20)
+        @param global_burst: Messages which may be sent at once across all rooms. (default 40)
+        @param room_rate: Messages per second to a single room or person. (default 5)
+        @param room_burst: Messages which may be sent at once to a single room or person. (default 10)
+        @param max_retries: Retries allowed per call for 429 and 5xx responses. (default 3)
+        @param max_rooms: Number of per-room buckets to keep. The least recently used are dropped.
+        @param metrics: (optional) webex_bot.metrics.Metrics to record how long each create, update and delete
+         takes, including any waiting for the rate limits and retries.
+        """
+        self.messages_api = messages_api
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.room_rate = room_rate
+        self.room_burst = room_burst
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._timer = timer
+        self._global_bucket = TokenBucket(global_rate, global_burst, timer=timer)
+        self._room_buckets = TTLCache(maxsize=max_rooms, ttl=float("inf"), timer=timer)
+        self._lock = threading.Lock()
+        self._paused_until = 0
+        self.waiting = 0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def create_message(self, **kwargs):
+        """
+        Send a message. Takes the same arguments as MessagesAPI.create().
+        @return: the created Message.
+        """
+        key = kwargs.get("roomId") or kwargs.get("toPersonId") or kwargs.get("toPersonEmail")
+        with self.metrics.time("messages_create"):
+            return self.call(key, self.messages_api.create, **kwargs)
+
+    def delete_message(self, message_id, room_id=None):
+        """
+        Delete a message.
+        @param room_id: Room the message is in, used for the per-room rate limit.
+        """
+        with self.metrics.time("messages_delete"):
+            return self.call(room_id, self.messages_api.delete, message_id)
+
+    def update_message(self, message_id, room_id, text=None, markdown=None):
+        """
+        Edit a message. Takes the same arguments as MessagesAPI.update().
+        @return: the updated Message.
+        """
+        with self.metrics.time("messages_update"):
+            return self.call(room_id, self.messages_api.update,
+                             messageId=message_id, roomId=room_id, text=text, markdown=markdown)
+
+    def call(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) under the rate limits for key.
+        @param key: Room id (or person) the call is for.
+        """
+        started = self._timer()
+        with self._lock:
+            self.waiting += 1
+        attempt = 0
+        try:
+            while True:
+                self._wait_for_turn(key)
+                try:
+                    result = fn(*args, **kwargs)
+                except RateLimitError as e:
+                    self._pause(e.retry_after)
+                    if attempt >= self.max_retries:
+                        raise
+                except ApiError as e:
+                    if e.status_code < 500 or attempt >= self.max_retries:
+                        raise
+                    delay = min(2 ** attempt, MAX_SERVER_ERROR_BACKOFF)
+                    log.warning(f"HTTP {e.status_code} from Webex. Retrying in {delay}s. {e}")
+                    self._sleep(delay)
+                else:
+                    self._record_sent(self._timer() - started)
+                    return result
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def _wait_for_turn(self, key):
+        room_bucket = self._room_buckets.get_or_load(key, lambda: TokenBucket(self.room_rate, self.room_burst,
+                                                                              timer=self._timer))
+        delay = max(room_bucket.reserve(), self._global_bucket.reserve(), self._paused_until - self._timer())
+        if delay > 0:
+            self._sleep(delay)
+
+    def _pause(self, retry_after):
+        log.warning(f"Rate limited by Webex. Pausing outbound messages for {retry_after}s.")
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, self._timer() + retry_after)
+
+    def _record_sent(self, latency):
+        with self._lock:
+            self.sent += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        """
+        @return: dict of queue and latency counters.
+        """
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "sent": self.sent,
+                "failed": self.failed,
+                "rate_limited": self.rate_limited,
+                "retried": self.retried,
+                "avg_latency": self.total_latency / self.sent if self.sent else 0.0,
+                "max_latency": self.max_latency,
+                "paused_for": max(0.0, self._paused_until - self._timer()),
+            }
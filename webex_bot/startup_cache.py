@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_STARTUP_CACHE_TTL = 24 * 60 * 60
+
+WDM_URL = "wdm_url"
+DEVICE_INFO = "device_info"
+BOT_IDENTITY = "bot_identity"
+
+
+def _valid_wdm_url(value):
+    return isinstance(value, str) and value.startswith(("https://", "http://"))
+
+
+def _valid_device_info(value):
+    return isinstance(value, dict) and isinstance(value.get("webSocketUrl"), str) and isinstance(value.get("url"), str)
+
+
+def _valid_bot_identity(value):
+    return isinstance(value, dict) and bool(value.get("emails")) and "displayName" in value
+
+
+VALIDATORS = {
+    WDM_URL: _valid_wdm_url,
+    DEVICE_INFO: _valid_device_info,
+    BOT_IDENTITY: _valid_bot_identity,
+}
+
+
+class StartupCache(object):
+    """
+    Remembers the values looked up when the bot starts (the WDM URL from u2c, the WDM device and the
+    bot's own identity), so that a restart can open the websocket straight away. Values are refreshed
+    in the background once the bot is running.
+
+    The file is tied to the access token it was written with (only a hash of the token is stored),
+    so changing token ignores it. Entries older than `ttl` seconds, or which fail validation, are ignored.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_STARTUP_CACHE_TTL, timer=time.time):
+        """
+        @param path: JSON file to keep the values in. Created if it does not exist.
+        @param ttl: Seconds a value may be used for after it was looked up. (default 1 day)
+        @param timer: Wall clock. Override in tests.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._token_hash = None
+        self._entries = None
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, access_token):
+        """
+        Use the entries written with this access token. Called by WebexWebsocketClient.
+        """
+        self._token_hash = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+        self._entries = None
+
+    def get(self, key):
+        """
+        @return: the cached value for key, or None if there is no fresh, valid value.
+        """
+        with self._lock:
+            entry = self._load().get(key)
+            value = None
+            if isinstance(entry, dict) and self._timer() - entry.get("saved_at", 0) < self.ttl:
+                validator = VALIDATORS.get(key)
+                if validator is None or validator(entry.get("value")):
+                    value = entry["value"]
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"saved_at": self._timer(), "value": value}
+            self._save(entries)
+
+    def invalidate(self, key=None):
+        """
+        Forget one value, or all of them.
+        """
+        with self._lock:
+            entries = self._load()
+            if key is None:
+                entries.clear()
+            else:
+                entries.pop(key, None)
+            self._save(entries)
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path) as cache_file:
+                    data = json.load(cache_file)
+                if data.get("version") == CACHE_VERSION and data.get("token") == self._token_hash:
+                    self._entries = data.get("entries") or {}
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, AttributeError) as e:
+                log.warning(f"Ignoring unreadable startup cache {self.path}: {e}")
+        return self._entries
+
+    def _save(self, entries):
+        data = {"version": CACHE_VERSION, "token": self._token_hash, "entries": entries}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file and rename, so a crash never leaves a half-written cache
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".startup_cache")
+            with os.fdopen(fd, "w") as tmp_file:
+                json.dump(data, tmp_file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning(f"Failed to write startup cache {self.path}: {e}")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
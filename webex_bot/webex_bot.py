@@ -1,25 +1,39 @@
 """Main module."""
+import contextvars
 import logging
 import os
+import threading
 import types
 
 import backoff
-import coloredlogs
 import requests
 import webexpythonsdk
+from webexpythonsdk.models.immutable import immutable_data_factory
 
-from webex_bot.commands.echo import EchoCommand
-from webex_bot.commands.help import HelpCommand
+from webex_bot.approval import ApprovalPolicy, WatchedList
+from webex_bot.cache import TTLCache
+from webex_bot.dispatcher import DEFAULT_MAX_WORKERS, KeyedDispatcher
 from webex_bot.exceptions import BotException
 from webex_bot.formatting import quote_info
+from webex_bot.log_utils import HotPathLogger, queue_log_handlers, truncated
+from webex_bot.metrics import Metrics, MetricsServer
 from webex_bot.models.command import CALLBACK_KEYWORD_KEY, Command, COMMAND_KEYWORD_KEY
 from webex_bot.models.response import Response
-from webex_bot.websockets.webex_websocket_client import WebexWebsocketClient
+from webex_bot.profiling import NOT_PROFILED
+from webex_bot.router import CommandRouter
+from webex_bot.scheduler import OutboundScheduler
+from webex_bot.startup_cache import BOT_IDENTITY
+from webex_bot.websockets.webex_websocket_client import DEFAULT_PING_INTERVAL, DEFAULT_PING_TIMEOUT, \
+    DEFAULT_U2C_URL, WebexWebsocketClient
 
 log = logging.getLogger(__name__)
+# For lines which may be logged for every incoming message
+hot_log = HotPathLogger(log)
 
 
 class WebexBot(WebexWebsocketClient):
+    # The bot's own person record, once looked up.
+    _me = None
 
     def __init__(self,
                  teams_bot_token,
@@ -33,7 +47,25 @@ class WebexBot(WebexWebsocketClient):
                  allow_bot_to_bot=False,
                  help_command=None,
                  log_level="INFO",
-                 proxies=None):
+                 proxies=None,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 membership_cache_ttl=300,
+                 membership_cache_negative_ttl=60,
+                 membership_cache_size=10000,
+                 async_ingress=False,
+                 dedup_store=None,
+                 outbound_scheduler=None,
+                 reply_concurrency=1,
+                 base_url=None,
+                 u2c_url=DEFAULT_U2C_URL,
+                 metrics=None,
+                 metrics_port=None,
+                 profiler=None,
+                 queue_logging=True,
+                 startup_cache=None,
+                 ping_interval=DEFAULT_PING_INTERVAL,
+                 ping_timeout=DEFAULT_PING_TIMEOUT,
+                 idle_timeout=None):
         """
         Initialise WebexBot.
 
@@ -50,22 +82,90 @@ class WebexBot(WebexWebsocketClient):
         @param help_command: If None, use internal HelpCommand, otherwise override.
         @param log_level: Set loggin level.
         @param proxies: Dictionary of proxies for connections.
+        @param max_workers: Number of threads processing incoming messages. Messages in the same room
+         are always processed in order. (default 8)
+        @param membership_cache_ttl: Seconds to remember that a user is a member of an approved room. (default 300)
+        @param membership_cache_negative_ttl: Seconds to remember that a user is not a member of an approved room. (default 60)
+        @param membership_cache_size: Maximum number of (room, email) membership results to remember. (default 10000)
+        @param async_ingress: If True, incoming messages are fetched on the event loop with a pooled aiohttp
+         session rather than one blocking request per worker thread. Requires the [async] extra. (default False)
+        @param dedup_store: Store of processed activity ids, used to ignore activities which Webex redelivers.
+         Use webex_bot.dedup.SqliteDedupStore to remember them across restarts. (default in-memory, 10 minutes)
+        @param outbound_scheduler: OutboundScheduler which paces all replies and retries throttled ones.
+         If None, one is created with the default rate limits.
+        @param reply_concurrency: If greater than 1, a list or generator of replies is sent while the command is
+         still producing it, with up to this many replies queued. Webex orders messages by when they arrive, so
+         replies to the same room (or person) are still sent one at a time, in order. Only replies to different
+         destinations are sent concurrently. So for replies to a single room, this overlaps producing the replies
+         with sending them, but each reply is still one round trip after the previous one. (default 1)
+        @param base_url: Webex REST API base URL. Only needs changing to run against a local test server,
+         e.g. benchmarks/fake_webex.py. (default https://webexapis.com/v1/)
+        @param u2c_url: URL of the u2c service catalog, used to find the WDM (device) service.
+        @param metrics: webex_bot.metrics.Metrics to record the latency of each stage of handling a message,
+         labelled by command. (default disabled, unless metrics_port is set)
+        @param metrics_port: If set, serve the metrics in Prometheus text format at http://127.0.0.1:<port>/metrics
+        @param profiler: webex_bot.profiling.CommandProfiler, used to profile commands switched on
+         with profiler.enable(command_keyword). (default None)
+        @param queue_logging: If True, the console log handler installed by the bot writes from a background
+         thread, so logging never blocks the threads handling messages. (default True)
+        @param startup_cache: webex_bot.startup_cache.StartupCache. If set, the WDM URL, WDM device and bot identity
+         from the last start are reused, so the bot connects without looking them up, and they are refreshed
+         in the background. (default None)
+        @param ping_interval: Seconds between pings on the websocket, used to spot a dead connection quickly and
+         measure its round trip time. None leaves keepalive to the websockets library. (default 15)
+        @param ping_timeout: Seconds to wait for a pong before reconnecting. (default 10)
+        @param idle_timeout: If set, also reconnect when nothing has been received for this many seconds.
         """
 
+        # Imported here rather than at the top, so that importing webex_bot stays fast
+        import coloredlogs
+
+        root_handlers = set(logging.getLogger().handlers)
         coloredlogs.install(level=os.getenv("LOG_LEVEL", log_level),
                             fmt='%(asctime)s  [%(levelname)s]  '
                                 '[%(module)s.%(name)s.%(funcName)'
                                 's]:%(lineno)s %(message)s')
+        if queue_logging:
+            queue_log_handlers([handler for handler in logging.getLogger().handlers if handler not in root_handlers])
+        if metrics is None and metrics_port is not None:
+            metrics = Metrics()
         log.info("Registering bot with Webex cloud")
         WebexWebsocketClient.__init__(self,
                                       teams_bot_token,
                                       bot_name,
                                       on_message=self.process_incoming_message,
                                       on_card_action=self.process_incoming_card_action,
-                                      proxies=proxies)
-
-        me = self.get_me_info()
+                                      activity_filter=self.accept_activity,
+                                      loop_activity_filter=self.accept_activity_without_lookups,
+                                      proxies=proxies,
+                                      max_workers=max_workers,
+                                      async_ingress=async_ingress,
+                                      dedup_store=dedup_store,
+                                      base_url=base_url,
+                                      u2c_url=u2c_url,
+                                      metrics=metrics,
+                                      startup_cache=startup_cache,
+                                      ping_interval=ping_interval,
+                                      ping_timeout=ping_timeout,
+                                      idle_timeout=idle_timeout)
+
+        # All replies go through the scheduler, for rate limiting and retries
+        self.outbound = outbound_scheduler if outbound_scheduler is not None \
+            else OutboundScheduler(self.outbound_teams.messages, metrics=metrics)
+        # Clean-up work (e.g. delete_previous_message) which must not delay replies
+        self.cleanup_dispatcher = KeyedDispatcher(max_workers=2, name="webex-bot-cleanup")
+        self.cleanup_stats = {"deleted": 0, "failed": 0}
+        self._cleanup_lock = threading.Lock()
+        self.reply_concurrency = reply_concurrency
+        self.reply_dispatcher = KeyedDispatcher(max_workers=reply_concurrency, name="webex-bot-reply") \
+            if reply_concurrency > 1 else None
+
+        self.profiler = profiler
+        self.metrics_server = MetricsServer(metrics, port=metrics_port).start() if metrics_port is not None else None
+
+        me = self._me if self._me is not None else self.get_me_info()
         if help_command is None:
+            from webex_bot.commands.help import HelpCommand
             self.help_command = HelpCommand(
                 bot_name=bot_name,
                 bot_help_subtitle=bot_help_subtitle,
@@ -80,33 +180,71 @@ class WebexBot(WebexWebsocketClient):
         self.commands = {
             self.help_command
         }
+        # Index of self.commands used to look up the command for each message
+        self.router = CommandRouter(self.commands)
 
         if include_demo_commands:
+            from webex_bot.commands.echo import EchoCommand
             self.add_command(EchoCommand())
 
         self.help_command.commands = self.commands
 
         self.card_callback_commands = {}
-        self.approved_users = approved_users if approved_users is not None else []
-        self.approved_domains = approved_domains if approved_domains is not None else []
-        self.approved_rooms = approved_rooms if approved_rooms is not None else []
+        self._approved_users = self._watched_list(approved_users)
+        self._approved_domains = self._watched_list(approved_domains)
+        self._approved_rooms = self._watched_list(approved_rooms)
+        self.approval_policy = ApprovalPolicy(self._approved_users, self._approved_domains, self._approved_rooms)
+        # (room id, email) -> bool. Shared by approved_rooms on the bot and on commands.
+        self.membership_cache = TTLCache(maxsize=membership_cache_size, ttl=membership_cache_ttl)
+        self.membership_cache_negative_ttl = membership_cache_negative_ttl
         self.approval_parameters_check()
         self.bot_display_name = ""
         self.threads = threads
         self.allow_bot_to_bot = allow_bot_to_bot
 
-    @backoff.on_exception(backoff.expo, requests.exceptions.ConnectionError)
+    def _bootstrap_steps(self):
+        steps = super()._bootstrap_steps()
+        steps["people_me"] = self._bootstrap_me_info
+        return steps
+
+    def _bootstrap_me_info(self):
+        with self.startup_timings.time("people_me"):
+            return self.get_me_info()
+
     def get_me_info(self):
+        """
+        Get the bot's own identity, from the startup cache if possible.
+        """
+        cached = self._get_cached(BOT_IDENTITY)
+        if cached is not None:
+            return self._set_me_info(immutable_data_factory("person", cached))
+        return self._fetch_me_info()
+
+    @backoff.on_exception(backoff.expo, requests.exceptions.ConnectionError)
+    def _fetch_me_info(self):
         """
         Fetch me info from webexpythonsdk
         """
         me = self.teams.people.me()
+        if self.startup_cache is not None:
+            self._set_cached(BOT_IDENTITY, me.to_dict())
+        return self._set_me_info(me)
+
+    def _set_me_info(self, me):
+        self._me = me
         self.bot_display_name = me.displayName
         self.bot_email = me.emails[0]
         log.info(f"Running as {me.type} '{me.displayName}' with email {self.bot_email}")
         log.debug(f"Running as bot '{me}'")
         return me
 
+    def _refresh_startup_cache(self):
+        super()._refresh_startup_cache()
+        try:
+            self._fetch_me_info()
+        except Exception as e:
+            log.warning(f"Failed to refresh bot identity: {e}")
+
     def add_command(self, command_class: Command):
         """
         Add a new command to the bot
@@ -123,14 +261,58 @@ class WebexBot(WebexWebsocketClient):
                                 f"'{command_class.command_keyword}' adaptive card JSON.")
 
         self.commands.add(command_class)
+        self.router.add(command_class)
         for chained_command in command_class.chained_commands:
             self.commands.add(chained_command)
+            self.router.add(chained_command)
+        if hasattr(self.help_command, "invalidate_card"):
+            self.help_command.invalidate_card()
+
+    def _watched_list(self, value):
+        """
+        Copy of an approved list which updates the approval policy whenever it is changed in place.
+        """
+        return WatchedList(value or [], on_change=self.update_approval_policy)
+
+    @property
+    def approved_users(self):
+        return self._approved_users
+
+    @approved_users.setter
+    def approved_users(self, value):
+        self._approved_users = self._watched_list(value)
+        self.update_approval_policy()
+
+    @property
+    def approved_domains(self):
+        return self._approved_domains
+
+    @approved_domains.setter
+    def approved_domains(self, value):
+        self._approved_domains = self._watched_list(value)
+        self.update_approval_policy()
+
+    @property
+    def approved_rooms(self):
+        return self._approved_rooms
+
+    @approved_rooms.setter
+    def approved_rooms(self, value):
+        self._approved_rooms = self._watched_list(value)
+        self.update_approval_policy()
+
+    def update_approval_policy(self):
+        """
+        Rebuild the approval policy from the approved lists. Called automatically when the lists
+        are assigned or changed in place (e.g. bot.approved_users.append(email)).
+        """
+        self.approval_policy.update(self._approved_users, self._approved_domains, self._approved_rooms)
 
     def approval_parameters_check(self):
         """
         Simply logs a warning if no approved users, domains or rooms are set.
         """
-        if len(self.approved_users) == 0 and len(self.approved_domains) == 0 and len(self.approved_rooms) == 0:
+        if self.approval_policy.is_open:
             log.warning("Your bot is open to anyone on Webex Teams. "
                         "Consider limiting this to specific users, domains or room members via the "
                         "WebexBot(approved_domains=['example.com'], approved_users=['user@company.com'], "
@@ -149,33 +331,97 @@ class WebexBot(WebexWebsocketClient):
         @param user_email: The email from the user of the incoming message.
         """
         user_approved = False
-        self.approval_parameters_check()
+        policy = self.approval_policy
 
-        if len(self.approved_users) == 0 and len(self.approved_domains) == 0 and len(approved_rooms) == 0:
-            user_approved = True
-        elif len(self.approved_domains) > 0 and user_email.split('@')[1] in self.approved_domains:
+        if not policy.has_user_or_domain_rules and len(approved_rooms) == 0:
             user_approved = True
-        elif len(self.approved_users) > 0 and user_email in self.approved_users:
+        elif policy.is_user_or_domain_approved(user_email):
             user_approved = True
         elif len(approved_rooms) > 0 and self.is_user_member_of_room(user_email, approved_rooms):
             user_approved = True
 
         if not user_approved:
-            log.warning(f"{user_email} is not approved to interact at this time. Ignoring.")
+            hot_log.warning("%s is not approved to interact at this time. Ignoring.", user_email)
         return user_approved
 
     def is_user_member_of_room(self, user_email, approved_rooms):
-        is_user_member = False
+        """
+        Check if the user is a member of any of the rooms.
 
+        Results are cached in self.membership_cache, and concurrent checks for the
+        same room and user share a single API call.
+        """
         for approved_room in approved_rooms:
             try:
-                room_members = self.teams.memberships.list(roomId=approved_room, personEmail=user_email)
-                for member in room_members:
-                    if member.personEmail == user_email:
-                        is_user_member = True
+                is_member = self.membership_cache.get_or_load(
+                    (approved_room, user_email),
+                    lambda: self._fetch_room_membership(approved_room, user_email),
+                    ttl=self._membership_cache_ttl)
             except webexpythonsdk.exceptions.ApiError as apie:
                 log.warning(f"API error: {apie}")
-        return is_user_member
+                continue
+            if is_member:
+                return True
+        return False
+
+    def _membership_cache_ttl(self, is_member):
+        return self.membership_cache.ttl if is_member else self.membership_cache_negative_ttl
+
+    def _fetch_room_membership(self, room_id, user_email):
+        room_members = self.teams.memberships.list(roomId=room_id, personEmail=user_email)
+        return any(member.personEmail == user_email for member in room_members)
+
+    def accept_activity(self, activity):
+        """
+        Decide from the raw websocket activity whether a message is worth fetching.
+
+        Messages from this bot, from other bots (unless allow_bot_to_bot is set) and from
+        users who are not approved are rejected here, before any REST calls are made.
+        :param activity: The websocket activity object
+        :return: True if the message should be processed.
+        """
+        actor = activity.get('actor') or {}
+        user_email = actor.get('emailAddress')
+        if not user_email:
+            # Not enough to go on. Leave it to process_incoming_message.
+            return True
+
+        if actor.get('type') != 'PERSON':
+            if getattr(self, 'bot_email', None) == user_email:
+                log.debug("Message is from myself (%s), ignoring.", user_email)
+                return False
+            if not self.allow_bot_to_bot:
+                hot_log.warning("Message is from a bot (%s), ignoring.", user_email)
+                return False
+
+        return self.check_user_approved(user_email=user_email, approved_rooms=self.approved_rooms)
+
+    def accept_activity_without_lookups(self, activity):
+        """
+        accept_activity for the async_ingress event loop, which must not block on REST calls.
+
+        Room membership is only taken from the membership cache. A user whose membership is not
+        cached is let through, to be checked (with a lookup) by process_incoming_message on a worker.
+        :param activity: The websocket activity object
+        :return: True if the message should be processed.
+        """
+        approved_rooms = self.approved_rooms
+        if not approved_rooms:
+            return self.accept_activity(activity)
+        actor = activity.get('actor') or {}
+        user_email = actor.get('emailAddress')
+        if not user_email:
+            return True
+        if actor.get('type') != 'PERSON' and (getattr(self, 'bot_email', None) == user_email
+                                              or not self.allow_bot_to_bot):
+            return self.accept_activity(activity)
+        if self.approval_policy.is_user_or_domain_approved(user_email):
+            return True
+        memberships = [self.membership_cache.get((room, user_email)) for room in approved_rooms]
+        if True in memberships or None in memberships:
+            return True
+        hot_log.warning("%s is not approved to interact at this time. Ignoring.", user_email)
+        return False
 
     def process_incoming_card_action(self, attachment_actions, activity):
         """
@@ -189,7 +435,7 @@ class WebexBot(WebexWebsocketClient):
         command_keyword = attachment_actions.inputs.get(COMMAND_KEYWORD_KEY)
         is_card_callback_command = callback_keyword is not None
         raw_message = callback_keyword if callback_keyword else command_keyword
-        log.debug(f"raw_message (callback) ='{raw_message}' is_card_callback_command={is_card_callback_command}")
+        log.debug("raw_message (callback) ='%s' is_card_callback_command=%s", raw_message, is_card_callback_command)
 
         self.process_raw_command(raw_message,
                                  attachment_actions, activity['actor']['emailAddress'], activity,
@@ -209,19 +455,22 @@ class WebexBot(WebexWebsocketClient):
 
         if activity['actor']['type'] != 'PERSON':
             if self.bot_email == user_email:
-                log.warning(f"Message is from myself ({self.bot_email}), ignoring.")
+                hot_log.warning("Message is from myself (%s), ignoring.", self.bot_email)
                 return
             if not self.allow_bot_to_bot:
-                log.warning(f"Message is from a bot ({user_email}), ignoring.")
+                hot_log.warning("Message is from a bot (%s), ignoring.", user_email)
                 return
             else:
-                log.warning(
-                    f"Message is from another bot ({user_email}), and allow_bot_to_bot is {self.allow_bot_to_bot}. Be careful not to create a message loop!")
+                hot_log.warning("Message is from another bot (%s), and allow_bot_to_bot is %s. "
+                                "Be careful not to create a message loop!", user_email, self.allow_bot_to_bot)
 
         # Log details on message
-        log.info(f"Message received from '{user_email}': {teams_message}")
+        hot_log.info("Message received from '%s'", user_email)
+        log.debug("Message: %s", truncated(teams_message))
 
-        if not self.check_user_approved(user_email=user_email, approved_rooms=self.approved_rooms):
+        with self.metrics.time("approval", ""):
+            approved = self.check_user_approved(user_email=user_email, approved_rooms=self.approved_rooms)
+        if not approved:
             return
 
         # Remove the Bots display name from the message if this is not a 1-1
@@ -238,49 +487,39 @@ class WebexBot(WebexWebsocketClient):
             raw_message = ""
 
         # Find the command that was sent, if any
-        command = None
         user_command = raw_message.lower()
-        log.debug(f"New user_command: {user_command}")
-        log.debug(f"is_card_callback_command: '{is_card_callback_command}'")
-
-        for c in self.commands:
-            log.debug("--------")
-            log.debug(f"Checking c.command_keyword: {c.command_keyword}'")
-
-            if not is_card_callback_command and c.command_keyword:
-                log.debug(f"c.command_keyword: {c.command_keyword}")
-                log.debug(f"exact_command_keyword_match: {c.exact_command_keyword_match}")
-                log.debug(f"user_command: {user_command}")
-                log.debug(f"command_keyword: {c.command_keyword}")
-                if c.exact_command_keyword_match:  # Check if the "exact_command_keyword_match" flag is set to True
-                    if user_command == c.command_keyword:
-                        log.debug(f"Exact match found for command: '{c.command_keyword}'")
-                        command = c
-                        # If a command was found, stop looking for others
-                        break
-                else:  # Enter here if the "exact_command_keyword_match" flag is set to False
-                    if user_command.find(c.command_keyword) != -1:
-                        log.debug(f"Sub-string match found for command: '{c.command_keyword}'")
-                        command = c
-                        # If a command was found, stop looking for others
-                        break
-            else:
-                log.debug(f"card_callback_keyword: '{c.card_callback_keyword}'")
-                if user_command == c.command_keyword or user_command == c.card_callback_keyword:
-                    command = c
-                    break
+        if len(self.router) != len(self.commands):
+            # self.commands was changed directly rather than via add_command()
+            self.router = CommandRouter(self.commands)
+        log.debug("New user_command: '%s' is_card_callback_command=%s", truncated(user_command), is_card_callback_command)
+        with self.metrics.time("command_match", ""):
+            command = self.router.match(user_command, is_card_callback_command=is_card_callback_command)
 
         if not command:
-            log.warning(f"Did not find command for user entered text: '{user_command}'. Default to help card.")
+            hot_log.warning("Did not find command for user entered text: '%s'. Default to help card.",
+                            truncated(user_command, 100))
             command = self.help_command
         else:
-            log.debug(f"Found command: '{command.command_keyword}'")
+            log.debug("Found command: '%s'", command.command_keyword)
 
             if command.approved_rooms:
-                if not self.check_user_approved(user_email=user_email, approved_rooms=command.approved_rooms):
-                    log.info(f"{user_email} is not allowed to run command: '{command.command_keyword}'")
+                with self.metrics.time("approval", command.command_keyword):
+                    approved = self.check_user_approved(user_email=user_email, approved_rooms=command.approved_rooms)
+                if not approved:
+                    hot_log.info("%s is not allowed to run command: '%s'", user_email, command.command_keyword)
                     return
 
+        # Everything recorded from here on (including sends) is labelled with the command
+        with self.metrics.command_scope(command.command_keyword):
+            return self._run_command(command, raw_message, teams_message, user_email, activity,
+                                     is_card_callback_command, room_id, is_one_on_one_space)
+
+    def _run_command(self, command, raw_message, teams_message, user_email, activity,
+                     is_card_callback_command, room_id, is_one_on_one_space):
+        """
+        Run a command which process_raw_command() has matched and approved, and send its replies.
+        @return: id of the final reply.
+        """
         # Build the reply to the user
         reply = ""
         reply_one_to_one = False
@@ -290,28 +529,31 @@ class WebexBot(WebexWebsocketClient):
         if hasattr(teams_message, "inputs") and teams_message.inputs.get("thread_parent_id"):
             thread_parent_id = teams_message.inputs.get("thread_parent_id")
         elif 'parent' in activity:
-            log.info(f"activity: {activity}")
+            log.debug("activity: %s", truncated(activity))
 
             if activity['parent']['type'] == 'reply':
                 thread_parent_id = activity['parent']['id']
             else:
                 # Some bug where message cannot be sent back in response to cardAction in thread.
                 # Must reply outside of the thread in this case.
-                log.warning(f"There is a server side bug where message cannot be sent back in "
-                            f"response to cardAction inside a thread. "
-                            f"Must reply outside of the thread in this case.: {activity}")
+                hot_log.warning("There is a server side bug where message cannot be sent back in "
+                                "response to cardAction inside a thread. "
+                                "Must reply outside of the thread in this case.: %s", truncated(activity))
                 thread_parent_id = None
         elif 'id' in activity:
             thread_parent_id = activity['id']
         else:
             log.debug("There is no activity id (thread ID) for this request.")
 
-        if command.delete_previous_message and hasattr(teams_message, 'messageId'):
+        if (command.delete_previous_message or command.update_previous_message) \
+                and hasattr(teams_message, 'messageId'):
             previous_message_id = teams_message.messageId
-            log.info(f"delete_previous_message is True. Deleting message with ID: {previous_message_id}")
-            self.teams.messages.delete(previous_message_id)
+            log.debug("delete_previous_message is True. Deleting message with ID: %s", previous_message_id)
+            self.delete_message_in_background(previous_message_id, room_id)
 
         pre_reply_message_id = None
+        # Whether the pre-execute (or pre-card-load) message is plain text, so can be edited to show the reply
+        pre_reply_is_editable = False
 
         if not is_card_callback_command and command.card is not None:
             response = Response()
@@ -328,31 +570,91 @@ class WebexBot(WebexWebsocketClient):
             pre_reply_message_id = self.do_reply(
                 pre_card_load_reply, room_id, user_email,
                 pre_card_load_reply_one_to_one, is_one_on_one_space, thread_parent_id)
+            pre_reply_is_editable = self._get_edit_for_reply(pre_card_load_reply,
+                                                             pre_card_load_reply_one_to_one) is not None
             reply = response
         else:
-            log.debug(f"Going to run command: '{command}' with input: '{message_without_command}'")
+            log.debug("Going to run command: '%s' with input: '%s'", command, truncated(message_without_command))
             pre_execute_reply, pre_execute_reply_one_to_one = self.run_pre_execute(command=command,
                                                                                    message=message_without_command,
                                                                                    teams_message=teams_message,
                                                                                    activity=activity)
             pre_reply_message_id = self.do_reply(pre_execute_reply, room_id, user_email, pre_execute_reply_one_to_one, is_one_on_one_space, thread_parent_id)
+            pre_reply_is_editable = self._get_edit_for_reply(pre_execute_reply,
+                                                             pre_execute_reply_one_to_one) is not None
             reply, reply_one_to_one = self.run_command_and_handle_bot_exceptions(command=command,
                                                                                  message=message_without_command,
                                                                                  teams_message=teams_message,
                                                                                  activity=activity)
-        log.debug(f"thread id={thread_parent_id}")
+        log.debug("thread id=%s", thread_parent_id)
+        if command.update_previous_message and pre_reply_message_id and pre_reply_is_editable:
+            return self.update_reply(pre_reply_message_id, reply, room_id, user_email, reply_one_to_one,
+                                     is_one_on_one_space, thread_parent_id)
         final_message_id = self.do_reply(reply, room_id, user_email, reply_one_to_one, is_one_on_one_space, thread_parent_id)
 
         # If requested, delete the pre-execute (or pre-card-load) message once the final reply has been sent
-        if command.delete_previous_message and pre_reply_message_id:
-            try:
-                log.info(f"Deleting pre-execute message with ID: {pre_reply_message_id}")
-                self.teams.messages.delete(pre_reply_message_id)
-            except Exception as e:
-                log.warning(f"Failed to delete pre-execute message {pre_reply_message_id}: {e}")
+        if (command.delete_previous_message or command.update_previous_message) and pre_reply_message_id:
+            log.debug("Deleting pre-execute message with ID: %s", pre_reply_message_id)
+            self.delete_message_in_background(pre_reply_message_id, room_id)
 
         return final_message_id
 
+    def delete_message_in_background(self, message_id, room_id):
+        """
+        Delete a message without holding up the reply to the user.
+
+        Deletes run on self.cleanup_dispatcher, in order for each room, and are retried by the
+        OutboundScheduler on 429 and 5xx errors. Outcomes are counted in self.cleanup_stats.
+        @return: Future which completes once the delete has been attempted.
+        """
+        return self.cleanup_dispatcher.submit(room_id, self._delete_message, message_id, room_id)
+
+    def _delete_message(self, message_id, room_id):
+        try:
+            self.outbound.delete_message(message_id, room_id)
+        except Exception as e:
+            log.warning(f"Failed to delete message {message_id}: {e}")
+            with self._cleanup_lock:
+                self.cleanup_stats["failed"] += 1
+            return False
+        with self._cleanup_lock:
+            self.cleanup_stats["deleted"] += 1
+        return True
+
+    def update_reply(self, message_id, reply, room_id, user_email, reply_one_to_one, is_one_on_one_space, conv_target_id):
+        """
+        Show the reply by editing one of the bot's own text messages, e.g. its pre-execute message.
+
+        Webex can only edit the text of a message, so if the reply is a card, a list, has files or
+        is to be sent 1-1, or the edit fails, the reply is posted and the message deleted instead.
+        @return: id of the message showing the reply
+        """
+        edit = self._get_edit_for_reply(reply, reply_one_to_one)
+        if edit is not None:
+            try:
+                self.outbound.update_message(message_id, room_id, **edit)
+                return message_id
+            except webexpythonsdk.exceptions.ApiError as e:
+                log.info(f"Could not edit message {message_id}, posting and deleting instead: {e}")
+        created_message_id = self.do_reply(reply, room_id, user_email, reply_one_to_one, is_one_on_one_space,
+                                           conv_target_id)
+        self.delete_message_in_background(message_id, room_id)
+        return created_message_id
+
+    @staticmethod
+    def _get_edit_for_reply(reply, reply_one_to_one):
+        """
+        @return: text/markdown kwargs for an edit which shows this reply, or None if an edit cannot.
+        """
+        if not reply or reply_one_to_one:
+            return None
+        if isinstance(reply, str):
+            return {"markdown": reply}
+        if isinstance(reply, Response) and not reply.attachments and not reply.files \
+                and (reply.text or reply.markdown):
+            return {"text": reply.text, "markdown": reply.markdown}
+        return None
+
     def do_reply(self, reply, room_id, user_email, reply_one_to_one, is_one_on_one_space, conv_target_id):
         # allow command handlers to craft their own Teams message
         created_message_id = None
@@ -363,28 +665,16 @@ class WebexBot(WebexWebsocketClient):
             if not reply.parentId and conv_target_id and self.threads:
                 reply.parentId = conv_target_id
             reply_dict = reply.as_dict()
-            created = self.teams.messages.create(**reply_dict)
+            created = self.outbound.create_message(**reply_dict)
             created_message_id = getattr(created, 'id', None)
         # Support returning a list of Responses
         elif reply and (isinstance(reply, list) or isinstance(reply, types.GeneratorType)):
+            if self.reply_concurrency > 1:
+                return self._do_pipelined_reply(reply, room_id, user_email, reply_one_to_one,
+                                                is_one_on_one_space, conv_target_id)
             for response in reply:
-                # Make sure is a Response
-                if isinstance(response, Response):
-                    if not response.roomId:
-                        response.roomId = room_id
-                    if not response.parentId and conv_target_id:
-                        response.parentId = conv_target_id
-                    created = self.teams.messages.create(**response.as_dict())
-                    created_message_id = getattr(created, 'id', None)
-                else:
-                    # Just a plain message
-                    created_message_id = self.send_message_to_room_or_person(
-                        user_email,
-                        room_id,
-                        reply_one_to_one,
-                        is_one_on_one_space,
-                        response,
-                        conv_target_id)
+                created_message_id = self._send_reply_item(response, room_id, user_email, reply_one_to_one,
+                                                           is_one_on_one_space, conv_target_id)
         elif reply:
             created_message_id = self.send_message_to_room_or_person(
                 user_email,
@@ -395,6 +685,59 @@ class WebexBot(WebexWebsocketClient):
                 conv_target_id)
         return created_message_id
 
+    def _send_reply_item(self, response, room_id, user_email, reply_one_to_one, is_one_on_one_space, conv_target_id):
+        """
+        Send one item from a list (or generator) of replies.
+        @return: id of the created message
+        """
+        # Make sure is a Response
+        if isinstance(response, Response):
+            if not response.roomId:
+                response.roomId = room_id
+            if not response.parentId and conv_target_id:
+                response.parentId = conv_target_id
+            created = self.outbound.create_message(**response.as_dict())
+            return getattr(created, 'id', None)
+        # Just a plain message
+        return self.send_message_to_room_or_person(
+            user_email,
+            room_id,
+            reply_one_to_one,
+            is_one_on_one_space,
+            response,
+            conv_target_id)
+
+    def _do_pipelined_reply(self, replies, room_id, user_email, reply_one_to_one, is_one_on_one_space, conv_target_id):
+        """
+        Send a list (or generator) of replies while the next ones are still being produced.
+
+        Webex orders messages in a room by when they arrive, so replies for the same room (or person)
+        are sent one after another, in order, and only overlap with producing the next replies.
+        Replies for different destinations are sent in parallel.
+        At most reply_concurrency replies are queued at once, so a generator is only consumed as fast
+        as its replies can be sent.
+        @return: id of the last created message
+        """
+        slots = threading.BoundedSemaphore(self.reply_concurrency)
+        futures = []
+        for response in replies:
+            if isinstance(response, Response):
+                key = response.roomId or response.attributes.get("toPersonEmail") or room_id
+            else:
+                key = user_email if reply_one_to_one else room_id
+            slots.acquire()
+            # Run in a copy of this context, so the send is labelled with the command in the metrics
+            future = self.reply_dispatcher.submit(key, contextvars.copy_context().run, self._send_reply_item,
+                                                  response, room_id, user_email,
+                                                  reply_one_to_one, is_one_on_one_space, conv_target_id)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+
+        created_message_id = None
+        for future in futures:
+            created_message_id = future.result()
+        return created_message_id
+
     def send_message_to_room_or_person(self,
                                        user_email,
                                        room_id,
@@ -408,24 +751,24 @@ class WebexBot(WebexWebsocketClient):
         if reply_one_to_one:
             if not is_one_on_one_space:
                 if self.threads:
-                    last_created = self.teams.messages.create(roomId=room_id,
-                                                              markdown=default_move_to_one_to_one_heads_up,
-                                                              parentId=conv_target_id)
+                    last_created = self.outbound.create_message(roomId=room_id,
+                                                                markdown=default_move_to_one_to_one_heads_up,
+                                                                parentId=conv_target_id)
                 else:
-                    last_created = self.teams.messages.create(roomId=room_id,
-                                                              markdown=default_move_to_one_to_one_heads_up)
+                    last_created = self.outbound.create_message(roomId=room_id,
+                                                                markdown=default_move_to_one_to_one_heads_up)
             if self.threads:
-                last_created = self.teams.messages.create(toPersonEmail=user_email,
-                                                          markdown=reply,
-                                                          parentId=conv_target_id)
+                last_created = self.outbound.create_message(toPersonEmail=user_email,
+                                                            markdown=reply,
+                                                            parentId=conv_target_id)
             else:
-                last_created = self.teams.messages.create(toPersonEmail=user_email,
-                                                          markdown=reply)
+                last_created = self.outbound.create_message(toPersonEmail=user_email,
+                                                            markdown=reply)
         else:
             if self.threads:
-                last_created = self.teams.messages.create(roomId=room_id, markdown=reply, parentId=conv_target_id)
+                last_created = self.outbound.create_message(roomId=room_id, markdown=reply, parentId=conv_target_id)
             else:
-                last_created = self.teams.messages.create(roomId=room_id, markdown=reply)
+                last_created = self.outbound.create_message(roomId=room_id, markdown=reply)
         return getattr(last_created, 'id', None)
 
     def run_pre_card_load_reply(self, command, message, teams_message, activity):
@@ -433,9 +776,10 @@ class WebexBot(WebexWebsocketClient):
         This allows a reply to be sent back before the command/card function is called. Useful if it takes a while for the card to generate.
         """
         try:
-            return command.pre_card_load_reply(message, teams_message, activity), False
+            with self.metrics.time("pre_card_load_reply"), self._profile(command, "pre_card_load_reply"):
+                return command.pre_card_load_reply(message, teams_message, activity), False
         except BotException as e:
-            log.warning(f"BotException: {e.debug_message}")
+            hot_log.warning("BotException: %s", e.debug_message)
             return e.reply_message, e.reply_one_to_one
 
     def run_pre_execute(self, command, message, teams_message, activity):
@@ -443,18 +787,25 @@ class WebexBot(WebexWebsocketClient):
         This allows a reply to be sent back before the execute function is called. Useful if it takes a while to run.
         """
         try:
-            return command.pre_execute(message, teams_message, activity), False
+            with self.metrics.time("pre_execute"), self._profile(command, "pre_execute"):
+                return command.pre_execute(message, teams_message, activity), False
         except BotException as e:
-            log.warning(f"BotException: {e.debug_message}")
+            hot_log.warning("BotException: %s", e.debug_message)
             return e.reply_message, e.reply_one_to_one
 
     def run_command_and_handle_bot_exceptions(self, command, message, teams_message, activity):
         try:
-            return command.card_callback(message, teams_message, activity), False
+            with self.metrics.time("execute"), self._profile(command, "execute"):
+                return command.card_callback(message, teams_message, activity), False
         except BotException as e:
-            log.warning(f"BotException: {e.debug_message}")
+            hot_log.warning("BotException: %s", e.debug_message)
             return e.reply_message, e.reply_one_to_one
 
+    def _profile(self, command, stage):
+        if self.profiler is None:
+            return NOT_PROFILED
+        return self.profiler.profile(command.command_keyword, stage)
+
     @staticmethod
     def get_message_passed_to_command(command, message):
         """
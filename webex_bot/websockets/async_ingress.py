@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+from webexpythonsdk.models.immutable import immutable_data_factory
+
+# aiohttp is imported when an AsyncIngress is first created, as importing it is slow.
+aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_REQUEST_TIMEOUT = 60
+
+
+def _import_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as _aiohttp
+        except ImportError:
+            raise ImportError("Failed to load libraries for async ingress, maybe forgot [async] option during installation.")
+        aiohttp = _aiohttp
+    return aiohttp
+
+
+class AsyncIngress(object):
+    """
+    Fetches the details of incoming activities on the event loop, using a pooled aiohttp session,
+    so that many events can be in flight at once without a thread each.
+    """
+
+    def __init__(self, headers, base_url, proxy=None, ssl=None,
+                 limit=DEFAULT_CONNECTION_LIMIT, timeout=DEFAULT_REQUEST_TIMEOUT):
+        """
+        @param headers: Headers sent with every request (auth, tracking id etc.)
+        @param base_url: Webex API base URL, e.g. https://webexapis.com/v1/
+        @param proxy: (optional) URL of an HTTP proxy.
+        @param ssl: (optional) SSLContext for the connections.
+        @param limit: Maximum number of concurrent connections. (default 100)
+        @param timeout: Total timeout in seconds for each request. (default 60)
+        """
+        _import_aiohttp()
+        self.headers = headers
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.proxy = proxy
+        self.ssl = ssl
+        self.limit = limit
+        self.timeout = timeout
+        self.session = None
+
+    async def start(self):
+        """Open the connection pool. Must be called from the event loop which will use it."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, ssl=self.ssl if self.ssl is not None else True)
+            self.session = aiohttp.ClientSession(headers=self.headers,
+                                                 connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self.session is not None:
+            session, self.session = self.session, None
+            await session.close()
+
+    async def get_json(self, url):
+        """
+        @return: decoded JSON body, or None if the request failed.
+        """
+        try:
+            async with self.session.get(url, proxy=self.proxy) as response:
+                if response.status >= 400:
+                    logger.warning(f"Failed to retrieve {url}: HTTP {response.status}")
+                    return None
+                return await response.json(content_type=None)
+        # asyncio.TimeoutError is only an alias of TimeoutError from Python 3.11
+        except (aiohttp.ClientError, asyncio.TimeoutError, TimeoutError) as e:
+            logger.warning(f"Failed to retrieve {url}: {e}")
+            return None
+
+    async def get_base64_message_id(self, conversation_message_url):
+        """
+        @param conversation_message_url: URL from WebexWebsocketClient._get_conversation_message_url()
+        @return: base 64 message id, or None if the message could not be resolved
+        """
+        conversation_message = await self.get_json(conversation_message_url)
+        if conversation_message is None:
+            return None
+        if 'id' not in conversation_message:
+            logger.warning(f"Response from {conversation_message_url} missing 'id' field: {conversation_message}")
+            return None
+        return conversation_message['id']
+
+    async def get_message(self, message_id):
+        """
+        Async equivalent of teams.messages.get()
+        @return: Message, or None if it could not be fetched.
+        """
+        json_data = await self.get_json(f"{self.base_url}messages/{message_id}")
+        return immutable_data_factory("message", json_data) if json_data is not None else None
+
+    async def get_attachment_action(self, action_id):
+        """
+        Async equivalent of teams.attachment_actions.get()
+        @return: AttachmentAction, or None if it could not be fetched.
+        """
+        json_data = await self.get_json(f"{self.base_url}attachment/actions/{action_id}")
+        return immutable_data_factory("attachment_action", json_data) if json_data is not None else None
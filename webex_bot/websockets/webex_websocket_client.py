@@ -1,9 +1,13 @@
 import asyncio
+import functools
 import json
 import inspect
 import logging
+import random
 import socket
 import ssl
+import threading
+import time
 import uuid
 
 import backoff
@@ -17,6 +21,13 @@ except ImportError:  # pragma: no cover - fallback for older websockets versions
     from websockets.exceptions import InvalidStatus
 
 from webex_bot import __version__
+from webex_bot.bootstrap import StartupTimings, run_concurrently
+from webex_bot.dedup import MemoryDedupStore
+from webex_bot.dispatcher import DEFAULT_MAX_WORKERS, KeyedDispatcher
+from webex_bot.log_utils import HotPathLogger, truncated
+from webex_bot.metrics import NULL_METRICS
+from webex_bot.startup_cache import DEVICE_INFO, WDM_URL
+from webex_bot.websockets.async_ingress import AsyncIngress
 
 try:
     from websockets_proxy import Proxy, proxy_connect
@@ -25,6 +36,8 @@ except ImportError:
     proxy_connect = None
 
 logger = logging.getLogger(__name__)
+# For lines which may be logged for every incoming event
+hot_logger = HotPathLogger(logger)
 
 DEFAULT_U2C_URL = "https://u2c.wbx2.com/u2c/api/v1/catalog"
 
@@ -38,10 +51,42 @@ DEVICE_DATA = {
     "systemVersion": "0.1"
 }
 
-ssl_context = ssl.create_default_context()
-ssl_context.load_verify_locations(certifi.where())
+
+@functools.lru_cache(maxsize=None)
+def get_ssl_context():
+    """
+    @return: SSLContext trusting the certifi CA bundle. Created on first use, as loading the bundle
+     takes a noticeable part of the import time otherwise.
+    """
+    context = ssl.create_default_context()
+    context.load_verify_locations(certifi.where())
+    return context
+
+
+def __getattr__(name):
+    # ssl_context used to be created when this module was imported; keep it importable.
+    if name == "ssl_context":
+        return get_ssl_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 MAX_BACKOFF_TIME = 240
+# Reconnect delays grow exponentially from RECONNECT_BASE_DELAY up to RECONNECT_MAX_DELAY seconds, and
+# each one is picked at random below that ("full jitter"), so a fleet of bots does not reconnect in step.
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+# Consecutive failures to reconnect with the same device before checking it still exists.
+VERIFY_DEVICE_AFTER = 3
+# Websocket handshake statuses which mean the device registration is no longer valid.
+DEVICE_GONE_STATUSES = (404, 410)
+# Seconds between pings on the websocket, and to wait for each pong before treating the connection as dead.
+DEFAULT_PING_INTERVAL = 15.0
+DEFAULT_PING_TIMEOUT = 10.0
+
+
+class ConnectionStalled(Exception):
+    """The websocket stopped responding, so it was dropped to be reopened."""
+
 
 # Exceptions that should trigger backoff retry.
 # NOTE: InvalidStatus is intentionally NOT included here.
@@ -52,18 +97,86 @@ BACKOFF_EXCEPTIONS = (
     websockets.ConnectionClosedOK,
     websockets.ConnectionClosed,
     socket.gaierror,
+    ConnectionStalled,
 )
 
 
+def reconnect_delay(failures, base=RECONNECT_BASE_DELAY, cap=RECONNECT_MAX_DELAY, random=random.random):
+    """
+    @param failures: Consecutive failed attempts so far.
+    @return: seconds to wait before the next attempt, chosen at random up to base * 2^failures (at most cap).
+    """
+    return random() * min(cap, base * 2 ** failures)
+
+
 class WebexWebsocketClient(object):
+    # Per-stage latency histograms. See webex_bot.metrics.Metrics.
+    metrics = NULL_METRICS
+    # Optional webex_bot.startup_cache.StartupCache, and whether any value was taken from it this run.
+    startup_cache = None
+    _startup_cache_used = False
+    # webex_bot.bootstrap.StartupTimings, set while the client is initialised.
+    startup_timings = None
+    # See __init__.
+    loop_activity_filter = None
+    # Whether the websocket has been opened since the last failure, and when the last open one was lost.
+    _connection_opened = False
+    _disconnected_at = None
+    # Liveness checks on the open websocket. See __init__.
+    ping_interval = DEFAULT_PING_INTERVAL
+    ping_timeout = DEFAULT_PING_TIMEOUT
+    idle_timeout = None
+    # Round trip time, in seconds, of the last ping answered, and when anything was last received.
+    websocket_rtt = None
+    _last_received = 0.0
+
     def __init__(self,
                  access_token,
                  bot_name,
                  on_message=None,
                  on_card_action=None,
-                 proxies=None):
+                 activity_filter=None,
+                 loop_activity_filter=None,
+                 proxies=None,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 async_ingress=False,
+                 dedup_store=None,
+                 base_url=None,
+                 u2c_url=DEFAULT_U2C_URL,
+                 metrics=None,
+                 startup_cache=None,
+                 ping_interval=DEFAULT_PING_INTERVAL,
+                 ping_timeout=DEFAULT_PING_TIMEOUT,
+                 idle_timeout=None):
+        """
+        @param activity_filter: (optional) Called with each incoming activity before any REST calls are made for it.
+         Return False to ignore the activity.
+        @param loop_activity_filter: (optional) Version of activity_filter which never blocks, run on the event
+         loop when async_ingress is enabled. Without it, activity_filter is run on a worker thread there.
+        @param ping_interval: Seconds between pings on the open websocket, or None to leave keepalive to the
+         websockets library. (default 15)
+        @param ping_timeout: Seconds to wait for a pong before dropping the connection and reconnecting. (default 10)
+        @param idle_timeout: (optional) Also reconnect if nothing at all has been received for this many seconds.
+        @param metrics: (optional) webex_bot.metrics.Metrics to record per-stage latencies into.
+        @param startup_cache: (optional) webex_bot.startup_cache.StartupCache holding the WDM URL and device
+         from the last run, so the websocket can be opened without looking them up first.
+        @param base_url: (optional) Webex REST API base URL. Override to run against a local test server.
+        @param u2c_url: URL of the u2c catalog used to find the WDM service. Override to run against a local test server.
+        """
         self.access_token = access_token
-        self.teams = WebexAPI(access_token=access_token, proxies=proxies)
+        if metrics is not None:
+            self.metrics = metrics
+        self.startup_timings = StartupTimings(metrics=self.metrics)
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        if startup_cache is not None:
+            self.startup_cache = startup_cache
+            startup_cache.bind(access_token)
+        # Only pass base_url when set, so the SDK default is used otherwise.
+        api_kwargs = {"base_url": base_url} if base_url else {}
+        self.u2c_url = u2c_url
+        self.teams = WebexAPI(access_token=access_token, proxies=proxies, **api_kwargs)
         self.tracking_id = f"webex-bot_{uuid.uuid4()}"
         self.session = requests.Session()
         sdk_ua = self.teams._session.headers["User-Agent"]
@@ -71,20 +184,64 @@ class WebexWebsocketClient(object):
         self.add_to_ua = f" '{bot_name}' ({sdk_ua})"
         self.session.headers = self._get_headers()
         self.teams._session.update_headers(self._get_headers())
+        # Outbound messages handle rate limits themselves (see OutboundScheduler), so this
+        # session must not sleep on a 429.
+        self.outbound_teams = WebexAPI(access_token=access_token, proxies=proxies, wait_on_rate_limit=False,
+                                       **api_kwargs)
+        self.outbound_teams._session.update_headers(self._get_headers())
         # log the tracking ID
         logger.info(f"Tracking ID: {self.tracking_id}")
         self.device_info = None
         self.on_message = on_message
         self.on_card_action = on_card_action
+        self.activity_filter = activity_filter
+        self.loop_activity_filter = loop_activity_filter
+        # Ids of recently processed activities, so redelivered ones are not handled twice.
+        self.dedup_store = dedup_store if dedup_store is not None else MemoryDedupStore()
         self.websocket = None
         self.share_id = None
+        # Event loop which owns the websocket, and the queue of outbound frames
+        # it drains. Other threads hand frames over via _send_frame().
+        self._loop = None
+        self._outbound_queue = None
+        # Incoming events are processed on a fixed pool of workers, serially per room.
+        self.dispatcher = KeyedDispatcher(max_workers=max_workers)
+        # Optionally resolve and fetch incoming messages on the event loop instead of in the workers.
+        self.async_ingress = None
+        self._ingress_tasks = set()
+        self._ingress_tails = {}
         if self.proxies:
             self.session.proxies = proxies
         if self.proxies:
             # Connecting through a proxy
             if proxy_connect is None:
                 raise ImportError("Failed to load libraries for proxy, maybe forgot [proxy] option during installation.")
-        self.device_url = self._get_device_url()
+        if async_ingress:
+            self.async_ingress = AsyncIngress(headers=self._get_headers(),
+                                              base_url=self.teams.base_url,
+                                              proxy=(proxies or {}).get("https"),
+                                              ssl=get_ssl_context())
+        self.bootstrap()
+
+    def bootstrap(self):
+        """
+        Run the lookups needed before the websocket can be opened. Independent ones run concurrently,
+        and the first to fail raises its exception.
+        @return: {step name: result}
+        """
+        return run_concurrently(self._bootstrap_steps())
+
+    def _bootstrap_steps(self):
+        """
+        @return: {name: callable} of independent startup steps. Subclasses add their own.
+        """
+        return {"wdm_device": self._bootstrap_device}
+
+    def _bootstrap_device(self):
+        with self.startup_timings.time("u2c"):
+            self.device_url = self._get_device_url()
+        with self.startup_timings.time("wdm_device"):
+            return self._get_device_info()
 
     def _get_headers(self):
 
@@ -100,6 +257,56 @@ class WebexWebsocketClient(object):
 
         return headers
 
+    def _get_keepalive_kwargs(self, connect_func):
+        """
+        @return: kwargs turning off the websockets library's own pings when this client sends its own.
+        """
+        if self.ping_interval is None:
+            return {}
+        try:
+            params = inspect.signature(connect_func).parameters
+        except (TypeError, ValueError):
+            return {}
+        return {"ping_interval": None} if "ping_interval" in params else {}
+
+    async def _monitor_connection(self, websocket):
+        """
+        Ping the websocket regularly, recording the round trip time, until it stops responding.
+        Waiting for recv() to fail can take minutes on a half-open TCP connection, missing messages meanwhile.
+        @raise ConnectionStalled: once no pong arrives within ping_timeout, or nothing has been received
+         for idle_timeout seconds. The connection is aborted first.
+        """
+        interval = min(timeout for timeout in (self.ping_interval, self.idle_timeout) if timeout)
+        while True:
+            await asyncio.sleep(interval)
+            if self.idle_timeout and time.monotonic() - self._last_received >= self.idle_timeout:
+                self._connection_stalled(websocket, f"nothing received for {self.idle_timeout}s")
+            if self.ping_interval:
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(self._ping(websocket), self.ping_timeout)
+                except asyncio.TimeoutError:
+                    self._connection_stalled(websocket, f"no pong within {self.ping_timeout}s")
+                self._last_received = time.monotonic()
+                self.websocket_rtt = self._last_received - started
+                self.metrics.observe("websocket_rtt", self.websocket_rtt, command="")
+
+    @staticmethod
+    async def _ping(websocket):
+        pong_waiter = await websocket.ping()
+        await pong_waiter
+
+    def _connection_stalled(self, websocket, reason):
+        detection = time.monotonic() - self._last_received
+        self.metrics.observe("stall_detection", detection, command="")
+        logger.warning(f"WebSocket stalled ({reason}), {detection:.1f}s after anything was last received. "
+                       f"Reconnecting.")
+        # Abort rather than close, as a close handshake on a dead connection would only time out
+        transport = getattr(websocket, "transport", None)
+        if transport is not None:
+            transport.abort()
+        raise ConnectionStalled(reason)
+
     def _get_websocket_connect_kwargs(self, connect_func):
         headers = self._get_headers()
         try:
@@ -114,105 +321,276 @@ class WebexWebsocketClient(object):
 
         return {"extra_headers": headers}
 
+    @staticmethod
+    def _get_dispatch_key(msg):
+        """
+        Events for the same room must be handled in order, so they are keyed on the room (conversation) id.
+        @param msg: The decoded websocket message
+        @return: room id, or None if the event is not tied to a room.
+        """
+        try:
+            return msg['data']['activity']['target']['id']
+        except (KeyError, TypeError):
+            return None
+
+    def _get_activity_to_process(self, msg):
+        """
+        Decide whether a websocket message is an activity which the handlers need to see.
+        :param msg: The decoded websocket message
+        :return: the activity, or None if there is nothing more to do.
+        """
+        logger.debug("msg['data'] = %s", truncated(msg['data']))
+        if msg['data']['eventType'] != 'conversation.activity':
+            return None
+        activity = msg['data']['activity']
+        if activity['verb'] in ('post', 'cardAction'):
+            logger.debug("activity=%s", truncated(activity))
+            return activity
+        elif activity['verb'] == 'share':
+            logger.debug("activity=%s", truncated(activity))
+            self.share_id = activity['id']
+            return None
+        elif activity['verb'] == 'update':
+            logger.debug("activity=%s", truncated(activity))
+
+            object = activity['object']
+            if object['objectType'] == 'content' and object['contentCategory'] == 'documents':
+                if 'files' in object.keys():
+                    for item in object['files']['items']:
+                        if not item['malwareQuarantineState'] == 'safe':
+                            return None
+                else:
+                    return None
+            else:
+                return None
+            return activity
+        else:
+            logger.debug("activity verb is: %s", activity['verb'])
+            return None
+
+    def _accept_activity(self, msg, activity):
+        """
+        Drop redelivered activities, then run the activity_filter, before any REST calls are made for a message.
+
+        Rejected messages are acked using the websocket message id, as the base64 message
+        id is not known without a lookup.
+        :return: True if the message should be fetched and handled.
+        """
+        if not self._is_redelivery(activity) and self._passes_filter(self.activity_filter, activity):
+            return True
+        self._reject_activity(msg)
+        return False
+
+    async def _accept_activity_async(self, msg, activity):
+        """
+        _accept_activity for async_ingress, which runs on the event loop and so must not block it.
+
+        loop_activity_filter is run on the loop if set. Otherwise activity_filter, which may make
+        blocking REST calls, is run on a worker thread.
+        """
+        if self._is_redelivery(activity):
+            accepted = False
+        elif self.loop_activity_filter is not None:
+            accepted = self._passes_filter(self.loop_activity_filter, activity)
+        elif self.activity_filter is not None and activity['verb'] != 'cardAction':
+            accepted = await asyncio.get_running_loop().run_in_executor(None, self.activity_filter, activity)
+        else:
+            accepted = True
+        if not accepted:
+            self._reject_activity(msg)
+        return accepted
+
+    def _is_redelivery(self, activity):
+        # Only checked here. The id is recorded once the message has been fetched and acked, so that
+        # if that fails, Webex's redelivery is processed rather than dropped as a duplicate.
+        if self.dedup_store is not None and activity.get('id') and self.dedup_store.contains(activity['id']):
+            hot_logger.info("Activity %s has already been processed. Ignoring redelivery.", activity['id'])
+            return True
+        return False
+
+    def _ack_processed(self, message_base_64_id, activity):
+        """
+        Ack a message which has been fetched and is about to be handled, and record it as processed.
+        """
+        self._ack_message(message_base_64_id)
+        if self.dedup_store is not None and activity.get('id'):
+            self.dedup_store.add(activity['id'])
+
+    @staticmethod
+    def _passes_filter(activity_filter, activity):
+        return activity_filter is None or activity['verb'] == 'cardAction' or activity_filter(activity)
+
+    def _reject_activity(self, msg):
+        if msg.get('id'):
+            self._ack_message(msg['id'])
+
     def _process_incoming_websocket_message(self, msg):
         """
         Handle websocket data.
         :param msg: The raw websocket message
         """
-        logger.debug(f"msg['data'] = {msg['data']}")
-        if msg['data']['eventType'] == 'conversation.activity':
-            activity = msg['data']['activity']
-            if activity['verb'] == 'post':
-                logger.debug(f"activity={activity}")
-
-                message_base_64_id = self._get_base64_message_id(activity)
-                if message_base_64_id is None:
-                    logger.warning(f"Could not resolve message id for 'post' activity: {activity.get('id')}")
-                    return
-                webex_message = self.teams.messages.get(message_base_64_id)
-                logger.debug(f"webex_message from message_base_64_id: {webex_message}")
-                if self.on_message:
-                    # ack message first
-                    self._ack_message(message_base_64_id)
-                    # Now process it with the handler
-                    self.on_message(teams_message=webex_message, activity=activity)
-            elif activity['verb'] == 'share':
-                logger.debug(f"activity={activity}")
-                self.share_id = activity['id']
-                return
-            elif activity['verb'] == 'update':
-                logger.debug(f"activity={activity}")
-
-                object = activity['object']
-                if object['objectType'] == 'content' and object['contentCategory'] == 'documents':
-                    if 'files' in object.keys():
-                        for item in object['files']['items']:
-                            if not item['malwareQuarantineState'] == 'safe':
-                                return
-                    else:
-                        return
-                else:
-                    return
-                message_base_64_id = self._get_base64_message_id(activity)
-                if message_base_64_id is None:
-                    logger.warning(f"Could not resolve message id for 'update' activity: {activity.get('id')}")
-                    return
-                webex_message = self.teams.messages.get(message_base_64_id)
-                logger.debug(f"webex_message from message_base_64_id: {webex_message}")
-                if self.on_message:
-                    # ack message first
-                    self._ack_message(message_base_64_id)
-                    # Now process it with the handler
-                    self.on_message(teams_message=webex_message, activity=activity)
-            elif activity['verb'] == 'cardAction':
-                logger.debug(f"activity={activity}")
-
-                message_base_64_id = self._get_base64_message_id(activity)
-                if message_base_64_id is None:
-                    logger.warning(f"Could not resolve message id for 'cardAction' activity: {activity.get('id')}")
-                    return
+        activity = self._get_activity_to_process(msg)
+        if activity is None:
+            return
+        if not self._accept_activity(msg, activity):
+            return
+
+        with self.metrics.time("message_id", ""):
+            message_base_64_id = self._get_base64_message_id(activity)
+        if message_base_64_id is None:
+            hot_logger.warning("Could not resolve message id for '%s' activity: %s", activity['verb'], activity.get('id'))
+            return
+
+        if activity['verb'] == 'cardAction':
+            with self.metrics.time("message_fetch", ""):
                 attachment_actions = self.teams.attachment_actions.get(message_base_64_id)
-                logger.info(f"attachment_actions from message_base_64_id: {attachment_actions}")
-                if self.on_card_action:
-                    # ack message first
-                    self._ack_message(message_base_64_id)
-                    # Now process it with the handler
-                    self.on_card_action(attachment_actions=attachment_actions, activity=activity)
+            logger.info("Card action received: %s", getattr(attachment_actions, 'id', None))
+            logger.debug("attachment_actions from message_base_64_id: %s", truncated(attachment_actions))
+            if self.on_card_action:
+                # ack message first
+                self._ack_processed(message_base_64_id, activity)
+                # Now process it with the handler
+                self.on_card_action(attachment_actions=attachment_actions, activity=activity)
+        else:
+            with self.metrics.time("message_fetch", ""):
+                webex_message = self.teams.messages.get(message_base_64_id)
+            logger.debug("webex_message from message_base_64_id: %s", truncated(webex_message))
+            if self.on_message:
+                # ack message first
+                self._ack_processed(message_base_64_id, activity)
+                # Now process it with the handler
+                self.on_message(teams_message=webex_message, activity=activity)
+
+    async def _process_incoming_websocket_message_async(self, msg):
+        """
+        Handle websocket data on the event loop, when async_ingress is enabled.
+
+        The message id lookup and message fetch run concurrently with other events. The handlers
+        still run on the dispatcher, in the order the events arrived for each room.
+        :param msg: The raw websocket message
+        """
+        key = self._get_dispatch_key(msg)
+        previous = self._ingress_tails.get(key)
+        turn = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._ingress_tails[key] = turn
+        try:
+            handler, kwargs = await self._hydrate_activity_async(msg)
+            if previous is not None:
+                await previous
+            if handler is not None:
+                self._dispatch(key, handler, **kwargs)
+        except Exception as e:
+            hot_logger.warning("An exception occurred while processing message. Ignoring. %s", e)
+        finally:
+            turn.set_result(None)
+            if self._ingress_tails.get(key) is turn:
+                del self._ingress_tails[key]
+
+    async def _hydrate_activity_async(self, msg):
+        """
+        :return: (handler, kwargs) to run for this message, or (None, None).
+        """
+        activity = self._get_activity_to_process(msg)
+        if activity is None:
+            return None, None
+        if not await self._accept_activity_async(msg, activity):
+            return None, None
+
+        with self.metrics.time("message_id", ""):
+            message_base_64_id = await self.async_ingress.get_base64_message_id(
+                self._get_conversation_message_url(activity))
+        if message_base_64_id is None:
+            hot_logger.warning("Could not resolve message id for '%s' activity: %s", activity['verb'], activity.get('id'))
+            return None, None
+
+        if activity['verb'] == 'cardAction':
+            if not self.on_card_action:
+                return None, None
+            with self.metrics.time("message_fetch", ""):
+                attachment_actions = await self.async_ingress.get_attachment_action(message_base_64_id)
+            if attachment_actions is None:
+                return None, None
+            self._ack_processed(message_base_64_id, activity)
+            return self.on_card_action, {"attachment_actions": attachment_actions, "activity": activity}
+
+        if not self.on_message:
+            return None, None
+        with self.metrics.time("message_fetch", ""):
+            webex_message = await self.async_ingress.get_message(message_base_64_id)
+        if webex_message is None:
+            return None, None
+        self._ack_processed(message_base_64_id, activity)
+        return self.on_message, {"teams_message": webex_message, "activity": activity}
+
+    def _handle_websocket_frame(self, message):
+        """
+        Decode a frame received on the websocket and hand it over for processing. Runs on the event loop.
+        :param message: The raw websocket message
+        """
+        metrics = self.metrics
+        received = time.perf_counter() if metrics.enabled else None
+        try:
+            msg = json.loads(message)
+            if received is not None:
+                metrics.observe("decode", time.perf_counter() - received, "")
+            if self.async_ingress is not None:
+                task = asyncio.ensure_future(self._process_incoming_websocket_message_async(msg))
+                self._ingress_tasks.add(task)
+                task.add_done_callback(self._ingress_tasks.discard)
             else:
-                logger.debug(f"activity verb is: {activity['verb']} ")
+                self._dispatch(self._get_dispatch_key(msg), self._process_incoming_websocket_message, msg)
+        except Exception as messageProcessingException:
+            hot_logger.warning("An exception occurred while processing message. Ignoring. %s", messageProcessingException)
+        if received is not None:
+            metrics.observe("receive", time.perf_counter() - received, "")
 
-    def _get_base64_message_id(self, activity):
+    def _dispatch(self, key, fn, *args, **kwargs):
         """
-        In order to geo-locate the correct DC to fetch the message from, you need to use the base64 Id of the
-        message.
+        Run fn on the dispatcher, recording how long it waited for a worker when metrics are enabled.
+        """
+        if not self.metrics.enabled:
+            return self.dispatcher.submit(key, fn, *args, **kwargs)
+        return self.dispatcher.submit(key, self._run_dispatched, time.perf_counter(), fn, *args, **kwargs)
+
+    def _run_dispatched(self, submitted, fn, *args, **kwargs):
+        self.metrics.observe("queue_wait", time.perf_counter() - submitted, "")
+        return fn(*args, **kwargs)
+
+    def _get_conversation_message_url(self, activity):
+        """
+        Build the URL, in the conversation's own DC, for the message or card action in an activity.
         @param activity: incoming websocket data
-        @return: base 64 message id, or None if the message could not be resolved
+        @return: URL which returns the message details, including its base64 id.
         """
         activity_id = activity['id']
-        logger.debug(f"activity verb={activity['verb']}. message id={activity_id}")
+        logger.debug("activity verb=%s. message id=%s", activity['verb'], activity_id)
         conversation_url = activity['target']['url']
         conv_target_id = activity['target']['id']
         verb = "messages" if activity['verb'] in ["post", "update"] else "attachment/actions"
         if activity['verb'] == "update" and self.share_id is not None:
             activity_id = self.share_id
             self.share_id = None
-        logger.debug(f"activity_id={activity_id}")
-        conversation_message_url = conversation_url.replace(f"conversations/{conv_target_id}",
-                                                            f"{verb}/{activity_id}")
+        logger.debug("activity_id=%s", activity_id)
+        return conversation_url.replace(f"conversations/{conv_target_id}", f"{verb}/{activity_id}")
+
+    def _get_base64_message_id(self, activity):
+        """
+        In order to geo-locate the correct DC to fetch the message from, you need to use the base64 Id of the
+        message.
+        @param activity: incoming websocket data
+        @return: base 64 message id, or None if the message could not be resolved
+        """
+        conversation_message_url = self._get_conversation_message_url(activity)
         response = self.session.get(conversation_message_url)
         if not response.ok:
-            logger.warning(
-                f"Failed to retrieve message from {conversation_message_url}: "
-                f"HTTP {response.status_code}"
-            )
+            hot_logger.warning("Failed to retrieve message from %s: HTTP %s", conversation_message_url, response.status_code)
             return None
         conversation_message = response.json()
-        logger.debug(f"conversation_message={conversation_message}")
+        logger.debug("conversation_message=%s", truncated(conversation_message))
         if 'id' not in conversation_message:
-            logger.warning(
-                f"Response for activity {activity_id} missing 'id' field: "
-                f"{conversation_message}"
-            )
+            hot_logger.warning("Response for activity %s missing 'id' field: %s",
+                               activity['id'], truncated(conversation_message))
             return None
         return conversation_message['id']
 
@@ -222,15 +600,92 @@ class WebexWebsocketClient(object):
         message coming again.
         @param message_id: activity message 'id'
         """
-        logger.debug(f"WebSocket ack message with id={message_id}")
+        logger.debug("WebSocket ack message with id=%s", message_id)
         ack_message = {'type': 'ack',
                        'messageId': message_id}
-        asyncio.run(self.websocket.send(json.dumps(ack_message)))
-        logger.debug(f"WebSocket ack message with id={message_id}. Complete.")
+        # The ack stage is timed from here until the frame has been written, by _websocket_send_loop()
+        self._send_frame(ack_message, stage="ack")
+        logger.debug("WebSocket ack message with id=%s. Queued.", message_id)
+
+    def _send_frame(self, frame, stage=None):
+        """
+        Queue a frame to be written to the websocket.
+
+        Safe to call from any thread. The frame is handed to the event loop which owns
+        the websocket, and written in order by its sender task.
+        @param frame: dict to be sent as JSON
+        @param stage: (optional) metrics stage to record the time from queueing the frame until it is written in.
+        @return: True if the frame was queued, False if there is no open connection.
+        """
+        loop = self._loop
+        queue = self._outbound_queue
+        if loop is None or queue is None or loop.is_closed():
+            hot_logger.warning("WebSocket not connected. Dropping outbound frame: %s", frame.get('type'))
+            return False
+        queued_at = time.perf_counter() if stage is not None else None
+        loop.call_soon_threadsafe(queue.put_nowait, (json.dumps(frame), stage, queued_at))
+        return True
+
+    async def _websocket_send_loop(self, websocket, queue):
+        """
+        Drain the outbound queue, writing each frame to the websocket in order.
+        Runs as a task on the loop which owns the connection.
+        @param queue: asyncio.Queue of (frame JSON, metrics stage or None, time.perf_counter() when queued)
+        """
+        while True:
+            frame, stage, queued_at = await queue.get()
+            try:
+                await websocket.send(frame)
+                if stage is not None:
+                    self.metrics.observe(stage, time.perf_counter() - queued_at, command="")
+            except websockets.ConnectionClosed as e:
+                logger.warning(f"WebSocket closed while sending frame. Dropping it. {e}")
+                return
+            except Exception as e:
+                hot_logger.warning("Failed to send frame on websocket: %s", e)
+
+    def _get_cached(self, key):
+        """
+        @return: value from the startup cache, or None if there is no cache or no fresh value.
+        """
+        if self.startup_cache is None:
+            return None
+        value = self.startup_cache.get(key)
+        if value is not None:
+            logger.debug(f"Using cached {key}")
+            self._startup_cache_used = True
+        return value
+
+    def _set_cached(self, key, value):
+        if self.startup_cache is not None and value is not None:
+            self.startup_cache.set(key, value)
+
+    def _refresh_startup_cache(self):
+        """
+        Look up the cached values again, and store the results for the next start. Runs in the
+        background once the websocket has been opened using cached values.
+        """
+        try:
+            self.device_url = self._fetch_device_url()
+            device = self._find_existing_device()
+            if device is None:
+                self.startup_cache.invalidate(DEVICE_INFO)
+            else:
+                self._set_cached(DEVICE_INFO, device)
+            logger.debug("Refreshed startup cache")
+        except Exception as e:
+            logger.warning(f"Failed to refresh startup cache: {e}")
 
     def _get_device_url(self):
+        wdm_url = self._get_cached(WDM_URL)
+        if wdm_url is not None:
+            logger.info(f"wdm url (cached): {wdm_url}")
+            return wdm_url
+        return self._fetch_device_url()
+
+    def _fetch_device_url(self):
         params = {"format": "hostmap"}
-        response = self.session.get(DEFAULT_U2C_URL, params=params)
+        response = self.session.get(self.u2c_url, params=params)
 
         # check for 401 Unauthorized
         if response.status_code == 401:
@@ -241,6 +696,7 @@ class WebexWebsocketClient(object):
 
         wdm_url = data["serviceLinks"].get("wdm")  # or whatever key your hostmap uses
         logging.info(f"wdm url: {wdm_url}")
+        self._set_cached(WDM_URL, wdm_url)
         return wdm_url
 
     def _get_device_info(self, check_existing=True):
@@ -250,16 +706,14 @@ class WebexWebsocketClient(object):
         If it doesn't exist, one will be created.
         """
         if check_existing:
-            logger.debug('Getting device list')
-            try:
-                resp = self.session.get(f"{self.device_url}/devices")
-                for device in resp.json()['devices']:
-                    if device['name'] == DEVICE_DATA['name']:
-                        self.device_info = device
-                        logger.debug(f"device_info: {self.device_info}")
-                        return device
-            except Exception as wdmException:
-                logger.warning(f"wdmException: {wdmException}")
+            device = self._get_cached(DEVICE_INFO)
+            if device is None:
+                device = self._find_existing_device()
+                self._set_cached(DEVICE_INFO, device)
+            if device is not None:
+                self.device_info = device
+                logger.debug(f"device_info: {self.device_info}")
+                return device
 
             logger.info('Device does not exist, creating')
 
@@ -268,8 +722,26 @@ class WebexWebsocketClient(object):
             raise Exception("could not create WDM device")
         self.device_info = resp.json()
         logger.debug(f"self.device_info: {self.device_info}")
+        self._set_cached(DEVICE_INFO, self.device_info)
         return self.device_info
 
+    def _find_existing_device(self, raise_errors=False):
+        """
+        @param raise_errors: If True, raise if the device list could not be fetched, rather than returning None.
+        @return: this client's registered WDM device, or None if there isn't one.
+        """
+        logger.debug('Getting device list')
+        try:
+            resp = self.session.get(f"{self.device_url}/devices")
+            for device in resp.json()['devices']:
+                if device['name'] == DEVICE_DATA['name']:
+                    return device
+        except Exception as wdmException:
+            if raise_errors:
+                raise
+            logger.warning(f"wdmException: {wdmException}")
+        return None
+
     def stop(self):
         def terminate():
             raise SystemExit()
@@ -285,21 +757,27 @@ class WebexWebsocketClient(object):
         # Pull out URL now so we can log it on failure
         ws_url = self.device_info.get('webSocketUrl')
 
+        if self._startup_cache_used:
+            # Connect with the cached values now, and check them in the background
+            self._startup_cache_used = False
+            threading.Thread(target=self._refresh_startup_cache, name="webex-bot-startup-cache", daemon=True).start()
+
         async def _websocket_recv():
             message = await self.websocket.recv()
-            logger.debug("WebSocket Received Message(raw): %s\n" % message)
-            try:
-                msg = json.loads(message)
-                loop = asyncio.get_event_loop()
-                loop.run_in_executor(None, self._process_incoming_websocket_message, msg)
-            except Exception as messageProcessingException:
-                logger.warning(
-                    f"An exception occurred while processing message. Ignoring. {messageProcessingException}")
+            self._last_received = time.monotonic()
+            logger.debug("WebSocket Received Message(raw): %s", truncated(message))
+            self._handle_websocket_frame(message)
+
+        async def _receive_forever():
+            while True:
+                await _websocket_recv()
 
         @backoff.on_exception(
             backoff.expo,
             BACKOFF_EXCEPTIONS,
-            max_time=MAX_BACKOFF_TIME
+            max_time=MAX_BACKOFF_TIME,
+            max_value=RECONNECT_MAX_DELAY,
+            jitter=backoff.full_jitter
         )
         async def _connect_and_listen():
             ws_url = self.device_info['webSocketUrl']
@@ -310,7 +788,7 @@ class WebexWebsocketClient(object):
                 proxy = Proxy.from_url(self.proxies["wss"])
                 connect = proxy_connect(
                     ws_url,
-                    ssl=ssl_context,
+                    ssl=get_ssl_context(),
                     proxy=proxy,
                     **self._get_websocket_connect_kwargs(proxy_connect),
                 )
@@ -319,7 +797,7 @@ class WebexWebsocketClient(object):
                 proxy = Proxy.from_url(self.proxies["https"])
                 connect = proxy_connect(
                     ws_url,
-                    ssl=ssl_context,
+                    ssl=get_ssl_context(),
                     proxy=proxy,
                     **self._get_websocket_connect_kwargs(proxy_connect),
                 )
@@ -327,63 +805,124 @@ class WebexWebsocketClient(object):
                 logger.debug("Not using proxy for websocket connection.")
                 connect = websockets.connect(
                     ws_url,
-                    ssl=ssl_context,
+                    # websockets refuses an SSL context for a plain ws:// URL (e.g. a local test server)
+                    ssl=get_ssl_context() if ws_url.startswith("wss://") else None,
                     **self._get_websocket_connect_kwargs(websockets.connect),
+                    **self._get_keepalive_kwargs(websockets.connect),
                 )
 
             async with connect as _websocket:
                 self.websocket = _websocket
+                self._last_received = time.monotonic()
                 logger.info("WebSocket Opened.")
+                if self.startup_timings is not None:
+                    self.startup_timings.websocket_opened()
+                self._websocket_opened()
                 msg = {'id': str(uuid.uuid4()),
                        'type': 'authorization',
                        'data': {'token': 'Bearer ' + self.access_token}}
                 await self.websocket.send(json.dumps(msg))
 
-                while True:
-                    await _websocket_recv()
+                self._outbound_queue = asyncio.Queue()
+                self._loop = asyncio.get_running_loop()
+                sender = asyncio.ensure_future(self._websocket_send_loop(_websocket, self._outbound_queue))
+                if self.async_ingress is not None:
+                    await self.async_ingress.start()
+                tasks = {asyncio.ensure_future(_receive_forever())}
+                if self.ping_interval or self.idle_timeout:
+                    tasks.add(asyncio.ensure_future(self._monitor_connection(_websocket)))
+                try:
+                    # Until the connection fails, or the liveness checks find it has stalled
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                finally:
+                    self._disconnected_at = time.monotonic()
+                    self._loop = None
+                    self._outbound_queue = None
+                    sender.cancel()
+                    for task in tasks:
+                        task.cancel()
+                    if self.async_ingress is not None:
+                        await self.async_ingress.close()
 
         # Track the number of consecutive 404 errors to prevent infinite loops
         max_404_retries = 3
         current_404_retries = 0
+        failures = 0
 
         while True:
             try:
                 asyncio.get_event_loop().run_until_complete(_connect_and_listen())
                 # If we get here, the connection was successful, so break out of the loop
                 break
-            except InvalidStatus as e:
-                status_code = getattr(e.response, "status_code", None)
+            except Exception as e:
+                error = e
+
+            if self._connection_opened:
+                # The connection was up until now, so this is a new outage
+                self._connection_opened = False
+                failures = 0
+                current_404_retries = 0
+
+            if isinstance(error, InvalidStatus):
+                status_code = getattr(error.response, "status_code", None)
                 logger.error(f"WebSocket handshake to {ws_url} failed with status {status_code}")
 
-                if status_code == 404:
+                if status_code in DEVICE_GONE_STATUSES:
                     current_404_retries += 1
                     if current_404_retries >= max_404_retries:
                         logger.error(f"Reached maximum retries ({max_404_retries}) for 404 errors. Giving up.")
                         raise Exception(f"Unable to connect to WebSocket after {max_404_retries} attempts. Device registration may be invalid.")
 
                     logger.info(f"Refreshing WDM device info and retrying... (Attempt {current_404_retries} of {max_404_retries})")
-                    # Force a new device registration
+                    # The device is gone, so register a new one
                     self._get_device_info(check_existing=False)
                     # Update ws_url with the new device info
                     ws_url = self.device_info.get('webSocketUrl')
+                elif status_code is None or (status_code < 500 and status_code != 429):
+                    # Other than server errors and throttling, retrying will not help
+                    raise error
+            else:
+                logger.error(f"runException: {error}")
+                # Keep reconnecting to the same device, and only check it is still registered if that keeps failing
+                if (failures + 1) % VERIFY_DEVICE_AFTER == 0:
+                    if self._verify_device() is None:
+                        logger.error('could not create device info')
+                        raise Exception("No WDM device info")
+                    ws_url = self.device_info.get('webSocketUrl')
 
-                    # Add a delay before retrying to avoid hammering the server
-                    logger.info(f"Waiting 5 seconds before retry attempt {current_404_retries}...")
-                    asyncio.get_event_loop().run_until_complete(asyncio.sleep(5))
-                else:
-                    # For non-404 errors, just raise the exception
-                    raise
-            except Exception as runException:
-                logger.error(f"runException: {runException}")
-
-                # Check if we can get device info
-                if self._get_device_info(check_existing=False) is None:
-                    logger.error('could not create device info')
-                    raise Exception("No WDM device info")
-
-                # Update the URL in case it changed
-                ws_url = self.device_info.get('webSocketUrl')
-
-                # Wait a bit before reconnecting
-                logger.info("Waiting 5 seconds before attempting to reconnect...")
-                asyncio.get_event_loop().run_until_complete(asyncio.sleep(5))
+            delay = reconnect_delay(failures)
+            failures += 1
+            logger.info(f"Waiting {delay:.1f} seconds before attempting to reconnect...")
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(delay))
+
+    def _websocket_opened(self):
+        """
+        Called each time the websocket is opened. Records how long it took to recover after losing the connection.
+        """
+        self._connection_opened = True
+        if self._disconnected_at is not None:
+            recovery = time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            self.metrics.observe("reconnect", recovery, command="")
+            logger.info(f"Reconnected {recovery:.3f}s after the connection was lost")
+
+    def _verify_device(self):
+        """
+        Check the WDM device is still registered, registering a new one only if it is not.
+        @return: device info, or None if the device could not be found or created.
+        """
+        try:
+            device = self._find_existing_device(raise_errors=True)
+        except Exception as e:
+            # Most likely the same outage which broke the connection, so keep the device and retry
+            logger.warning(f"Could not check the WDM device is still registered: {e}")
+            return self.device_info
+        if device is not None:
+            logger.info("WDM device is still registered, reconnecting to it")
+            self.device_info = device
+            self._set_cached(DEVICE_INFO, device)
+            return device
+        logger.info("WDM device is no longer registered, creating a new one")
+        return self._get_device_info(check_existing=False)